@@ -0,0 +1,471 @@
+""" Benchmarks for the input parsing and control dispatch hot paths
+
+Runs on any Linux machine: no controller, xboxdrv or robot is needed.  Input comes from
+synthetic xboxdrv lines and XInput state dicts, and commands go to a fake robot that only
+counts calls.  Results are printed as JSON so runs can be compared over time:
+
+    python benchmarks/hot_paths.py > bench_output.txt
+    python benchmarks/hot_paths.py --quick
+
+The cozmo SDK must be importable (pip install -r requirements.txt) because both front ends
+import it.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, 'shared_scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'windows_scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'linux_scripts'))
+
+import backpack_lights  # noqa: E402
+import controller  # noqa: E402
+import drive  # noqa: E402
+import fleet  # noqa: E402
+import pipeline  # noqa: E402
+import shared_state  # noqa: E402
+import ticker  # noqa: E402
+import xbox  # noqa: E402
+import cozmo_interface  # noqa: E402
+import xbox_controller  # noqa: E402
+import xinput  # noqa: E402
+
+LINE = ("X1:{:6d} Y1:{:6d}  X2:{:6d} Y2:{:6d}  du:{} dd:{} dl:{} dr:{}  back:{} guide:{} start:{}  "
+        "TL:{} TR:{}  A:{} B:{} X:{} Y:{}  LB:{} RB:{}  LT:{:3d} RT:{:3d}\n")
+
+
+def xboxdrv_line(i, guide=0):
+    """
+    :param i: frame number, varied into every field
+    :param guide: state of the guide button
+    :return: a 140 byte xboxdrv output line
+    """
+    a = (i >> 4) & 1
+    return LINE.format((i * 97) % 65536 - 32768, (i * 31) % 65536 - 32768, (i * 7) % 30000, -(i % 20000),
+                       a, 0, 0, a ^ 1, 0, guide, 0, 0, 0, a, 0, a ^ 1, 0, 0, 0, (i * 3) % 256, (i * 5) % 256).encode()
+
+
+class FakeAction:
+    is_running = False
+
+    def abort(self):
+        pass
+
+    def wait_for_completed(self, timeout=None):
+        return self
+
+
+class FakeRobot:
+    """Accepts every robot command the front ends send and counts them."""
+
+    def __init__(self):
+        self.calls = 0
+        self.action = FakeAction()
+
+    def _command(self, *args, **kwargs):
+        self.calls += 1
+        return self.action
+
+    drive_wheels = move_lift = move_head = set_lift_height = play_anim = say_text = _command
+    set_backpack_lights = set_all_backpack_lights = set_backpack_lights_off = stop_all_motors = _command
+
+
+class ScriptedJoystick:
+    """Plays a list of prepared snapshots to cozmo_program, one per loop iteration, then presses guide."""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.index = -1
+        self.frameCount = 0
+        self.recorder = None
+        self.previous = xbox.Snapshot()
+
+    def poll(self):
+        self.index += 1
+        if self.index >= len(self.snapshots):
+            return [xbox.Event(xbox.BUTTON_DOWN, xbox.GUIDE, 1, self.previous)], self.previous
+        state = self.snapshots[self.index]
+        changed = state.buttons ^ self.previous.buttons
+        self.previous = state
+        self.frameCount += 1
+        events = []
+        while changed:
+            bit = changed & -changed
+            events.append(xbox.Event(xbox.BUTTON_DOWN if state.buttons & bit else xbox.BUTTON_UP, bit, 0, state))
+            changed ^= bit
+        return events, state
+
+    def wait_for_change(self, timeout=None):
+        return None  # the next snapshot is always new, so there is never anything to wait for
+
+    def close(self):
+        pass
+
+
+def pipe_joystick():
+    """
+    :return: tuple of (xbox.Joystick, write file descriptor feeding its pipe)
+    """
+    banner = "import sys, time; sys.stdout.write('Press Ctrl-c to quit\\n'); sys.stdout.flush(); time.sleep(3600)"
+    joy = xbox.Joystick(command=[sys.executable, '-c', banner])
+    read_fd, write_fd = os.pipe()
+    joy.pipe = os.fdopen(read_fd, 'rb', buffering=0)
+    return joy, write_fd
+
+
+def bench_joystick_frames(count):
+    """Frames per second through Joystick.refresh() and the accessors cozmo_program used to call."""
+    joy, write_fd = pipe_joystick()
+    lines = [xboxdrv_line(i) for i in range(1024)]
+    started = time.perf_counter()
+    for i in range(count):
+        os.write(write_fd, lines[i & 1023])
+        joy.refreshTime = 0
+        joy.refresh()
+        joy.leftX(), joy.leftY(), joy.rightX(), joy.rightY(), joy.leftTrigger(), joy.rightTrigger()
+        joy.A(), joy.B(), joy.X(), joy.Y(), joy.leftBumper(), joy.rightBumper()
+        joy.dpadUp(), joy.dpadDown(), joy.dpadLeft(), joy.dpadRight(), joy.Back(), joy.Start(), joy.Guide()
+    elapsed = time.perf_counter() - started
+    joy.close()
+    os.close(write_fd)
+    return {'frames_per_sec': count / elapsed, 'us_per_frame': elapsed / count * 1e6}
+
+
+def bench_snapshot_frames(count):
+    """Frames per second through Joystick.refresh() and one snapshot() read per frame."""
+    joy, write_fd = pipe_joystick()
+    lines = [xboxdrv_line(i) for i in range(1024)]
+    started = time.perf_counter()
+    for i in range(count):
+        os.write(write_fd, lines[i & 1023])
+        joy.refreshTime = 0
+        state = joy.snapshot()
+        state.leftStick(), state.rightStick(), state.leftTrigger(), state.rightTrigger(), state.buttons
+    elapsed = time.perf_counter() - started
+    joy.close()
+    os.close(write_fd)
+    return {'frames_per_sec': count / elapsed, 'us_per_frame': elapsed / count * 1e6}
+
+
+def bench_backlog_drain(lines):
+    """Time for one refresh to catch up on a backlog of buffered xboxdrv lines."""
+    joy, write_fd = pipe_joystick()
+    os.close(write_fd)
+    with tempfile.TemporaryFile() as backlog:
+        backlog.write(b''.join(xboxdrv_line(i) for i in range(lines)))
+        backlog.flush()
+        best = None
+        for attempt in range(5):
+            backlog.seek(0)
+            joy.pipe = open(os.dup(backlog.fileno()), 'rb', buffering=0)
+            joy.buffered = 0
+            started = time.perf_counter()
+            try:
+                joy.readAvailable()
+            except IOError:  # end of the backlog file reads as an unplug
+                pass
+            elapsed = time.perf_counter() - started
+            joy.pipe.close()
+            best = elapsed if best is None else min(best, elapsed)
+    joy.pipe = joy.proc.stdout
+    joy.close()
+    return {'lines': lines, 'drain_ms': best * 1000, 'lines_per_sec': lines / best}
+
+
+def bench_cozmo_program(count):
+    """Cost of one iteration of the Linux cozmo_program loop, excluding its pacing sleep."""
+    snapshots = [xbox.decode(xboxdrv_line(i)) for i in range(count)]
+    robot = FakeRobot()
+    rate = cozmo_interface.RATE
+    cozmo_interface.RATE = 1e9  # every wait is already past its deadline, so the ticker never sleeps
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # keep its loop statistics out of the JSON
+            started = time.perf_counter()
+            cozmo_interface.cozmo_program(robot, ScriptedJoystick(snapshots))
+            elapsed = time.perf_counter() - started
+    finally:
+        cozmo_interface.RATE = rate
+    return {'iterations_per_sec': count / elapsed, 'us_per_iteration': elapsed / count * 1e6,
+            'commands_per_iteration': robot.calls / float(count)}
+
+
+def bench_fleet(pairs, seconds):
+    """Loop rate each pair gets when several controller and robot pairs share one fleet loop."""
+    lines = [xboxdrv_line(i) for i in range(1024)]
+    runner = fleet.Fleet(cozmo_interface.RATE)
+    joysticks, write_fds = [], []
+    for number in range(pairs):
+        joy, write_fd = pipe_joystick()
+        joysticks.append(joy)
+        write_fds.append(write_fd)
+        runner.add(number, joy, cozmo_interface.Pilot(joy, FakeRobot()))
+
+    # each controller sends a frame every 8 ms, as a wired pad does
+    stop = threading.Event()
+
+    def feed():
+        i = 0
+        while not stop.wait(0.008):
+            for write_fd in write_fds:
+                os.write(write_fd, lines[i & 1023])
+            i += 1
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    try:
+        runner.run(seconds)
+    finally:
+        stop.set()
+        feeder.join()
+        for joy, write_fd in zip(joysticks, write_fds):
+            joy.close()
+            os.close(write_fd)
+        runner.close()
+    report = runner.report()
+    rates = [report[number]['loop_hz'] for number in range(pairs)]
+    steps = [report[number]['mean_step_us'] for number in range(pairs)]
+    return {'pairs': pairs, 'target_hz': cozmo_interface.RATE, 'min_loop_hz': min(rates),
+            'max_loop_hz': max(rates), 'mean_step_us': sum(steps) / pairs, 'skipped_ticks': report['loop']['skipped'],
+            'p99_jitter_us': report['loop']['p99_jitter_us'],
+            'errors': sum('error' in report[number] for number in range(pairs))}
+
+
+def bench_async_pipeline(latency, seconds):
+    """Input samples and control steps per second in the asyncio pipeline while each drive_wheels takes latency seconds."""
+    lines = [xboxdrv_line(i) for i in range(1024)]
+    joy, write_fd = pipe_joystick()
+    robot = pipeline.FakeAsyncRobot(latency)
+    runner = pipeline.Pipeline(joy, robot, pipeline.Controls(), cozmo_interface.RATE)
+
+    # a frame every 8 ms, as a wired pad sends; closing the pipe ends the run
+    def feed():
+        end = time.monotonic() + seconds
+        i = 0
+        while time.monotonic() < end:
+            os.write(write_fd, lines[i & 1023])
+            i += 1
+            time.sleep(0.008)
+        os.close(write_fd)
+        return i
+    fed = []
+    feeder = threading.Thread(target=lambda: fed.append(feed()))
+    feeder.start()
+    started = time.monotonic()
+    try:
+        asyncio.run(runner.run())
+    finally:
+        feeder.join()
+        joy.close()
+    elapsed = time.monotonic() - started
+    stats = runner.statistics()
+    return {'drive_latency_ms': latency * 1000, 'frames_fed': fed[0], 'samples': stats['samples'],
+            'samples_per_sec': stats['samples'] / elapsed, 'control_steps_per_sec': stats['control_steps'] / elapsed,
+            'drive_wheels_calls': robot.calls['drive_wheels'], 'commands_superseded': stats['commands_superseded'],
+            'p99_control_jitter_us': stats['control']['p99_jitter_us']}
+
+
+def bench_shared_state(count):
+    """Frames per second published into shared memory, and reads per second of the newest frame."""
+    path = os.path.join(tempfile.gettempdir(), 'cozmo-controller-bench')
+    writer = shared_state.StateWriter(path)
+    reader = shared_state.StateReader(path)
+    try:
+        started = time.perf_counter()
+        for i in range(count):
+            writer.publish(i & 0x7fff, -(i & 0x7fff), 0, 0, i & 255, 0, i & 0xf00f, True, 0.0)
+        published = time.perf_counter() - started
+        latest = reader.latest
+        started = time.perf_counter()
+        for i in range(count):
+            latest()
+        read = time.perf_counter() - started
+    finally:
+        reader.close()
+        writer.close()
+    return {'publish_per_sec': count / published, 'us_per_publish': published / count * 1e6,
+            'latest_per_sec': count / read, 'us_per_latest': read / count * 1e6}
+
+
+def xinput_states(count):
+    """
+    :return: count synthetic XInput state dicts sweeping the sticks, triggers and buttons
+    """
+    states = []
+    for i in range(count):
+        states.append({
+            'buttons': (0x1000 << (i % 4)) if i % 3 == 0 else (1 << (i % 4)) if i % 3 == 1 else 0,
+            'left_trigger': (i * 3) % 256 if i % 5 == 0 else 0,
+            'right_trigger': (i * 5) % 256 if i % 5 == 0 else 0,
+            'l_thumb_x': (i * 97) % 65536 - 32768,
+            'l_thumb_y': (i * 31) % 65536 - 32768,
+            'r_thumb_x': 0,
+            'r_thumb_y': 0,
+        })
+    return states
+
+
+def bench_stick_table(count):
+    """
+    Lookups per second of a left stick table built like the Windows controller's, and the time to
+    rebuild it with more expo.
+    """
+    states = xinput_states(1024)
+    table = xbox_controller.StickTable(copy.copy(xbox_controller.drive_mixer))
+    lookup = table.lookup
+    started = time.perf_counter()
+    for i in range(count):
+        state = states[i & 1023]
+        lookup(state['l_thumb_x'], state['l_thumb_y'])
+    elapsed = time.perf_counter() - started
+    rebuild_started = time.perf_counter()
+    table.mixer.expo = 0.5
+    table.build()
+    rebuild = time.perf_counter() - rebuild_started
+    return {'lookups_per_sec': count / elapsed, 'us_per_lookup': elapsed / count * 1e6,
+            'rebuild_ms': rebuild * 1000}
+
+
+def bench_ticker(rate, seconds, work=0.002):
+    """How closely Ticker holds a rate when every tick does some work and an occasional one overruns."""
+    pacer = ticker.Ticker(rate)
+    period = 1.0 / rate
+    end = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < end:
+        # busy for work seconds, and for two and a half periods every 50th tick
+        busy_until = time.monotonic() + (2.5 * period if i % 50 == 49 else work)
+        while time.monotonic() < busy_until:
+            pass
+        pacer.wait()
+        i += 1
+    return pacer.statistics()
+
+
+def bench_light_animation(count):
+    """Control loop steps per second spent advancing a backpack light animation, and the commands it sends."""
+    robot = FakeRobot()
+    lights = backpack_lights.BackpackLights(robot)
+    lights.play_light_animation(backpack_lights.ANIMATIONS['police'](), 0.0)
+    update = lights.update_lights
+    started = time.perf_counter()
+    for i in range(count):
+        update(i * 0.01)  # a 100 Hz loop, so a new frame is due every 25 steps
+    elapsed = time.perf_counter() - started
+    return {'updates_per_sec': count / elapsed, 'us_per_update': elapsed / count * 1e6,
+            'commands_per_update': robot.calls / float(count)}
+
+
+def bench_drive_batch(count):
+    """Frames per second through DriveMixer.batch, mixing and slew limiting a recorded-length session."""
+    frames = [(i / 60.0, ((i * 31) % 2001 - 1000) / 1000.0, ((i * 97) % 2001 - 1000) / 1000.0) for i in range(count)]
+    mixer = drive.DriveMixer(expo=0.3, acceleration=600)
+    started = time.perf_counter()
+    mixer.batch(frames)
+    elapsed = time.perf_counter() - started
+    return {'frames': count, 'frames_per_sec': count / elapsed, 'us_per_frame': elapsed / count * 1e6}
+
+
+class CountingXInput:
+    """Pure Python stand-in for the XInput library whose packet number advances every `every` calls."""
+
+    def __init__(self, every):
+        self.every = every
+        self.calls = 0
+
+    def XInputGetState(self, device_number, state):
+        state = state._obj
+        self.calls += 1
+        state.packet_number = self.calls // self.every
+        state.gamepad.l_thumb_x = self.calls & 0x7fff
+        return 0
+
+    def XInputSetState(self, device_number, vibration):
+        return 0
+
+    def XInputGetBatteryInformation(self, device_number, device_type, battery):
+        return 0
+
+
+def bench_xinput_get_state(count):
+    """Calls per second of XInputJoystick.get_state when every packet is new, and when most repeat."""
+    results = {}
+    for label, every in (('changing', 1), ('repeating', 100)):
+        xinput.use_library(CountingXInput(every))
+        joystick = xinput.XInputJoystick(0)
+        get_state = joystick.get_state
+        started = time.perf_counter()
+        for i in range(count):
+            get_state()
+        elapsed = time.perf_counter() - started
+        results[label + '_us_per_call'] = elapsed / count * 1e6
+    xinput.xinput = None
+    return results
+
+
+def bench_check_controller_state(count):
+    """Calls per second of check_controller_state, including its controller_commands call."""
+    states = [controller.State(state['l_thumb_x'], state['l_thumb_y'], state['r_thumb_x'], state['r_thumb_y'],
+                               state['left_trigger'], state['right_trigger'], state['buttons'], True, 0.0, i)
+              for i, state in enumerate(xinput_states(1024))]
+    robot = FakeRobot()
+    check_controller_state = xbox_controller.check_controller_state
+    started = time.perf_counter()
+    for i in range(count):
+        check_controller_state(robot, states[i & 1023])
+    elapsed = time.perf_counter() - started
+    return {'calls_per_sec': count / elapsed, 'us_per_call': elapsed / count * 1e6,
+            'commands_per_call': robot.calls / float(count)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true', help='run a tenth of the iterations')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args(argv)
+    scale = 10 if args.quick else 1
+
+    results = {
+        'joystick_accessors': bench_joystick_frames(20000 // scale),
+        'joystick_snapshot': bench_snapshot_frames(20000 // scale),
+        'backlog_drain_1k': bench_backlog_drain(1000),
+        'backlog_drain_10k': bench_backlog_drain(10000),
+        'cozmo_program_iteration': bench_cozmo_program(50000 // scale),
+        'stick_table': bench_stick_table(500000 // scale),
+        'check_controller_state': bench_check_controller_state(200000 // scale),
+        'xinput_get_state': bench_xinput_get_state(200000 // scale),
+        'drive_batch': bench_drive_batch(216000 // scale),
+        'light_animation': bench_light_animation(200000 // scale),
+        'shared_state': bench_shared_state(200000 // scale),
+        'fleet_4_pairs': bench_fleet(4, 2.0 / scale),
+        'fleet_8_pairs': bench_fleet(8, 2.0 / scale),
+        'ticker_100hz': bench_ticker(100, 2.0 / scale),
+        'ticker_200hz': bench_ticker(200, 2.0 / scale),
+        'async_pipeline_fast_robot': bench_async_pipeline(0.0, 2.0 / scale),
+        'async_pipeline_50ms_robot': bench_async_pipeline(0.05, 2.0 / scale),
+    }
+    report = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+""" Soak test of the Linux control loop against a simulated robot in virtual time
+
+Runs cozmo_interface.cozmo_program for hours of simulated driving, in seconds, with no
+controller, xboxdrv or robot.  A scripted driver on a VirtualClock drives, turns, works the
+lift and head, taps the bound buttons and leaves the controller idle at random, and the
+commands go to a simulator.SimulatedRobot that integrates the robot's motion, plays out its
+actions and delays everything by the link latency:
+
+    python benchmarks/soak.py --hours 4
+    python benchmarks/soak.py --hours 0.5 --latency 0.08 --jitter 0.04 --seed 7
+
+The loop's own statistics are printed to stderr as the run ends, and the simulated robot's
+to stdout as JSON.  The exit status is 1 if any action failed or was refused because the robot
+was busy, so the soak can gate a CI job.
+"""
+import argparse
+import collections
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, 'shared_scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'linux_scripts'))
+
+import simulator  # noqa: E402
+import xbox  # noqa: E402
+import cozmo_interface  # noqa: E402
+
+# buttons with a binding in bindings.json, tapped now and then
+BUTTONS = (xbox.A, xbox.B, xbox.X, xbox.Y, xbox.DPAD_UP, xbox.DPAD_DOWN, xbox.DPAD_LEFT, xbox.DPAD_RIGHT,
+           xbox.RIGHT_THUMB, xbox.BACK, xbox.START)
+
+
+class VirtualJoystick:
+    """
+    Stands in for xbox.Joystick with a driver who holds each random input for a while, on the
+    clock of the simulation, then presses guide once the given number of seconds have passed.
+    """
+
+    def __init__(self, clock, seconds, seed=0):
+        """
+        :param clock: simulator.VirtualClock of the run
+        :param seconds: simulated seconds to drive for
+        :param seed: seed of the driver's choices
+        """
+        self.clock = clock
+        self.end = seconds
+        self.random = random.Random(seed)
+        self.state = xbox.Snapshot(connectStatus=True)
+        self.changes = 0.0  # time of the next change of input
+        self.events = []
+        self.frameCount = 0
+        self.recorder = None
+        self.segments = collections.Counter()
+
+    def _stick(self):
+        return int(max(min(self.random.gauss(0, 20000), 32767), -32768))
+
+    def _next(self, now):
+        rand = self.random
+        pick = rand.random()
+        if now >= self.end:
+            buttons, axes, hold, kind = xbox.GUIDE, (0,) * 6, 3600.0, 'guide'
+        elif pick < 0.15:
+            buttons, axes, hold, kind = 0, (0,) * 6, rand.uniform(2.0, 30.0), 'idle'
+        elif pick < 0.25:
+            buttons, axes, hold, kind = rand.choice(BUTTONS), (0,) * 6, 0.15, 'press'
+        else:
+            trigger = rand.choice((0, 0, 0, rand.randint(0, 255)))
+            lift = (trigger, 0) if rand.random() < 0.5 else (0, trigger)
+            buttons = rand.choice((0, 0, 0, 0, xbox.LEFT_BUMPER, xbox.RIGHT_BUMPER))
+            axes = (self._stick(), self._stick(), self._stick(), self._stick()) + lift
+            hold, kind = rand.uniform(0.2, 3.0), 'drive'
+        self.segments[kind] += 1
+        previous = self.state
+        self.state = xbox.Snapshot(*axes, buttons=buttons, connectStatus=True, timestamp=now)
+        self.frameCount += 1
+        changed = buttons ^ previous.buttons
+        while changed:
+            bit = changed & -changed
+            self.events.append(xbox.Event(xbox.BUTTON_DOWN if buttons & bit else xbox.BUTTON_UP, bit, 0, self.state))
+            changed ^= bit
+        self.changes = now + hold
+
+    def _catch_up(self):
+        now = self.clock()
+        while now >= self.changes:
+            self._next(self.changes)
+
+    def poll(self):
+        self._catch_up()
+        events, self.events = self.events, []
+        return events, self.state
+
+    def wait_for_change(self, timeout=None):
+        now = self.clock()
+        wake = self.changes if timeout is None else min(self.changes, now + timeout)
+        self.clock.sleep(wake - now)
+        if self.clock() < self.changes:
+            return None
+        self._catch_up()
+        return self.state
+
+    def close(self):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hours', type=float, default=1.0, help='simulated hours to drive for')
+    parser.add_argument('--latency', type=float, default=0.03,
+                        help='seconds from a command being sent to the robot acting on it')
+    parser.add_argument('--jitter', type=float, default=0.01,
+                        help='largest random delay added to the latency, in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the driver and the jitter')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    clock = simulator.VirtualClock()
+    robot = simulator.SimulatedRobot(clock, args.latency, args.jitter, seed=args.seed)
+    joystick = VirtualJoystick(clock, args.hours * 3600, args.seed)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):  # keep the loop's statistics out of the JSON
+        cozmo_interface.cozmo_program(robot, joystick, clock, clock.sleep)
+    elapsed = time.perf_counter() - started
+    stats = robot.statistics()
+    report = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': vars(args),
+        'real_s': elapsed,
+        'speedup': stats['simulated_s'] / elapsed,
+        'driver': dict(joystick.segments),
+        'robot': stats,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    problems = {state: stats['actions'][state] for state in ('failed', 'busy') if stats['actions'].get(state)}
+    if problems:
+        sys.stderr.write('Actions went wrong: {0}\n'.format(problems))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
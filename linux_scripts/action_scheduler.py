@@ -0,0 +1,199 @@
+""" Per-actuator scheduling of robot actions started by button presses
+
+Animations, speech and lift moves run for seconds, so they are always started in parallel
+and never waited for in the control loop.  ActionScheduler decides which of them runs on
+each actuator group (wheels, lift, head, voice) and when:
+
+    scheduler = ActionScheduler()
+    scheduler.submit('voice', lambda: robot.say_text('Hi', in_parallel=True), key=('say', 'Hi'))
+    while running:
+        scheduler.poll()                # starts queued actions as their group frees up
+        if driving:
+            scheduler.drive_input()     # stops actions that would fight the wheels
+
+* a request whose key matches the action running or queued in its group is coalesced into it
+* a preempting request aborts a running action of the same or lower priority and takes its place
+* any other request waits in its group's queue, highest priority first, then oldest first
+* requests made with drive_preemptible are aborted, or dropped from the queue, by drive input
+
+statistics() reports per group how deep the queue has been and how long requests waited to start.
+"""
+
+import heapq
+import itertools
+import time
+
+GROUPS = ('wheels', 'lift', 'head', 'voice')
+
+# request priorities, higher runs first
+LOW = 0
+NORMAL = 1
+HIGH = 2
+PRIORITIES = {'low': LOW, 'normal': NORMAL, 'high': HIGH}
+
+
+class Request:
+    """One action to start on a group, and the action object once it has started."""
+
+    __slots__ = ('start', 'priority', 'key', 'drive_preemptible', 'submitted', 'action')
+
+    def __init__(self, start, priority, key, drive_preemptible, submitted):
+        self.start = start
+        self.priority = priority
+        self.key = key
+        self.drive_preemptible = drive_preemptible
+        self.submitted = submitted
+        self.action = None
+
+    def running(self):
+        return self.action is not None and self.action.is_running
+
+
+class _Group:
+    """Running request, queue and counters of one actuator group."""
+
+    __slots__ = ('running', 'queue', 'submitted', 'started', 'coalesced', 'preempted', 'dropped',
+                 'max_depth', 'wait_total', 'wait_max')
+
+    def __init__(self):
+        self.running = None
+        self.queue = []  # heap of (-priority, sequence, Request)
+        self.submitted = 0
+        self.started = 0
+        self.coalesced = 0
+        self.preempted = 0  # running actions aborted by a newer request or by drive input
+        self.dropped = 0  # queued requests discarded by drive input
+        self.max_depth = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class ActionScheduler:
+    """
+    Keeps one running action and a priority queue of waiting ones per actuator group.
+    """
+
+    def __init__(self, groups=GROUPS, clock=time.monotonic):
+        """
+        :param groups: names of the actuator groups
+        :param clock: function returning the current time in seconds
+        """
+        self.groups = {name: _Group() for name in groups}
+        self.clock = clock
+        self._sequence = itertools.count()
+        self._queued = 0  # requests queued over all groups, so poll() is free while there are none
+        self._preemptible = []  # (group, request) made with drive_preemptible since the last drive_input()
+
+    def submit(self, group, start, priority=NORMAL, key=None, preempt=True, drive_preemptible=False):
+        """
+        Ask for an action to run on a group.
+
+        :param group: name of the actuator group the action uses
+        :param start: callable that starts the action in parallel and returns it
+        :param priority: LOW, NORMAL or HIGH
+        :param key: hashable identifying requests that are duplicates of each other, None if none are
+        :param preempt: abort a running action of the same or lower priority instead of queueing behind it
+        :param drive_preemptible: abort or drop the request when drive_input() is called
+        :return: the Request, or the running or queued one it was coalesced into
+        """
+        slot = self.groups[group]
+        now = self.clock()
+        slot.submitted += 1
+        if key is not None:
+            running = slot.running
+            if running is not None and running.key == key and running.running():
+                slot.coalesced += 1
+                return running
+            for entry in slot.queue:
+                if entry[2].key == key:
+                    slot.coalesced += 1
+                    return entry[2]
+        request = Request(start, priority, key, drive_preemptible, now)
+        if drive_preemptible:
+            self._preemptible.append((slot, request))
+        running = slot.running
+        if running is not None and running.running():
+            if not preempt or priority < running.priority:
+                self._queue(slot, request)
+                return request
+            running.action.abort()
+            slot.preempted += 1
+        elif slot.queue:
+            # the group has just come free; the request still starts after anything queued ahead of it
+            self._queue(slot, request)
+            request = heapq.heappop(slot.queue)[2]
+            self._queued -= 1
+        self._start(slot, request, now)
+        return request
+
+    def _queue(self, slot, request):
+        heapq.heappush(slot.queue, (-request.priority, next(self._sequence), request))
+        self._queued += 1
+        if len(slot.queue) > slot.max_depth:
+            slot.max_depth = len(slot.queue)
+
+    def _start(self, slot, request, now):
+        wait = now - request.submitted
+        slot.wait_total += wait
+        if wait > slot.wait_max:
+            slot.wait_max = wait
+        slot.started += 1
+        slot.running = request
+        request.action = request.start()
+
+    def poll(self):
+        """
+        Start the next queued action of every group whose running action has finished.
+
+        :return: True if any group still has actions queued
+        """
+        if not self._queued:
+            return False
+        for slot in self.groups.values():
+            if not slot.queue:
+                continue
+            running = slot.running
+            if running is None or not running.running():
+                self._queued -= 1
+                self._start(slot, heapq.heappop(slot.queue)[2], self.clock())
+        return self._queued > 0
+
+    def drive_input(self):
+        """Abort running, and drop queued, drive_preemptible requests, as the driver wants the wheels or the lift."""
+        if not self._preemptible:
+            return
+        for slot, request in self._preemptible:
+            if request is slot.running:
+                if request.running():
+                    request.action.abort()
+                    slot.preempted += 1
+            elif request.action is None:
+                kept = [entry for entry in slot.queue if entry[2] is not request]
+                if len(kept) != len(slot.queue):
+                    slot.dropped += 1
+                    self._queued -= 1
+                    heapq.heapify(kept)
+                    slot.queue = kept
+        del self._preemptible[:]
+
+    def pending(self):
+        """
+        :return: True if any group has actions waiting to start
+        """
+        return self._queued > 0
+
+    def statistics(self):
+        """
+        :return: dict of group name to a dict of its request counts, queue depths and wait times in ms
+        """
+        return {name: {
+            'submitted': slot.submitted,
+            'started': slot.started,
+            'coalesced': slot.coalesced,
+            'preempted': slot.preempted,
+            'dropped': slot.dropped,
+            'queued': len(slot.queue),
+            'max_queued': slot.max_depth,
+            'mean_wait_ms': slot.wait_total / slot.started * 1000 if slot.started else 0.0,
+            'max_wait_ms': slot.wait_max * 1000,
+        } for name, slot in self.groups.items()}
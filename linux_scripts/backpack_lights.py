@@ -0,0 +1,190 @@
+""" Backpack light state tracking and precomputed light animations
+
+BackpackLights wraps a robot and remembers the Light last applied to each of the five
+backpack LEDs, so a light command that would leave every LED as it is never reaches the SDK:
+
+    robot = BackpackLights(robot)
+    robot.set_all_backpack_lights(Colors.RED)   # sent
+    robot.set_all_backpack_lights(Colors.RED)   # skipped
+
+It also plays LightAnimations, sequences of five-LED frames built once up front.  Each call
+to update_lights() shows the frame due at that moment, and only sends it if it differs from the
+frame already showing, so a running animation costs no allocation and a single comparison
+per control loop step:
+
+    robot.play_light_animation(ANIMATIONS['police']())
+    while running:
+        robot.update_lights()
+
+Lights are compared by identity, which matches the cached Lights of the Colors palette.
+Animations and speech started through the wrapper (play_anim, play_anim_trigger, say_text) can
+change the LEDs behind its back, so while one is running, and for the first light command after
+it, nothing is skipped.
+Any other attribute is passed through to the wrapped robot.
+"""
+
+import time
+
+import cozmo
+
+from colors import Colors
+
+OFF = cozmo.lights.off_light
+
+
+class LightAnimation:
+    """
+    Frames of backpack lights shown one after another, each for the same time.
+    """
+
+    def __init__(self, frames, frame_ms=100, loop=True):
+        """
+        :param frames: sequence of frames, each a sequence of five Lights (left, front, center, rear, right)
+        :param frame_ms: milliseconds each frame is shown
+        :param loop: start again from the first frame after the last, instead of holding the last
+        """
+        self.frames = tuple(tuple(frame) for frame in frames)
+        if not self.frames or any(len(frame) != 5 for frame in self.frames):
+            raise ValueError('a light animation needs at least one frame of five lights')
+        self.frame_time = frame_ms / 1000.0
+        self.loop = loop
+        self.duration = None if loop else self.frame_time * len(self.frames)  # seconds until it ends
+
+    def frame_at(self, elapsed):
+        """
+        :param elapsed: seconds since the animation started
+        :return: the frame showing at that point
+        """
+        index = int(elapsed / self.frame_time)
+        if self.loop:
+            index %= len(self.frames)
+        elif index >= len(self.frames):
+            index = len(self.frames) - 1
+        return self.frames[index]
+
+
+def sweep(light, background=None, frame_ms=150):
+    """Light the top LEDs one at a time from front to rear and back again."""
+    background = background or OFF
+    positions = (1, 2, 3, 2)
+    return LightAnimation([tuple(light if led == position else background for led in range(5))
+                           for position in positions], frame_ms)
+
+
+def alternate(first, second, frame_ms=250):
+    """Swap two lights between the left and right halves of the backpack."""
+    return LightAnimation([(first, first, OFF, second, second), (second, second, OFF, first, first)], frame_ms)
+
+
+def pulse(light, frame_ms=200):
+    """Flash every LED on and off together."""
+    return LightAnimation([(light,) * 5, (OFF,) * 5], frame_ms)
+
+
+# animation name in the bindings file to the function building it; Colors are looked up on first use
+ANIMATIONS = {
+    'sweep': lambda: sweep(Colors.BLUE),
+    'police': lambda: alternate(Colors.RED, Colors.BLUE),
+    'pulse': lambda: pulse(Colors.GREEN),
+}
+
+
+class BackpackLights:
+    """
+    Wraps a cozmo robot so backpack light commands are only sent when they change an LED.
+    """
+
+    def __init__(self, robot, clock=time.monotonic):
+        """
+        :param robot: cozmo robot object (or anything with the same methods)
+        :param clock: function returning the current time in seconds
+        """
+        self._robot = robot
+        self._clock = clock
+        self._uniform = {}  # Light to the frame with it on every LED, so setting all lights allocates once per Light
+        self.showing = None  # frame last sent, None until the first or while the LEDs are unknown
+        self.playing = None  # robot action started here that may be changing the LEDs itself
+        self.animation = None
+        self.started = None
+        self.sent = 0
+        self.skipped = 0
+
+    def __getattr__(self, name):
+        return getattr(self._robot, name)
+
+    def _show(self, frame):
+        playing = self.playing
+        if playing is not None:
+            if not getattr(playing, 'is_running', False):
+                self.playing = None
+        elif frame is self.showing or frame == self.showing:
+            self.skipped += 1
+            return
+        self.showing = frame
+        self.sent += 1
+        self._robot.set_backpack_lights(*frame)
+
+    def _robot_action(self, action):
+        self.showing = None
+        self.playing = action
+        return action
+
+    def play_anim(self, *args, **kwargs):
+        return self._robot_action(self._robot.play_anim(*args, **kwargs))
+
+    def play_anim_trigger(self, *args, **kwargs):
+        return self._robot_action(self._robot.play_anim_trigger(*args, **kwargs))
+
+    def say_text(self, *args, **kwargs):
+        return self._robot_action(self._robot.say_text(*args, **kwargs))
+
+    def set_backpack_lights(self, light1, light2, light3, light4, light5):
+        self.animation = None
+        self._show((light1, light2, light3, light4, light5))
+
+    def set_all_backpack_lights(self, light):
+        self.animation = None
+        frame = self._uniform.get(light)
+        if frame is None:
+            frame = self._uniform[light] = (light,) * 5
+        self._show(frame)
+
+    def set_backpack_lights_off(self):
+        self.set_all_backpack_lights(OFF)
+
+    def play_light_animation(self, animation, now=None):
+        """
+        Start an animation, replacing any that is playing, and show its first frame.
+
+        :param animation: LightAnimation to play
+        :param now: current time; defaults to the clock
+        """
+        self.animation = animation
+        self.started = self._clock() if now is None else now
+        self._show(animation.frames[0])
+
+    def update_lights(self, now=None):
+        """
+        Show the frame of the playing animation that is due now, if it is not already showing.
+
+        :param now: current time; defaults to the clock
+        :return: True while an animation is playing
+        """
+        animation = self.animation
+        if animation is None:
+            return False
+        if now is None:
+            now = self._clock()
+        elapsed = now - self.started
+        frame = animation.frame_at(elapsed)
+        if frame is not self.showing:  # frames are built up front, so identity tells them apart
+            self._show(frame)
+        if animation.duration is not None and elapsed >= animation.duration:
+            self.animation = None  # finished, holding its last frame
+        return True
+
+    def statistics(self):
+        """
+        :return: a tuple containing (light commands sent, light commands skipped)
+        """
+        return self.sent, self.skipped
@@ -0,0 +1,250 @@
+""" Button bindings for the Linux front end, loaded from a JSON file
+
+The file maps button names (the button constants of the xbox module, e.g. "A" or "DPAD_UP")
+to the action a press carries out, and sets the drive speeds:
+
+    {
+        "buttons": {
+            "A": {"action": "animation", "name": "anim_petdetection_dog_01"},
+            "B": {"action": "animation", "name": "anim_petdetection_dog_02", "body": true},
+            "DPAD_UP": {"action": "lights_off"},
+            "DPAD_DOWN": {"action": "lights", "color": "BLUE"},
+            "RIGHT_THUMB": {"action": "light_animation", "name": "police"},
+            "BACK": {"action": "say", "text": "Beep beep beep!", "queue": true, "priority": "low"}
+        },
+        "drive": {"forward_speed": 150, "turn_speed": 100, "boost_forward_speed": 300, "boost_turn_speed": 200}
+    }
+
+Animations and speech go through an action_scheduler.ActionScheduler on the 'voice' group.  By
+default a press cuts off whatever is playing; with "queue": true it waits its turn instead,
+ordered by "priority" ("low", "normal" or "high").  Pressing the button of an animation or phrase
+that is still playing or queued does nothing.  An animation with "body": true also moves the
+wheels and the lift, so any drive or lift input cancels it.
+
+Each binding is compiled once into a function stored under its button bit, so a press costs a
+single dict lookup.  The file is checked for changes about once a second and re-applied while
+the robot stays connected; a file that fails to load is reported and the previous bindings kept.
+The guide button always ends the program and cannot be bound.  Set COZMO_BINDINGS to use a file
+other than the bindings.json next to this module.
+"""
+
+import json
+import os
+import time
+
+import xbox
+from action_scheduler import PRIORITIES
+from backpack_lights import ANIMATIONS
+from colors import Colors
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bindings.json')
+
+# button names accepted in the file
+BUTTONS = {name: getattr(xbox, name) for name in (
+    'A', 'B', 'X', 'Y', 'DPAD_UP', 'DPAD_DOWN', 'DPAD_LEFT', 'DPAD_RIGHT', 'BACK', 'START',
+    'LEFT_BUMPER', 'RIGHT_BUMPER', 'LEFT_THUMB', 'RIGHT_THUMB')}
+
+# drive settings and their values when the file leaves them out
+DRIVE_DEFAULTS = {
+    'forward_speed': 150.0,
+    'turn_speed': 100.0,
+    'boost_forward_speed': 300.0,  # while the left bumper is held
+    'boost_turn_speed': 200.0,  # while the right bumper is held
+    'expo': 0.3,
+    'acceleration': 600.0,
+    'head_speed': 1.0,  # radians per second with the right stick fully up or down
+}
+
+
+def priority_value(priority):
+    value = PRIORITIES.get(priority)
+    if value is None:
+        raise ValueError("unknown priority '{0}'".format(priority))
+    return value
+
+
+def animation(name, priority='normal', queue=False, body=False):
+    """Play an animation without blocking; unless body is set it leaves the wheels and lift free for driving."""
+    value = priority_value(priority)
+    key = ('animation', name)
+
+    def run(robot, scheduler):
+        scheduler.submit('voice', lambda: robot.play_anim(name=name, in_parallel=True, ignore_body_track=not body,
+                                                          ignore_lift_track=not body),
+                         value, key, preempt=not queue, drive_preemptible=body)
+    return run
+
+
+def lights(color):
+    """Set all backpack lights to one of the Colors."""
+    light = getattr(Colors, color, None)
+    if light is None or color.startswith('_'):
+        raise ValueError("unknown color '{0}'".format(color))
+
+    def run(robot, scheduler):
+        robot.set_all_backpack_lights(light)
+    return run
+
+
+def lights_off():
+    """Turn the backpack lights off."""
+    def run(robot, scheduler):
+        robot.set_backpack_lights_off()
+    return run
+
+
+def light_animation(name):
+    """Play one of the backpack_lights.ANIMATIONS until another light action replaces it."""
+    build = ANIMATIONS.get(name)
+    if build is None:
+        raise ValueError("unknown light animation '{0}'".format(name))
+    animation = build()  # frames are built once, here, rather than on every press
+
+    def run(robot, scheduler):
+        robot.play_light_animation(animation)
+    return run
+
+
+def say(text, priority='normal', queue=False):
+    """Speak alongside driving, cutting off any speech or animation still playing unless queue is set."""
+    value = priority_value(priority)
+    key = ('say', text)
+
+    def run(robot, scheduler):
+        scheduler.submit('voice', lambda: robot.say_text(text, in_parallel=True), value, key, preempt=not queue)
+    return run
+
+
+# action name in the file to the function compiling it; the binding's other keys are its arguments
+ACTIONS = {
+    'animation': animation,
+    'lights': lights,
+    'lights_off': lights_off,
+    'light_animation': light_animation,
+    'say': say,
+}
+
+
+def compile_bindings(config):
+    """
+    :param config: parsed bindings file
+    :return: a tuple containing (dict of button bit to action function, dict of drive settings)
+    :raises ValueError: if the config names an unknown button, action, argument or setting, or
+                        any part of it has the wrong type
+    """
+
+    if not isinstance(config, dict):
+        raise ValueError('bindings must be a JSON object')
+    buttons = config.get('buttons', {})
+    if not isinstance(buttons, dict):
+        raise ValueError("'buttons' must be a JSON object")
+    table = {}
+    for button, binding in buttons.items():
+        if button == 'GUIDE':
+            raise ValueError('GUIDE is reserved for ending the program')
+        if button not in BUTTONS:
+            raise ValueError("unknown button '{0}'".format(button))
+        if not isinstance(binding, dict):
+            raise ValueError('{0}: binding must be a JSON object'.format(button))
+        arguments = dict(binding)
+        action = ACTIONS.get(arguments.pop('action', None))
+        if action is None:
+            raise ValueError("{0}: unknown action '{1}'".format(button, binding.get('action')))
+        try:
+            table[BUTTONS[button]] = action(**arguments)
+        except (TypeError, AttributeError) as e:  # missing or unexpected arguments, or ones of the wrong type
+            raise ValueError('{0}: {1}'.format(button, e))
+
+    settings = config.get('drive', {})
+    if not isinstance(settings, dict):
+        raise ValueError("'drive' must be a JSON object")
+    drive = dict(DRIVE_DEFAULTS)
+    for name, value in settings.items():
+        if name not in DRIVE_DEFAULTS:
+            raise ValueError("unknown drive setting '{0}'".format(name))
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("drive setting '{0}' must be a number".format(name))
+        drive[name] = float(value)
+    return table, drive
+
+
+class Bindings:
+    """
+    Button dispatch table and drive settings, kept in step with a bindings file.
+    Example:
+    bindings = Bindings()
+    bindings.reload_if_changed()
+    bindings.press(robot, scheduler, xbox.A)
+    """
+
+    def __init__(self, path=None, check_interval=1.0, clock=time.monotonic):
+        """
+        :param path: JSON bindings file; None for COZMO_BINDINGS, or DEFAULT_PATH if that is not set
+        :param check_interval: seconds between checks of the file's modification time
+        :param clock: function returning the current time in seconds
+        :raises ValueError: if the file cannot be loaded
+        """
+        self.path = path or os.environ.get('COZMO_BINDINGS', DEFAULT_PATH)
+        self.check_interval = check_interval
+        self.clock = clock
+        self.version = 0  # bumped on every successful load, so users can tell when to re-apply settings
+        self.modified = None
+        self.checked = clock()
+        self.load()
+
+    def load(self):
+        """
+        Read and compile the bindings file, replacing the current bindings.
+
+        :raises ValueError: if the file is missing, not JSON or not valid bindings
+        """
+        try:
+            modified = os.stat(self.path).st_mtime
+            with open(self.path) as f:
+                config = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            raise ValueError('cannot read bindings from {0}: {1}'.format(self.path, e))
+        try:
+            table, drive = compile_bindings(config)
+        except Exception as e:  # whatever is wrong with the file, it must not take the control loop down
+            raise ValueError('invalid bindings in {0}: {1}'.format(self.path, e))
+        self.table, self.drive = table, drive
+        self.modified = modified
+        self.version += 1
+
+    def reload_if_changed(self):
+        """
+        Reload the file if check_interval has passed and it has been modified since the last load.
+
+        :return: True if new bindings were loaded
+        """
+        now = self.clock()
+        if now - self.checked < self.check_interval:
+            return False
+        self.checked = now
+        try:
+            modified = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if modified == self.modified:
+            return False
+        try:
+            self.load()
+        except ValueError as e:
+            self.modified = modified  # don't retry until the file changes again
+            print('Keeping the previous bindings: {0}'.format(e))
+            return False
+        print('Reloaded bindings from {0}'.format(self.path))
+        return True
+
+    def press(self, robot, scheduler, button):
+        """
+        Carry out the action bound to a button that has just been pressed, if any.
+
+        :param robot: cozmo robot object
+        :param scheduler: action_scheduler.ActionScheduler starting the robot's actions
+        :param button: xbox button bit that went down
+        """
+        run = self.table.get(button)
+        if run is not None:
+            run(robot, scheduler)
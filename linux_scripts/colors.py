@@ -7,37 +7,76 @@ Helper class for Cozmo light colors
 @author - Wizards of Coz
 '''
 
+# RGBA value of each palette color
+COLOR_VALUES = {
+    'gray': 0x808080ff,
+    'magenta': 0xff00ffff,
+    'yellow': 0xffff00ff,
+    'green': 0x00ff00ff,
+    'red': 0xff0000ff,
+    'blue': 0x00ffffff,
+    'white': 0xffffffff,
+}
+
+_colors = {}
+
+
+def color(name):
+    """
+    :param name: key of COLOR_VALUES, 'black' or 'off'
+    :return: the Color, built on first use and shared by every Light using it
+    """
+    value = _colors.get(name)
+    if value is None:
+        value = _colors[name] = Color(name=name, int_color=COLOR_VALUES.get(name, 0x00000000))
+    return value
+
+
+class _Lazy(object):
+    """ Palette entry whose Light is built the first time it is read, then cached on the class """
+
+    def __init__(self, name, build, *args):
+        self.name = name
+        self.build = build
+        self.args = args
+
+    def __get__(self, instance, owner):
+        light = self.build(*self.args)
+        setattr(owner, self.name, light)  # replaces this descriptor, so later reads are plain lookups
+        return light
+
+
+def _solid(name):
+    return Light(color(name))
+
+
+def _flashing(name, on_period_ms, off_period_ms):
+    return Light(on_color=color(name), off_color=color('black'), on_period_ms=on_period_ms, off_period_ms=off_period_ms)
+
 
 class Colors:
-    """ Class to define common colors to be used """
-    GRAY_2 = Light(on_color=Color(name="gray", int_color=0x808080ff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-    MAGENTA_2 = Light(on_color=Color(name="magenta", int_color=0xff00ffff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-    YELLOW_2 = Light(on_color=Color(name="yellow", int_color=0xffff00ff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-    GREEN_2 = Light(on_color=Color(name="green", int_color=0x00ff00ff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-    RED_2 = Light(on_color=Color(name="red", int_color=0xff0000ff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-    BLUE_2 = Light(on_color=Color(name="blue", int_color=0x00ffffff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-    WHITE_2 = Light(on_color=Color(name="white", int_color=0xffffffff), off_color=Color(name="black", int_color=0x00000000),on_period_ms=1000, off_period_ms=500);
-
-    GRAY_1 = Light(on_color=Color(name="gray", int_color=0x808080ff),
-                   off_color=Color(name="black", int_color=0x00000000), on_period_ms=200, off_period_ms=200);
-    MAGENTA_1 = Light(on_color=Color(name="magenta", int_color=0xff00ffff),
-                      off_color=Color(name="black", int_color=0x00000000), on_period_ms=200, off_period_ms=200);
-    YELLOW_1 = Light(on_color=Color(name="yellow", int_color=0xffff00ff),
-                     off_color=Color(name="black", int_color=0x00000000), on_period_ms=200, off_period_ms=200);
-    GREEN_1 = Light(on_color=Color(name="green", int_color=0x00ff00ff),
-                    off_color=Color(name="black", int_color=0x00000000), on_period_ms=200, off_period_ms=200);
-    RED_1 = Light(on_color=Color(name="red", int_color=0xff0000ff), off_color=Color(name="black", int_color=0x00000000),
-                  on_period_ms=200, off_period_ms=200);
-    BLUE_1 = Light(on_color=Color(name="blue", int_color=0x00ffffff),
-                   off_color=Color(name="black", int_color=0x00000000), on_period_ms=200, off_period_ms=200);
-    WHITE_1 = Light(on_color=Color(name="white", int_color=0xffffffff),
-                    off_color=Color(name="black", int_color=0x00000000), on_period_ms=200, off_period_ms=200);
-
-    WHITE = Light(Color(name="white", int_color=0xffffffff))
-    RED = Light(Color(name="red", int_color=0xff0000ff))
-    GREEN = Light(Color(name="green", int_color=0x00ff00ff))
-    BLUE = Light(Color(name="blue", int_color=0x00ffffff))
-    MAGENTA = Light(Color(name="magenta", int_color=0xff00ffff))
-    YELLOW = Light(Color(name="yellow", int_color=0xffff00ff))
-    GRAY = Light(Color(name="gray", int_color=0x808080ff))
-    OFF = Light(Color(name="off"))
+    """ Class to define common colors to be used; each Light is built on first use and then reused """
+    GRAY_2 = _Lazy('GRAY_2', _flashing, 'gray', 1000, 500)
+    MAGENTA_2 = _Lazy('MAGENTA_2', _flashing, 'magenta', 1000, 500)
+    YELLOW_2 = _Lazy('YELLOW_2', _flashing, 'yellow', 1000, 500)
+    GREEN_2 = _Lazy('GREEN_2', _flashing, 'green', 1000, 500)
+    RED_2 = _Lazy('RED_2', _flashing, 'red', 1000, 500)
+    BLUE_2 = _Lazy('BLUE_2', _flashing, 'blue', 1000, 500)
+    WHITE_2 = _Lazy('WHITE_2', _flashing, 'white', 1000, 500)
+
+    GRAY_1 = _Lazy('GRAY_1', _flashing, 'gray', 200, 200)
+    MAGENTA_1 = _Lazy('MAGENTA_1', _flashing, 'magenta', 200, 200)
+    YELLOW_1 = _Lazy('YELLOW_1', _flashing, 'yellow', 200, 200)
+    GREEN_1 = _Lazy('GREEN_1', _flashing, 'green', 200, 200)
+    RED_1 = _Lazy('RED_1', _flashing, 'red', 200, 200)
+    BLUE_1 = _Lazy('BLUE_1', _flashing, 'blue', 200, 200)
+    WHITE_1 = _Lazy('WHITE_1', _flashing, 'white', 200, 200)
+
+    WHITE = _Lazy('WHITE', _solid, 'white')
+    RED = _Lazy('RED', _solid, 'red')
+    GREEN = _Lazy('GREEN', _solid, 'green')
+    BLUE = _Lazy('BLUE', _solid, 'blue')
+    MAGENTA = _Lazy('MAGENTA', _solid, 'magenta')
+    YELLOW = _Lazy('YELLOW', _solid, 'yellow')
+    GRAY = _Lazy('GRAY', _solid, 'gray')
+    OFF = _Lazy('OFF', _solid, 'off')
@@ -2,117 +2,282 @@
 Authors: Matthew Dargan, Daniel Stutz
 """
 
+import argparse
+import os
+import sys
+import time
+
 import cozmo
-from cozmo.util import radians
 
 import xbox
-from colors import Colors
+from action_scheduler import ActionScheduler
+from backpack_lights import BackpackLights
+from bindings import Bindings
+from shared_joystick import SharedJoystick
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared_scripts'))
+import drive
+import fleet
+import latency
+import recording
+import shaping
+import ticker
+
+monitor = latency.from_environment()  # set COZMO_LATENCY=1 to measure input-to-command latency
+
+RATE = float(os.environ.get('COZMO_RATE', 100))  # control loop iterations per second, COZMO_RATE to change
+IDLE_WAIT = 1.0  # longest sleep waiting for input while idle, so edits to the bindings are still picked up
+LIFT_STEPS = 20  # lift heights the triggers choose between, so a trigger held nearly still settles the lift
 
 
-def cozmo_program(robot: cozmo.robot.Robot):
+def cozmo_program(robot: cozmo.robot.Robot, joy=None, clock=time.monotonic, sleep=time.sleep):
     """
     Main function controlling the state of cozmo based on the Xbox controller inputs.
 
     :param robot: cozmo robot object
+    :param joy: xbox.Joystick (or anything with the same methods); None opens the controller
+    :param clock: function returning the current time in seconds, for pacing and the pilot
+    :param sleep: function sleeping for a number of seconds, for pacing
     """
 
-    joy = xbox.Joystick()
+    if joy is None:
+        joy = open_joystick()
+    pilot = Pilot(joy, monitor.instrument(robot), monitor, clock=clock)
+    pacer = ticker.Ticker(RATE, clock, sleep)
 
     # continous loop that checks for Xbox controller input until we are done with the program
     # Note: Xbox home button will be used to terminate
-    while not joy.Guide():
-        y = joy.leftY()  # get y-axis input from left stick before if statements
-        x = joy.rightX()  # get x-axis input from left stick before if statements
-        left_trigger = joy.leftTrigger()  # get scalar for the left trigger
-        right_trigger = joy.rightTrigger()  # get scalar for the right trigger and negate it
-
-        movement_speed = 150
-        rotate_speed = 175
-
-        if y:
-            cozmo_movement(robot, scalar=y, speed=movement_speed)
-
-        elif x:
-            cozmo_rotate(robot, scalar=x, speed=rotate_speed)
-
-        elif left_trigger:
-            # move the lift height up by some scalar
-            robot.set_lift_height(left_trigger).wait_for_completed()
-
-        elif right_trigger:
-            # move the lift height down by some scalar
-            robot.set_lift_height(1 - right_trigger).wait_for_completed()
-
-        elif joy.leftBumper():
-            # double the speed if the left bumper is pressed
-            movement_speed = movement_speed * 2
-
-        elif joy.rightBumper():
-            # double the rotational speed if the right bumper is pressed
-            rotate_speed = rotate_speed * 2
-
-        elif joy.A():
-            # woof
-            robot.play_anim(name="anim_petdetection_dog_01").wait_for_completed()
-
-        elif joy.B():
-            # bark
-            robot.play_anim(name="anim_petdetection_dog_02").wait_for_completed()
-
-        elif joy.X():
-            # dog 3
-            robot.play_anim(name="anim_petdetection_dog_03").wait_for_completed()
-
-        elif joy.Y():
-            # good boy
-            robot.play_anim(name="anim_petdetection_dog_04").wait_for_completed()
-
-        elif joy.dpadUp():
-            robot.set_backpack_lights_off()
-
-        elif joy.dpadDown():
-            robot.set_all_backpack_lights(Colors.BLUE)
-
-        elif joy.dpadLeft():
-            robot.set_all_backpack_lights(Colors.RED)
-
-        elif joy.dpadRight():
-            robot.set_all_backpack_lights(Colors.GREEN)
-
-        elif joy.Back():
-            robot.say_text("Beep beep beep!")
-
-        elif joy.Start():
-            robot.say_text("You're a legend!")
-
+    while pilot.step():
+        if pilot.idle():
+            # nothing will move until the input changes, so sleep on the controller instead of ticking
+            pacer.pause()
+            joy.wait_for_change(IDLE_WAIT)
+            pilot.resume()
+        pacer.wait()
+
+    pilot.stop()
     joy.close()
+    if joy.recorder is not None:
+        joy.recorder.close()
+    print('Control loop:', pacer.statistics())
+    print('Actions:', pilot.scheduler.statistics())
 
 
-def cozmo_movement(robot: cozmo.robot.Robot, scalar, speed=150):
+def fleet_program(robots, rate=RATE):
     """
-    Asynchronous wrapper function that moves cozmo linearly.
+    Drive several robots at once, each from its own controller, in a single loop.
+    Controller n is the n-th one xboxdrv finds and drives robots[n]; each pair stops when its
+    Xbox home button is pressed, and per-pair loop rates are printed at the end.
 
-    :param robot: cozmo robot object
-    :param scalar: scalar of distance to move cozmo
-    :param speed: speed that cozmo should move at
+    :param robots: list of cozmo robot objects
+    :param rate: control steps per second for each pair
     """
 
-    # TODO: Change speed parameter to do some cool scalar math
-    robot.drive_straight(cozmo.util.distance_mm(scalar), cozmo.util.speed_mmps(speed)).wait_for_completed()
+    runner = fleet.Fleet(rate)
+    bindings = Bindings()  # shared, so an edit to the file reaches every pair
+    joysticks = []
+    try:
+        for number, robot in enumerate(robots):
+            command = ['xboxdrv', '--no-uinput', '--detach-kernel-driver', '--id', str(number)]
+            joy = xbox.Joystick(command=command)  # unthreaded: the fleet's selector drains every pipe
+            joysticks.append(joy)
+            runner.add('controller {0}'.format(number), joy, Pilot(joy, robot, bindings=bindings))
+        runner.run()
+    finally:
+        for pair in runner.pairs:
+            if pair.finished is None:
+                runner.finish(pair)
+        for joy in joysticks:
+            joy.close()
+        runner.close()
+    for name, stats in sorted(runner.report().items()):
+        print(name, stats)
+
+
+class Pilot:
+    """
+    Control state for one controller and robot pair. cozmo_program runs a single pilot,
+    fleet_program one per pair.
 
+    Each step runs one channel per actuator (buttons, wheels, lift, head, lights), every one
+    computing its own command from the same snapshot, so driving, turning, the lift and the head
+    can all be worked at once. A channel that raises is reported and skipped for that step
+    without holding up the others.
+    """
 
-def cozmo_rotate(robot: cozmo.robot.Robot, scalar, speed=175):
+    CHANNELS = ('buttons', 'wheels', 'lift', 'head', 'lights')
+
+    def __init__(self, joy, robot: cozmo.robot.Robot, monitor=None, bindings=None, clock=time.monotonic):
+        """
+        :param joy: xbox.Joystick (or anything with the same methods) to read input from
+        :param robot: cozmo robot object
+        :param monitor: latency.LatencyMonitor told about every frame, or None
+        :param bindings: bindings.Bindings for the buttons and drive speeds; None loads bindings.json
+        :param clock: function returning the current time in seconds, for the drive ramp, command
+                      rate limits, light animations and action wait times
+        """
+
+        self.joy = joy
+        self.motors = shaping.CommandShaper(robot, clock=clock)  # only send motor commands that change something
+        self.robot = BackpackLights(self.motors, clock)  # and light commands; everything else passes through
+        self.monitor = monitor if monitor is not None else latency.NullMonitor()
+        # edits to the file happen in real time, so the bindings keep checking it on the real clock
+        self.bindings = bindings if bindings is not None else Bindings()
+        # proportional wheel speeds from the sticks, with speeds and ramp set by the bindings
+        self.mixer = drive.DriveMixer(clock=clock)
+        self.applied = None  # version of the bindings whose drive settings the mixer has
+        self.scheduler = ActionScheduler(clock=clock)  # animations, speech and lift moves, per actuator group
+        self.lift_target = None  # lift height the triggers ask for
+        self.lift_height = None  # lift height last requested from the robot
+        self.head_speed = 0.0  # head speed last requested
+        self.channels = [(name, getattr(self, name + '_channel')) for name in self.CHANNELS]
+        self.errors = dict.fromkeys(self.CHANNELS, 0)  # exceptions raised by each channel
+
+    def step(self, now=None):
+        """
+        Act on the controller input that has arrived since the last step.
+
+        :param now: current time for light animations, None for the clock; fleet.Fleet passes it
+        :return: False once the Xbox home button has been pressed, otherwise True
+        """
+
+        joy = self.joy
+        # one frame per iteration so every channel agrees, from the same drain as the events
+        events, state = joy.poll()
+        # buttons act once when pressed, however long they are held down
+        pressed = [event.code for event in events if event.kind == xbox.BUTTON_DOWN]
+        if xbox.GUIDE in pressed:
+            return False
+        self.monitor.frame(joy.frameCount, state.timestamp)
+        self.bindings.reload_if_changed()
+        self.scheduler.poll()
+        for name, channel in self.channels:
+            try:
+                channel(state, pressed, now)
+            except Exception as e:
+                self.errors[name] += 1
+                if self.errors[name] == 1:
+                    print('{0} channel failed, the others carry on: {1!r}'.format(name, e))
+        return True
+
+    def buttons_channel(self, state, pressed, now):
+        """Carry out the bindings of the buttons pressed since the last step."""
+        for button in pressed:
+            self.bindings.press(self.robot, self.scheduler, button)
+
+    def wheels_channel(self, state, pressed, now):
+        """
+        Stream wheel speeds mixed from the left stick (drive) and the right stick (turn), stopping
+        if the controller drops out; the speeds are boosted while the bumpers are held.
+        """
+        mixer = self.mixer
+        bindings = self.bindings
+        settings = bindings.drive
+        if self.applied != bindings.version:
+            mixer.forward_speed = settings['forward_speed']
+            mixer.turn_speed = settings['turn_speed']
+            mixer.expo = settings['expo']
+            mixer.acceleration = settings['acceleration']
+            self.applied = bindings.version
+        if state.connected():
+            speeds = mixer.mix(state.leftY(), state.rightX(),
+                               settings['boost_forward_speed'] if state.leftBumper() else None,
+                               settings['boost_turn_speed'] if state.rightBumper() else None)
+        else:
+            speeds = (0, 0)
+        if speeds[0] or speeds[1]:
+            self.scheduler.drive_input()  # the driver takes the wheels back from any animation using them
+        left_speed, right_speed = mixer.step(*speeds)
+        self.motors.drive_wheels(left_speed, right_speed, mixer.acceleration, mixer.acceleration)
+
+    def lift_channel(self, state, pressed, now):
+        """
+        Left trigger raises the lift, right trigger lowers it.  The height is quantized to
+        LIFT_STEPS positions and a new one retargets the move in progress at most as often as the
+        shaper allows set_lift_height, so the lift keeps moving while a trigger is squeezed and
+        settles once it is held still.
+        """
+        left_trigger = state.leftTrigger()
+        right_trigger = state.rightTrigger()
+        if left_trigger or right_trigger:
+            self.lift_target = round((left_trigger if left_trigger else 1 - right_trigger) * LIFT_STEPS) / LIFT_STEPS
+        height = self.lift_target
+        if height != self.lift_height and self.motors.allow('set_lift_height', (height,)):
+            self.scheduler.drive_input()  # the driver takes the lift back from any animation using it
+            robot = self.robot
+            self.scheduler.submit('lift', lambda: robot.set_lift_height(height, in_parallel=True))
+            self.lift_height = height
+
+    def head_channel(self, state, pressed, now):
+        """Tilt the head at a speed proportional to the right stick's vertical axis."""
+        speed = state.rightY() * self.bindings.drive['head_speed'] if state.connected() else 0.0
+        if speed or self.head_speed:
+            self.motors.move_head(speed)
+            self.head_speed = speed
+
+    def lights_channel(self, state, pressed, now):
+        """Advance any backpack light animation that is playing."""
+        self.robot.update_lights(now)
+
+    def idle(self):
+        """
+        :return: True if the wheels and head are stopped, no light animation is playing, no lift
+                 height is waiting to be sent and no action is queued, so stepping again before
+                 new input would do nothing
+        """
+        return (self.mixer.stopped() and not self.head_speed
+                and self.lift_target == self.lift_height
+                and self.robot.animation is None and not self.scheduler.pending())
+
+    def resume(self):
+        """
+        Carry on after sleeping on the controller while idle: the wheels were stopped, so the drive
+        ramp starts again from rest rather than counting the time slept as time to accelerate.
+        """
+        self.mixer.reset()
+
+    def stop(self):
+        self.robot.stop_all_motors()
+
+
+def open_joystick():
     """
-    Asynchronous wrapper function that rotates cozmo.
+    Start the controller, or replay a recording in its place when COZMO_REPLAY is set.
+    When COZMO_SHM is set (to 1, or the path of the shared file) the controller is read from a
+    running shared_state.py, so other programs can use it too.  When COZMO_XBOXD names the socket
+    of a running xboxd.py, its xboxdrv is used instead of starting a new one.  The session is
+    recorded when COZMO_RECORD is set, unless the controller is shared.
 
-    :param robot: cozmo robot object
-    :param scalar: angle that cozmo should rotate
-    :param speed: speed that cozmo should rotate at
+    :return: xbox.Joystick reading from xboxdrv, xboxd or the recording, or a SharedJoystick
     """
 
-    # TODO: Change speed parameter to do some cool scalar math
-    robot.turn_in_place(angle=radians(-scalar), num_retries=2, speed=radians(speed)).wait_for_completed()
+    command = None
+    daemon = None
+    replay = os.environ.get('COZMO_REPLAY')
+    shared = os.environ.get('COZMO_SHM')
+    if replay:
+        command = recording.replay_command(replay, float(os.environ.get('COZMO_REPLAY_SPEED', 1)))
+    elif shared:
+        return SharedJoystick(None if shared == '1' else shared)
+    else:
+        daemon = os.environ.get('COZMO_XBOXD')
+    # reader thread keeps the pipe drained while actions block
+    joy = xbox.Joystick(threaded=True, command=command, daemon=daemon)
+    print("Controller attached in {0:.0f} ms".format(joy.attachTime * 1000))
+    record = os.environ.get('COZMO_RECORD')
+    if record:
+        joy.recorder = recording.Recorder(record, recording.XBOXDRV)
+    return joy
 
 
 if __name__ == '__main__':
-    cozmo.run_program(cozmo_program, use_viewer=False, force_viewer_on_top=False)
+    parser = argparse.ArgumentParser(description='Drive Cozmo with an Xbox 360 controller.')
+    parser.add_argument('--fleet', nargs='+', metavar='SERIAL',
+                        help='drive one robot per mobile device serial number, each with its own controller')
+    parser.add_argument('--ios', action='store_true', help='the --fleet devices are iOS rather than Android')
+    args = parser.parse_args()
+    if args.fleet:
+        with fleet.robot_connections(args.fleet, args.ios) as robots:
+            fleet_program(robots)
+    else:
+        cozmo.run_program(cozmo_program, use_viewer=False, force_viewer_on_top=False)
@@ -0,0 +1,237 @@
+""" Native evdev backend for the Xbox 360 controller
+
+Reads binary input_event records straight from the kernel's xpad driver, so no xboxdrv
+subprocess is needed and nothing is formatted to text and parsed back again.  EvdevJoystick
+offers exactly the same methods as xbox.Joystick, including snapshot() and threaded mode.
+
+Example usage:
+
+    from evdev_joystick import EvdevJoystick
+    joy = EvdevJoystick()                           #First joystick found under /dev/input/by-id
+    joy = EvdevJoystick('/dev/input/event5')        #A specific event node
+    joy = EvdevJoystick(fd)                         #Any readable file descriptor, e.g. a pipe
+
+The user needs read access to the event node (usually membership of the 'input' group).
+
+The state of every button and axis is read back from the device with the EVIOCGKEY and
+EVIOCGABS ioctls when it is opened and whenever the kernel reports SYN_DROPPED (its event buffer
+overflowed, so some events, releases included, were lost).  A source that is not an event node,
+such as a pipe, cannot be asked; after a drop it reads as disconnected, with every button
+released and every axis centered, until its next complete report.
+"""
+
+import errno
+import fcntl
+import glob
+import os
+import select
+import struct
+
+import xbox
+
+# struct input_event from <linux/input.h>: struct timeval time; __u16 type; __u16 code; __s32 value;
+EVENT = struct.Struct('llHHi')
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+SYN_DROPPED = 3
+
+# Absolute axis codes reported by xpad
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_Z = 0x02        #left trigger
+ABS_RX = 0x03
+ABS_RY = 0x04
+ABS_RZ = 0x05       #right trigger
+ABS_HAT0X = 0x10    #dpad left/right
+ABS_HAT0Y = 0x11    #dpad up/down
+
+# Key codes reported by xpad, mapped onto Snapshot button bits.  The BTN_TRIGGER_HAPPY codes are
+# used for the dpad when xpad is loaded with dpad_to_buttons=1, otherwise the dpad is ABS_HAT0X/Y.
+KEY_BUTTONS = {
+    0x130: xbox.A,              #BTN_A
+    0x131: xbox.B,              #BTN_B
+    0x133: xbox.X,              #BTN_X
+    0x134: xbox.Y,              #BTN_Y
+    0x136: xbox.LEFT_BUMPER,    #BTN_TL
+    0x137: xbox.RIGHT_BUMPER,   #BTN_TR
+    0x13a: xbox.BACK,           #BTN_SELECT
+    0x13b: xbox.START,          #BTN_START
+    0x13c: xbox.GUIDE,          #BTN_MODE
+    0x13d: xbox.LEFT_THUMB,     #BTN_THUMBL
+    0x13e: xbox.RIGHT_THUMB,    #BTN_THUMBR
+    0x2c0: xbox.DPAD_LEFT,      #BTN_TRIGGER_HAPPY1
+    0x2c1: xbox.DPAD_RIGHT,     #BTN_TRIGGER_HAPPY2
+    0x2c2: xbox.DPAD_UP,        #BTN_TRIGGER_HAPPY3
+    0x2c3: xbox.DPAD_DOWN,      #BTN_TRIGGER_HAPPY4
+}
+
+# Events read per system call
+READ_EVENTS = 256
+
+# ioctls reading the device's current state, from <linux/input.h>
+KEY_MAX = 0x2ff
+EVIOCGKEY = (2 << 30) | (((KEY_MAX + 7) // 8) << 16) | (ord('E') << 8) | 0x18    #_IOC(_IOC_READ, 'E', 0x18, len)
+ABSINFO = struct.Struct('6i')   #struct input_absinfo: value, minimum, maximum, fuzz, flat, resolution
+AXES = (ABS_X, ABS_Y, ABS_RX, ABS_RY, ABS_Z, ABS_RZ, ABS_HAT0X, ABS_HAT0Y)
+
+def eviocgabs(code):
+    return (2 << 30) | (ABSINFO.size << 16) | (ord('E') << 8) | (0x40 + code)   #_IOR('E', 0x40 + abs, struct input_absinfo)
+
+class EvdevJoystick(xbox.JoystickBase):
+
+    """Joystick backed by a /dev/input/event* node instead of xboxdrv.
+    device may be a path, an already open file descriptor (which is then left open on close),
+    or None to pick the first joystick listed under /dev/input/by-id.  triggerMax is the raw
+    value of a fully pulled trigger: 255 for Xbox 360 pads, 1023 for Xbox One pads.
+    As with xbox.Joystick, a recorder set on the joystick is handed every byte read, and
+    connected() goes True once the first complete report is received.
+    """
+    def __init__(self,device=None,refreshRate=30,threaded=False,triggerMax=255,eventLimit=64):
+        if device is None:
+            nodes = sorted(glob.glob('/dev/input/by-id/*-event-joystick'))
+            if not nodes:
+                raise IOError('No Xbox controller/receiver found')
+            device = nodes[0]
+        if isinstance(device, int):
+            self.pipe = device
+            self.ownsDevice = False
+        else:
+            self.pipe = os.open(device, os.O_RDONLY)
+            self.ownsDevice = True
+        super(EvdevJoystick, self).__init__(refreshRate, eventLimit)
+        self.triggerMax = triggerMax
+        #
+        # Values accumulated from events since the last SYN_REPORT: lx, ly, rx, ry, lt, rt
+        self.axes = [0, 0, 0, 0, 0, 0]
+        self.buttons = 0
+        self.dropping = False   #set after SYN_DROPPED until the next SYN_REPORT
+        #
+        self.buffer = bytearray(READ_EVENTS * EVENT.size)
+        self.bufferView = memoryview(self.buffer)
+        self.buffered = 0       #bytes of a partial record carried over (only possible on pipes)
+        #
+        self.resync()           #buttons already held and sticks already off center
+        if threaded:
+            self.startReader()
+
+    """Read every event record available on the device and publish a new Snapshot for the last
+    complete report among them.  Must only be called once select() has reported it readable.
+    """
+    def readAvailable(self):
+        latest = None
+        readable = True
+        while readable:
+            try:
+                count = os.readv(self.pipe, [self.bufferView[self.buffered:]])
+            except OSError as e:
+                if e.errno == errno.ENODEV:
+                    count = 0
+                else:
+                    raise
+            # End of file, or ENODEV from an event node, means the controller has been unplugged.
+            if count == 0:
+                raise IOError('Xbox controller disconnected from USB')
+            end = self.buffered + count
+            if self.recorder is not None:
+                self.recorder.write(self.bufferView[self.buffered:end])
+            whole = end - end % EVENT.size
+            report = self.decode(EVENT.iter_unpack(self.bufferView[:whole]))
+            if report is not None:
+                latest = report
+            # Keep a trailing partial record for the next read
+            self.buffered = end - whole
+            self.buffer[0:self.buffered] = self.buffer[whole:end]
+            readable, writeable, exception = select.select([self.pipe],[],[],0)
+        if latest is not None:
+            self.publish(xbox.Snapshot(*latest[:7], connectStatus=latest[7], timestamp=xbox.clock()))
+            self.connectStatus = latest[7]
+
+    """Apply input_event tuples (sec, usec, type, code, value) to the accumulated axes and buttons.
+    Returns the state as of the last complete report among them, a tuple containing
+    (lx, ly, rx, ry, lt, rt, buttons, connected), or None if there was no complete report.
+    """
+    def decode(self,events):
+        axes = self.axes
+        latest = None
+        for sec, usec, type, code, value in events:
+            if type == EV_ABS:
+                if code == ABS_X:
+                    axes[0] = value
+                elif code == ABS_Y:
+                    axes[1] = min(-value, 32767)    #evdev has up negative, xboxdrv up positive
+                elif code == ABS_RX:
+                    axes[2] = value
+                elif code == ABS_RY:
+                    axes[3] = min(-value, 32767)
+                elif code == ABS_Z:
+                    axes[4] = value * 255 // self.triggerMax
+                elif code == ABS_RZ:
+                    axes[5] = value * 255 // self.triggerMax
+                elif code == ABS_HAT0X:
+                    self.buttons &= ~(xbox.DPAD_LEFT | xbox.DPAD_RIGHT)
+                    if value < 0:
+                        self.buttons |= xbox.DPAD_LEFT
+                    elif value > 0:
+                        self.buttons |= xbox.DPAD_RIGHT
+                elif code == ABS_HAT0Y:
+                    self.buttons &= ~(xbox.DPAD_UP | xbox.DPAD_DOWN)
+                    if value < 0:
+                        self.buttons |= xbox.DPAD_UP
+                    elif value > 0:
+                        self.buttons |= xbox.DPAD_DOWN
+            elif type == EV_KEY:
+                bit = KEY_BUTTONS.get(code)
+                if bit is not None:
+                    if value:
+                        self.buttons |= bit
+                    else:
+                        self.buttons &= ~bit
+            elif type == EV_SYN:
+                if code == SYN_REPORT:
+                    connected = True
+                    if self.dropping:
+                        # Events were lost before SYN_DROPPED, and the ones since, up to this report,
+                        # are incomplete, so none of it can be trusted: a release may be among those
+                        # lost.  Read the true state back from the device, or failing that let go
+                        # of everything and report disconnected until the next complete report.
+                        self.dropping = False
+                        if not self.resync():
+                            axes[:] = [0, 0, 0, 0, 0, 0]
+                            self.buttons = 0
+                            connected = False
+                    latest = (axes[0], axes[1], axes[2], axes[3], axes[4], axes[5], self.buttons, connected)
+                elif code == SYN_DROPPED:
+                    self.dropping = True
+        return latest
+
+    """Replace the accumulated axes and buttons with the device's current state, read with the
+    EVIOCGKEY and EVIOCGABS ioctls.  Returns False, changing nothing, if the device cannot be
+    asked, e.g. because it is a pipe.
+    """
+    def resync(self):
+        keys = bytearray((KEY_MAX + 7) // 8)
+        absinfo = bytearray(ABSINFO.size)
+        events = []
+        try:
+            fcntl.ioctl(self.pipe, EVIOCGKEY, keys)
+            for code in AXES:
+                fcntl.ioctl(self.pipe, eviocgabs(code), absinfo)
+                events.append((0, 0, EV_ABS, code, ABSINFO.unpack(absinfo)[0]))
+        except (IOError, OSError):
+            return False
+        self.buttons = 0
+        for code in KEY_BUTTONS:
+            events.append((0, 0, EV_KEY, code, keys[code >> 3] >> (code & 7) & 1))
+        self.decode(events)
+        return True
+
+    # Stop the reader thread, if running, and close the device if it was opened here
+    def close(self):
+        if self.threaded:
+            self.stopReader.set()
+            self.reader.join(1.0)
+        if self.ownsDevice:
+            os.close(self.pipe)
@@ -1,48 +1,173 @@
 from __future__ import print_function
+import os
+import re
+import sys
+import time
 import xbox
 
+# Most redraws per second; input arriving faster than this is shown at this rate
+MAX_FPS = 20
+# Seconds between redraws while the controller is idle, so the frame age keeps counting up
+IDLE_REDRAW = 0.5
+# Unchanged characters worth skipping with a cursor move rather than rewriting
+RUN_GAP = 8
+
+# Screen layout; each {name:width} is a field filled in from the snapshot
+TEMPLATE = (
+    "Xbox controller sample: press Back to exit",
+    "",
+    "Connected: {connected:1}    Input: {rate:6} frames/s    Frame age: {age:6} ms",
+    "",
+    "Left  stick X/Y: {lx:6} / {ly:6}    Thumb: {lthumb:1}    Bumper: {lb:2}    Trigger: {lt:5}",
+    "Right stick X/Y: {rx:6} / {ry:6}    Thumb: {rthumb:1}    Bumper: {rb:2}    Trigger: {rt:5}",
+    "",
+    "Buttons: {a:1} {b:1} {x:1} {y:1}    Dpad: {up:1} {down:1} {left:1} {right:1}    {back:4} {guide:5} {start:5}",
+)
+
+FIELD = re.compile(r'\{(\w+):(\d+)\}')
+
 # Format floating point number to string format -x.xxx
 def fmtFloat(n):
     return '{:6.3f}'.format(n)
 
-# Print one or more values without a line feed
-def show(*args):
-    for arg in args:
-        print(arg, end="")
-
-# Print true or false value based on a boolean, without linefeed
-def showIf(boolean, ifTrue, ifFalse=" "):
-    if boolean:
-        show(ifTrue)
-    else:
-        show(ifFalse)
-
-# Instantiate the controller
-joy = xbox.Joystick()
-
-# Show various axis and button states until Back button is pressed
-print("Xbox controller sample: Press Back button to exit")
-while not joy.Back():
-    # Show connection status
-    show("Connected:")
-    showIf(joy.connected(), "Y", "N")
-    # Left analog stick
-    show("  Left X/Y:", fmtFloat(joy.leftX()), "/", fmtFloat(joy.leftY()))
-    # Right trigger
-    show("  RightTrg:", fmtFloat(joy.rightTrigger()))
-    # A/B/X/Y buttons
-    show("  Buttons:")
-    showIf(joy.A(), "A")
-    showIf(joy.B(), "B")
-    showIf(joy.X(), "X")
-    showIf(joy.Y(), "Y")
-    # Dpad U/D/L/R
-    show("  Dpad:")
-    showIf(joy.dpadUp(),    "U")
-    showIf(joy.dpadDown(),  "D")
-    showIf(joy.dpadLeft(),  "L")
-    showIf(joy.dpadRight(), "R")
-    # Move cursor back to start of line
-    show(chr(13))
-# Close out when done
-joy.close()
+# Label if a button is pressed, else blanks of the same width
+def label(pressed, text):
+    return text if pressed else ' ' * len(text)
+
+class Dashboard(object):
+
+    """Keeps the whole screen in one pre-built buffer.  set() writes a field into the buffer,
+    and draw() sends only the characters that changed since the last draw, in one write.
+    """
+    def __init__(self,template,out):
+        self.width = max(len(FIELD.sub(lambda m: ' ' * int(m.group(2)), line)) for line in template)
+        self.rows = len(template)
+        self.fields = {}    #name to (offset in buffer, width)
+        screen = bytearray(b' ' * (self.width * self.rows))
+        for row, line in enumerate(template):
+            text = ''
+            for part in re.split(r'(\{\w+:\d+\})', line):
+                match = FIELD.match(part)
+                if match:
+                    width = int(match.group(2))
+                    self.fields[match.group(1)] = (row * self.width + len(text), width)
+                    text += ' ' * width
+                else:
+                    text += part
+            screen[row * self.width:row * self.width + len(text)] = text.encode()
+        self.screen = screen
+        self.shown = None   #buffer as last drawn; None until the first full draw
+        self.out = out
+
+    # Write value into the named field, padded or cut to the field's width
+    def set(self,name,value):
+        offset, width = self.fields[name]
+        self.screen[offset:offset + width] = value.rjust(width)[:width].encode()
+
+    # Bring the terminal up to date: the whole screen the first time, then the changed runs of each row
+    def draw(self):
+        width = self.width
+        screen = self.screen
+        if self.shown is None:
+            # clear, hide the cursor and draw every row
+            parts = [b'\x1b[2J\x1b[?25l']
+            for row in range(self.rows):
+                parts.append(b'\x1b[%d;1H' % (row + 1))
+                parts.append(bytes(screen[row * width:(row + 1) * width]).rstrip())
+        else:
+            parts = []
+            shown = self.shown
+            for row in range(self.rows):
+                first = row * width
+                end = first + width
+                if screen[first:end] == shown[first:end]:
+                    continue
+                col = first
+                while col < end:
+                    if screen[col] == shown[col]:
+                        col += 1
+                        continue
+                    # a run of changes ends once RUN_GAP unchanged characters follow, as a
+                    # shorter gap costs fewer bytes to rewrite than moving the cursor over it
+                    start = col
+                    same = 0
+                    while col < end and same < RUN_GAP:
+                        same = same + 1 if screen[col] == shown[col] else 0
+                        col += 1
+                    parts.append(b'\x1b[%d;%dH' % (row + 1, start - first + 1))
+                    parts.append(bytes(screen[start:col - same]))
+            if not parts:
+                return
+        self.out.write(b''.join(parts))
+        self.out.flush()
+        self.shown = bytearray(screen)
+
+    # Leave the cursor below the dashboard and show it again
+    def close(self):
+        self.out.write(b'\x1b[%d;1H\x1b[?25h\n' % self.rows)
+        self.out.flush()
+
+# Fill every field from a single snapshot
+def render(dash,state,rate,age):
+    dash.set('connected', 'Y' if state.connected() else 'N')
+    dash.set('rate', '{:6.1f}'.format(rate))
+    dash.set('age', '{:6.0f}'.format(age * 1000))
+    dash.set('lx', fmtFloat(state.leftX()))
+    dash.set('ly', fmtFloat(state.leftY()))
+    dash.set('rx', fmtFloat(state.rightX()))
+    dash.set('ry', fmtFloat(state.rightY()))
+    dash.set('lt', '{:5.3f}'.format(state.leftTrigger()))
+    dash.set('rt', '{:5.3f}'.format(state.rightTrigger()))
+    dash.set('lthumb', label(state.leftThumbstick(), 'L'))
+    dash.set('rthumb', label(state.rightThumbstick(), 'R'))
+    dash.set('lb', label(state.leftBumper(), 'LB'))
+    dash.set('rb', label(state.rightBumper(), 'RB'))
+    dash.set('a', label(state.A(), 'A'))
+    dash.set('b', label(state.B(), 'B'))
+    dash.set('x', label(state.X(), 'X'))
+    dash.set('y', label(state.Y(), 'Y'))
+    dash.set('up', label(state.dpadUp(), 'U'))
+    dash.set('down', label(state.dpadDown(), 'D'))
+    dash.set('left', label(state.dpadLeft(), 'L'))
+    dash.set('right', label(state.dpadRight(), 'R'))
+    dash.set('back', label(state.Back(), 'Back'))
+    dash.set('guide', label(state.Guide(), 'Guide'))
+    dash.set('start', label(state.Start(), 'Start'))
+
+# Instantiate the controller, or share it with cozmo_interface.py when COZMO_SHM is set
+if os.environ.get('COZMO_SHM'):
+    from shared_joystick import SharedJoystick
+    joy = SharedJoystick(None if os.environ['COZMO_SHM'] == '1' else os.environ['COZMO_SHM'])
+else:
+    joy = xbox.Joystick(threaded=True)    #the reader thread counts every frame for the input rate
+
+# Show every axis and button until the Back button is pressed, redrawing at most MAX_FPS times a second
+dash = Dashboard(TEMPLATE, getattr(sys.stdout, 'buffer', sys.stdout))
+rate = 0.0
+rateTime = xbox.clock()
+rateCount = joy.frameCount
+nextDraw = 0.0
+try:
+    while True:
+        # Sleep until the input changes, but no longer than the idle redraw interval
+        joy.wait_for_change(IDLE_REDRAW)
+        # Act on presses as events, so a short tap of Back between redraws is not missed
+        if any(event.kind == xbox.BUTTON_DOWN and event.code == xbox.BACK for event in joy.pollEvents()):
+            break
+        now = xbox.clock()
+        if now < nextDraw:
+            time.sleep(nextDraw - now)
+            now = xbox.clock()
+        # Input rate over the last second or so
+        if now - rateTime >= 1.0:
+            rate = (joy.frameCount - rateCount) / (now - rateTime)
+            rateTime = now
+            rateCount = joy.frameCount
+        state = joy.snapshot()
+        render(dash, state, rate, now - state.timestamp if state.timestamp else 0.0)
+        dash.draw()
+        nextDraw = now + 1.0 / MAX_FPS
+finally:
+    # Close out when done
+    dash.close()
+    joy.close()
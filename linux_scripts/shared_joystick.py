@@ -0,0 +1,92 @@
+""" Joystick reading controller state shared by shared_state.py
+
+Lets any number of programs use the controller at once: shared_state.py owns xboxdrv (or the
+event node) and publishes every frame into shared memory, and each SharedJoystick reads the
+frames from there.  SharedJoystick offers the same methods as xbox.Joystick, including
+snapshot() and pollEvents(), and every frame published since the last call is turned into
+events, so presses are not missed between refreshes.
+
+Example usage:
+
+    python shared_scripts/shared_state.py &
+
+    from shared_joystick import SharedJoystick
+    joy = SharedJoystick()
+    state = joy.snapshot()
+
+Refreshing only reads memory, so it makes no system calls however often it is called.  If the
+daemon stops without saying so (killed, or hung), its heartbeat goes stale and the joystick
+reads as disconnected, with every button released, until frames arrive again.
+"""
+
+import os
+import sys
+import time
+
+import xbox
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared_scripts'))
+import shared_state
+
+class SharedJoystick(xbox.JoystickBase):
+
+    """Joystick backed by the shared memory file at path, the shared_state default if None.
+    Raises IOError if shared_state.py is not running.  threaded mode is not needed, and a
+    recorder is not supported, as there is no pipe to drain or record.
+    """
+    def __init__(self,path=None,eventLimit=64):
+        try:
+            self.reader = shared_state.StateReader(path or shared_state.DEFAULT_PATH)
+        except (IOError, OSError, ValueError) as e:
+            raise IOError('No shared controller state, is shared_state.py running? ({0})'.format(e))
+        super(SharedJoystick, self).__init__(eventLimit=eventLimit)
+        self.attachTime = 0.0
+        self.stale = False
+        # Start from the newest frame rather than replaying the whole history as events
+        latest = self.reader.latest()
+        self.seen = -1
+        if latest is not None:
+            self.publish(xbox.Snapshot(*latest[:9]))
+            self.seen = latest.number
+        self.connectStatus = self.state.connectStatus
+
+    """Publish every frame written since the last refresh, oldest first.  A writer whose
+    heartbeat has gone stale publishes a disconnected frame instead, and the newest frame is
+    published again once it comes back.
+    """
+    def refresh(self):
+        reader = self.reader
+        if not reader.alive():
+            if not self.stale:
+                self.stale = True
+                self.publish(xbox.Snapshot(timestamp=xbox.clock()))
+                self.connectStatus = False
+            return
+        if self.stale:
+            self.stale = False
+            latest = reader.latest()
+            if latest is not None and latest.number == self.seen:
+                self.publish(xbox.Snapshot(*latest[:9]))
+        for frame in reader.since(self.seen):
+            self.publish(xbox.Snapshot(*frame[:9]))
+            self.seen = frame.number
+        self.connectStatus = self.state.connectStatus
+
+    """Like Joystick.wait_for_change, but as shared memory offers nothing to block on, checks for
+    new frames every pollInterval seconds, sleeping in between.
+    """
+    def wait_for_change(self,timeout=None,pollInterval=0.002):
+        seen = self.seenFrame
+        deadline = None if timeout is None else xbox.clock() + timeout
+        while True:
+            self.refresh()
+            if self.frameCount != seen:
+                return self.read()
+            remaining = pollInterval if deadline is None else deadline - xbox.clock()
+            if remaining <= 0:
+                return None
+            time.sleep(min(remaining, pollInterval))
+
+    # Unmap the shared state; the daemon keeps running for other readers
+    def close(self):
+        self.reader.close()
@@ -22,81 +22,340 @@ Example usage:
     
     joy.close()                   #Cleanup before exit
 
+To read one consistent frame per loop iteration, take a snapshot and query it instead.  The
+snapshot has the same methods as the Joystick but its values never change underneath you:
+
+    state = joy.snapshot()
+    if state.A() and state.leftX() > 0.5:
+        print 'A pressed while steering right'
+
+read() returns the same frame as a controller.State, the raw form shared with the XInput backend.
+
+Pass threaded=True to have a background thread own the xboxdrv pipe.  The accessors then
+only read the newest frame it has stored and never touch the pipe themselves:
+
+    joy = xbox.Joystick(threaded=True)
+
+Buttons pressed or released, and sticks or triggers moved past a threshold, are also queued as
+events.  Acting on events instead of levels does something once per press, however long it is held:
+
+    for event in joy.pollEvents():
+        if event.kind == xbox.BUTTON_DOWN and event.code == xbox.A:
+            print 'A button pressed'
+
+poll() returns the events together with the snapshot they led to, for a loop acting on both:
+
+    events, state = joy.poll()
+
+A loop with nothing to do until the input changes can sleep on the controller instead of
+polling it; wait_for_change() returns the new frame as soon as one arrives:
+
+    state = joy.wait_for_change(1.0)    #None if nothing changed within a second
+
 All controller buttons are supported.  See code for all functions.
 """
 
+import os
+import socket
 import subprocess
 import select
+import sys
+import threading
 import time
+from collections import deque, namedtuple
 
-class Joystick:
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared_scripts'))
+import controller
+# Button bits of Snapshot.buttons, defined once in controller.py.  These follow the XInput wButtons
+# layout so that masks mean the same thing for both the Linux and the Windows controller code.
+from controller import (DPAD_UP, DPAD_DOWN, DPAD_LEFT, DPAD_RIGHT, START, BACK, LEFT_THUMB, RIGHT_THUMB,
+                        LEFT_BUMPER, RIGHT_BUMPER, GUIDE, A, B, X, Y)
 
-    """Initializes the joystick/wireless receiver, launching 'xboxdrv' as a subprocess
-    and checking that the wired joystick or wireless receiver is attached.
-    The refreshRate determines the maximnum rate at which events are polled from xboxdrv.
-    Calling any of the Joystick methods will cause a refresh to occur, if refreshTime has elapsed.
-    Routinely call a Joystick method, at least once per second, to avoid overfilling the event buffer.
- 
-    Usage:
-        joy = xbox.Joystick()
+# Clock used to timestamp frames; falls back to wall time on Python 2
+clock = getattr(time, 'monotonic', time.time)
+
+# Column of each button's 0/1 flag within a 140 char xboxdrv line
+BUTTON_COLUMNS = (
+    (45, DPAD_UP), (50, DPAD_DOWN), (55, DPAD_LEFT), (60, DPAD_RIGHT),
+    (68, BACK), (76, GUIDE), (84, START), (90, LEFT_THUMB), (95, RIGHT_THUMB),
+    (100, A), (104, B), (108, X), (112, Y), (118, LEFT_BUMPER), (123, RIGHT_BUMPER),
+)
+
+# Kinds of Event.  For buttons the code is the button bit; for AXIS it is one of the Snapshot
+# field names 'lx', 'ly', 'rx', 'ry', 'lt', 'rt' and the value is the zone the axis moved into:
+# -1 or 1 once a stick is pushed past axisThreshold, 1 once a trigger passes triggerThreshold,
+# and 0 when it comes back.  state is the Snapshot in which the change was seen.
+BUTTON_DOWN = 'down'
+BUTTON_UP = 'up'
+AXIS = 'axis'
+Event = namedtuple('Event', 'kind code value state')
+
+AXES = ('lx', 'ly', 'rx', 'ry', 'lt', 'rt')
+
+# Bytes read from xboxdrv per system call when draining the pipe (about 470 frames)
+DRAIN_SIZE = 65536
+
+# Scale raw (-32768 to +32767) axis with deadzone correcion
+# Deadzone is +/- range of values to consider to be center stick (ie. 0.0)
+def axisScale(raw,deadzone):
+    if abs(raw) < deadzone:
+        return 0.0
+    else:
+        if raw < 0:
+            return (raw + deadzone) / (32768.0 - deadzone)
+        else:
+            return (raw - deadzone) / (32767.0 - deadzone)
+
+class Snapshot(object):
+
+    """Decoded state of the controller at one instant: raw stick axes, raw triggers (0 to 255),
+    a bitmask of the pressed buttons and the clock() time at which the frame was received.  Snapshots are never modified once built, so a caller
+    holding one sees a single consistent frame no matter how often xboxdrv reports in between.
+    The methods mirror the Joystick accessors and return the same scaled values.
+    """
+    __slots__ = ('lx', 'ly', 'rx', 'ry', 'lt', 'rt', 'buttons', 'connectStatus', 'timestamp')
+
+    def __init__(self,lx=0,ly=0,rx=0,ry=0,lt=0,rt=0,buttons=0,connectStatus=False,timestamp=0.0):
+        self.lx = lx
+        self.ly = ly
+        self.rx = rx
+        self.ry = ry
+        self.lt = lt
+        self.rt = rt
+        self.buttons = buttons
+        self.connectStatus = connectStatus
+        self.timestamp = timestamp
+
+    # Same readings flagged as no longer connected, used when the wireless link drops out
+    def disconnected(self):
+        return Snapshot(self.lx,self.ly,self.rx,self.ry,self.lt,self.rt,self.buttons,False,self.timestamp)
+
+    def connected(self):
+        return self.connectStatus
+
+    def leftX(self,deadzone=4000):
+        return axisScale(self.lx,deadzone)
+
+    def leftY(self,deadzone=4000):
+        return axisScale(self.ly,deadzone)
+
+    def rightX(self,deadzone=4000):
+        return axisScale(self.rx,deadzone)
+
+    def rightY(self,deadzone=4000):
+        return axisScale(self.ry,deadzone)
+
+    def leftStick(self,deadzone=4000):
+        return (axisScale(self.lx,deadzone),axisScale(self.ly,deadzone))
+
+    def rightStick(self,deadzone=4000):
+        return (axisScale(self.rx,deadzone),axisScale(self.ry,deadzone))
+
+    def leftTrigger(self):
+        return self.lt / 255.0
+
+    def rightTrigger(self):
+        return self.rt / 255.0
+
+    # 1 if any button in mask is pressed, else 0
+    def pressed(self,mask):
+        return 1 if self.buttons & mask else 0
+
+    def dpadUp(self):
+        return self.pressed(DPAD_UP)
+
+    def dpadDown(self):
+        return self.pressed(DPAD_DOWN)
+
+    def dpadLeft(self):
+        return self.pressed(DPAD_LEFT)
+
+    def dpadRight(self):
+        return self.pressed(DPAD_RIGHT)
+
+    def Back(self):
+        return self.pressed(BACK)
+
+    def Guide(self):
+        return self.pressed(GUIDE)
+
+    def Start(self):
+        return self.pressed(START)
+
+    def leftThumbstick(self):
+        return self.pressed(LEFT_THUMB)
+
+    def rightThumbstick(self):
+        return self.pressed(RIGHT_THUMB)
+
+    def A(self):
+        return self.pressed(A)
+
+    def B(self):
+        return self.pressed(B)
+
+    def X(self):
+        return self.pressed(X)
+
+    def Y(self):
+        return self.pressed(Y)
+
+    def leftBumper(self):
+        return self.pressed(LEFT_BUMPER)
+
+    def rightBumper(self):
+        return self.pressed(RIGHT_BUMPER)
+
+# Decode a 140 char xboxdrv line into a connected Snapshot, parsing each field exactly once
+def decode(line):
+    if isinstance(line, str):
+        line = line.encode()
+    columns = bytearray(line)   #indexes to ints on Python 2 as well, where bytes indexes to 1 char strings
+    buttons = 0
+    for column, bit in BUTTON_COLUMNS:
+        if columns[column] == 49:  # ord('1')
+            buttons |= bit
+    return Snapshot(int(line[3:9]), int(line[13:19]), int(line[24:30]), int(line[34:40]),
+                    int(line[129:132]), int(line[136:139]), buttons, True, clock())
+
+class JoystickBase(controller.Controller):
+
+    """Frames, events and the accessors shared by every Linux controller backend: subclasses
+    publish() each new frame, and implement readAvailable() to drain a pipe (see Joystick) or
+    override refresh() when there is none.  Construct one of the subclasses.
     """
-    def __init__(self,refreshRate = 30):
-        self.proc = subprocess.Popen(['xboxdrv','--no-uinput','--detach-kernel-driver'], stdout=subprocess.PIPE, bufsize=0)
-        self.pipe = self.proc.stdout
+    def __init__(self,refreshRate = 30,eventLimit = 64):
+        self.threaded = False       #set by startReader()
+        self.recorder = None
+        self.readerError = None     #exception raised by the reader thread, re-raised by refresh()
         #
         self.connectStatus = False  #will be set to True once controller is detected and stays on
-        self.reading = '0' * 140    #initialize stick readings to all zeros
+        self.state = Snapshot()     #the newest frame, replaced whole on every new frame
+        self.setupEvents(eventLimit)
         #
-        self.refreshTime = 0    #absolute time when next refresh (read results from xboxdrv stdout pipe) is to occur
+        self.refreshTime = 0    #absolute time when next refresh (read results from the pipe) is to occur
         self.refreshDelay = 1.0 / refreshRate   #joystick refresh is to be performed 30 times per sec by default
-        #
-        # Read responses from 'xboxdrv' for upto 2 seconds, looking for controller/receiver to respond
-        found = False
-        waitTime = time.time() + 2
-        while waitTime > time.time() and not found:
-            readable, writeable, exception = select.select([self.pipe],[],[],0)
-            if readable:
-                response = self.pipe.readline()
-                # Hard fail if we see this, so force an error
-                if response[0:7] == b'No Xbox':
-                    raise IOError('No Xbox controller/receiver found')
-                # Success if we see the following
-                if response[0:12].lower() == b'press ctrl-c':
-                    found = True
-                # If we see 140 char line, we are seeing valid input
-                if len(response) == 140:
-                    found = True
-                    self.connectStatus = True
-                    self.reading = response
-        # if the controller wasn't found, then halt
-        if not found:
-            self.close()
-            raise IOError('Unable to detect Xbox controller/receiver - Run python as sudo')
+
+    """Create the event queue.  axisThreshold is the raw stick value, and triggerThreshold the
+    raw trigger value, that has to be crossed for an AXIS event to be queued.
+    """
+    def setupEvents(self,eventLimit,axisThreshold=4000,triggerThreshold=30):
+        self.frameCount = 0     #frames published so far, lets callers tell how many they skipped
+        self.seenFrame = -1     #frameCount when snapshot() last handed out a frame
+        self.readState = None   #controller.State built by read() for the frame numbered readState.number
+        self.frameChanged = threading.Condition()   #notified by the reader thread after each drain
+        self.events = deque(maxlen=eventLimit)
+        self.droppedEvents = 0  #events pushed out of a full queue before being polled
+        self.axisThreshold = axisThreshold
+        self.triggerThreshold = triggerThreshold
+        self.zones = self.axisZones(self.state)
+
+    # Zone of each axis in AXES: -1, 0 or 1 for the sticks, 0 or 1 for the triggers
+    def axisZones(self,state):
+        t = self.axisThreshold
+        return ((state.lx >= t) - (state.lx <= -t), (state.ly >= t) - (state.ly <= -t),
+                (state.rx >= t) - (state.rx <= -t), (state.ry >= t) - (state.ry <= -t),
+                int(state.lt >= self.triggerThreshold), int(state.rt >= self.triggerThreshold))
+
+    """Make state the current frame, queueing an Event for every button whose bit differs from
+    the previous frame and every axis that moved into a different zone.
+    """
+    def publish(self,state):
+        changed = self.state.buttons ^ state.buttons
+        zones = self.axisZones(state)
+        if changed or zones != self.zones:
+            while changed:
+                bit = changed & -changed    #lowest changed bit
+                if state.buttons & bit:
+                    self.queue(Event(BUTTON_DOWN, bit, 1, state))
+                else:
+                    self.queue(Event(BUTTON_UP, bit, 0, state))
+                changed ^= bit
+            for axis, old, new in zip(AXES, self.zones, zones):
+                if old != new:
+                    self.queue(Event(AXIS, axis, new, state))
+            self.zones = zones
+        # state goes first, so a frameCount read before self.state never runs ahead of it
+        self.state = state
+        self.frameCount += 1
+
+    def queue(self,event):
+        if len(self.events) == self.events.maxlen:
+            self.droppedEvents += 1
+        self.events.append(event)
+
+    """Return the list of Events queued since the last call, oldest first, and empty the queue.
+    Safe to call while the reader thread is adding to it.
+    """
+    def pollEvents(self):
+        self.refresh()
+        events = []
+        try:
+            while True:
+                events.append(self.events.popleft())
+        except IndexError:
+            return events
+
+    """Return a tuple containing (the Events queued since the last call, the most recent frame),
+    as pollEvents() and snapshot() would, but taken from the same drain: the reader thread cannot
+    publish in between, so the frame's levels always agree with the presses and releases queued.
+    """
+    def poll(self):
+        self.refresh()
+        with self.frameChanged:
+            events = list(self.events)
+            self.events.clear()
+            self.seenFrame = self.frameCount
+            return events, self.state
+
+    """Hand the pipe over to a daemon reader thread.  From here on refresh() never reads.
+    """
+    def startReader(self):
+        self.threaded = True
+        self.stopReader = threading.Event()
+        self.reader = threading.Thread(target=self.readerLoop, name='xbox-reader')
+        self.reader.daemon = True
+        self.reader.start()
 
     """Used by all Joystick methods to read the most recent events from xboxdrv.
     The refreshRate determines the maximum frequency with which events are checked.
     If a valid event response is found, then the controller is flagged as 'connected'.
+    In threaded mode the reader thread does this work, so only its errors are surfaced here,
+    once any events queued before the error have been polled.
     """
     def refresh(self):
+        if self.threaded:
+            if self.readerError is not None and not self.events:
+                raise self.readerError
+            return
         # Refresh the joystick readings based on regular defined freq
         if self.refreshTime < time.time():
             self.refreshTime = time.time() + self.refreshDelay  #set next refresh time
             # If there is text available to read from xboxdrv, then read it.
             readable, writeable, exception = select.select([self.pipe],[],[],0)
             if readable:
-                # Read every line that is availabe.  We only need to decode the last one.
-                while readable:
-                    response = self.pipe.readline()
-                    # A zero length response means controller has been unplugged.
-                    if len(response) == 0:
-                        raise IOError('Xbox controller disconnected from USB')
-                    readable, writeable, exception = select.select([self.pipe],[],[],0)
-                # Valid controller response will be 140 chars.  
-                if len(response) == 140:
-                    self.connectStatus = True
-                    self.reading = response
-                else:  #Any other response means we have lost wireless or controller battery
-                    self.connectStatus = False
+                self.readAvailable()
+
+    """Body of the reader thread used in threaded mode.  Blocks on the pipe so the thread
+    sleeps while xboxdrv is quiet, and stores any error for the caller's next refresh(), so an
+    unexpected exception stops the control loop rather than leaving it acting on a stale frame.
+    Publishing replaces self.state with a new Snapshot in a single assignment, so readers never
+    need a lock and can never observe a half updated frame; drains hold frameChanged only so that
+    poll() sees a frame together with its events.
+    """
+    def readerLoop(self):
+        try:
+            while not self.stopReader.is_set():
+                readable, writeable, exception = select.select([self.pipe],[],[],self.refreshDelay)
+                if readable:
+                    with self.frameChanged:
+                        self.readAvailable()
+                        self.frameChanged.notify_all()
+        except Exception as e:
+            if not self.stopReader.is_set():
+                self.readerError = e
+            with self.frameChanged:
+                self.frameChanged.notify_all()
 
     """Return a status of True, when the controller is actively connected.
     Either loss of wireless signal or controller powering off will break connection.  The
@@ -109,143 +368,327 @@ class Joystick:
     fault is corrected.
     """
     def connected(self):
+        return self.snapshot().connectStatus
+
+    """Return the most recent frame as an immutable Snapshot.  Call this once per loop iteration
+    and query the snapshot, rather than calling the accessors below one at a time, so that every
+    value used in the iteration comes from the same frame.
+    """
+    def snapshot(self):
         self.refresh()
-        return self.connectStatus
+        self.seenFrame = self.frameCount
+        return self.state
+
+    """Block until a frame newer than the last one handed out by snapshot() (or anything built on
+    it, such as read() and the accessors) arrives, or until timeout seconds have passed.  Sleeps
+    in select() on the pipe, or on a condition the reader thread notifies in threaded mode, so an
+    idle controller costs no CPU, and returns as soon as the frame is decoded.  Returns the new
+    frame as a controller.State, or None on timeout.
+    """
+    def wait_for_change(self,timeout=None):
+        seen = self.seenFrame
+        deadline = None if timeout is None else clock() + timeout
+        if self.threaded:
+            with self.frameChanged:
+                while self.frameCount == seen and self.readerError is None:
+                    remaining = None if deadline is None else deadline - clock()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    self.frameChanged.wait(remaining)
+        else:
+            while self.frameCount == seen:
+                remaining = None if deadline is None else deadline - clock()
+                if remaining is not None and remaining <= 0:
+                    return None
+                readable, writeable, exception = select.select([self.pipe],[],[],remaining)
+                if readable:
+                    self.readAvailable()
+        return self.read()
+
+    """Return the most recent frame as a controller.State, the form shared with the other
+    controller backends.  The same State is returned until a new frame is published.
+    """
+    def read(self):
+        state = self.snapshot()
+        cached = self.readState
+        if cached is None or cached.number != self.frameCount:
+            cached = self.readState = controller.State(state.lx, state.ly, state.rx, state.ry, state.lt, state.rt,
+                                                       state.buttons, state.connectStatus, state.timestamp,
+                                                       self.frameCount)
+        return cached
 
     # Left stick X axis value scaled between -1.0 (left) and 1.0 (right) with deadzone tolerance correction
     def leftX(self,deadzone=4000):
-        self.refresh()
-        raw = int(self.reading[3:9])
-        return self.axisScale(raw,deadzone)
+        return self.snapshot().leftX(deadzone)
 
     # Left stick Y axis value scaled between -1.0 (down) and 1.0 (up)
     def leftY(self,deadzone=4000):
-        self.refresh()
-        raw = int(self.reading[13:19])
-        return self.axisScale(raw,deadzone)
+        return self.snapshot().leftY(deadzone)
 
     # Right stick X axis value scaled between -1.0 (left) and 1.0 (right)
     def rightX(self,deadzone=4000):
-        self.refresh()
-        raw = int(self.reading[24:30])
-        return self.axisScale(raw,deadzone)
+        return self.snapshot().rightX(deadzone)
 
     # Right stick Y axis value scaled between -1.0 (down) and 1.0 (up)
     def rightY(self,deadzone=4000):
-        self.refresh()
-        raw = int(self.reading[34:40])
-        return self.axisScale(raw,deadzone)
+        return self.snapshot().rightY(deadzone)
 
     # Scale raw (-32768 to +32767) axis with deadzone correcion
-    # Deadzone is +/- range of values to consider to be center stick (ie. 0.0)
     def axisScale(self,raw,deadzone):
-        if abs(raw) < deadzone:
-            return 0.0
-        else:
-            if raw < 0:
-                return (raw + deadzone) / (32768.0 - deadzone)
-            else:
-                return (raw - deadzone) / (32767.0 - deadzone)
+        return axisScale(raw,deadzone)
 
     # Dpad Up status - returns 1 (pressed) or 0 (not pressed)
     def dpadUp(self):
-        self.refresh()
-        return int(self.reading[45:46])
+        return self.snapshot().dpadUp()
         
     # Dpad Down status - returns 1 (pressed) or 0 (not pressed)
     def dpadDown(self):
-        self.refresh()
-        return int(self.reading[50:51])
+        return self.snapshot().dpadDown()
         
     # Dpad Left status - returns 1 (pressed) or 0 (not pressed)
     def dpadLeft(self):
-        self.refresh()
-        return int(self.reading[55:56])
+        return self.snapshot().dpadLeft()
         
     # Dpad Right status - returns 1 (pressed) or 0 (not pressed)
     def dpadRight(self):
-        self.refresh()
-        return int(self.reading[60:61])
+        return self.snapshot().dpadRight()
         
     # Back button status - returns 1 (pressed) or 0 (not pressed)
     def Back(self):
-        self.refresh()
-        return int(self.reading[68:69])
+        return self.snapshot().Back()
 
     # Guide button status - returns 1 (pressed) or 0 (not pressed)
     def Guide(self):
-        self.refresh()
-        return int(self.reading[76:77])
+        return self.snapshot().Guide()
 
     # Start button status - returns 1 (pressed) or 0 (not pressed)
     def Start(self):
-        self.refresh()
-        return int(self.reading[84:85])
+        return self.snapshot().Start()
 
     # Left Thumbstick button status - returns 1 (pressed) or 0 (not pressed)
     def leftThumbstick(self):
-        self.refresh()
-        return int(self.reading[90:91])
+        return self.snapshot().leftThumbstick()
 
     # Right Thumbstick button status - returns 1 (pressed) or 0 (not pressed)
     def rightThumbstick(self):
-        self.refresh()
-        return int(self.reading[95:96])
+        return self.snapshot().rightThumbstick()
 
     # A button status - returns 1 (pressed) or 0 (not pressed)
     def A(self):
-        self.refresh()
-        return int(self.reading[100:101])
+        return self.snapshot().A()
         
     # B button status - returns 1 (pressed) or 0 (not pressed)
     def B(self):
-        self.refresh()
-        return int(self.reading[104:105])
+        return self.snapshot().B()
 
     # X button status - returns 1 (pressed) or 0 (not pressed)
     def X(self):
-        self.refresh()
-        return int(self.reading[108:109])
+        return self.snapshot().X()
 
     # Y button status - returns 1 (pressed) or 0 (not pressed)
     def Y(self):
-        self.refresh()
-        return int(self.reading[112:113])
+        return self.snapshot().Y()
 
     # Left Bumper button status - returns 1 (pressed) or 0 (not pressed)
     def leftBumper(self):
-        self.refresh()
-        return int(self.reading[118:119])
+        return self.snapshot().leftBumper()
 
     # Right Bumper button status - returns 1 (pressed) or 0 (not pressed)
     def rightBumper(self):
-        self.refresh()
-        return int(self.reading[123:124])
+        return self.snapshot().rightBumper()
 
     # Left Trigger value scaled between 0.0 to 1.0
     def leftTrigger(self):
-        self.refresh()
-        return int(self.reading[129:132]) / 255.0
+        return self.snapshot().leftTrigger()
         
     # Right trigger value scaled between 0.0 to 1.0
     def rightTrigger(self):
-        self.refresh()
-        return int(self.reading[136:139]) / 255.0
+        return self.snapshot().rightTrigger()
 
     # Returns tuple containing X and Y axis values for Left stick scaled between -1.0 to 1.0
     # Usage:
     #     x,y = joy.leftStick()
     def leftStick(self,deadzone=4000):
-        self.refresh()
-        return (self.leftX(deadzone),self.leftY(deadzone))
+        return self.snapshot().leftStick(deadzone)
 
     # Returns tuple containing X and Y axis values for Right stick scaled between -1.0 to 1.0
     # Usage:
     #     x,y = joy.rightStick() 
     def rightStick(self,deadzone=4000):
-        self.refresh()
-        return (self.rightX(deadzone),self.rightY(deadzone))
+        return self.snapshot().rightStick(deadzone)
+
+class Joystick(JoystickBase):
+
+    """Initializes the joystick/wireless receiver, launching 'xboxdrv' as a subprocess
+    and checking that the wired joystick or wireless receiver is attached.
+    The refreshRate determines the maximnum rate at which events are polled from xboxdrv.
+    Calling any of the Joystick methods will cause a refresh to occur, if refreshTime has elapsed.
+    Routinely call a Joystick method, at least once per second, to avoid overfilling the event buffer.
+    With threaded=True a daemon thread drains xboxdrv continuously instead, so the buffer never
+    fills even while the caller is blocked, and the methods below make no system calls.
+ 
+    command is the program to run in place of the default xboxdrv invocation; it must print the
+    same output.  Set recorder to an object with a write(data) method, such as a
+    recording.Recorder, to have every byte read from the pipe passed to it.
+    Changes between successive frames are queued as Events, keeping at most eventLimit of them;
+    see pollEvents().  Only the frames that are actually decoded are compared, so in unthreaded
+    mode a tap shorter than one refresh interval can go unseen.
+
+    The constructor waits at most attachTimeout seconds for xboxdrv to report the controller,
+    sleeping in select() meanwhile, and returns as soon as it does; attachTime records how long
+    that took.  Pass daemon, the socket path of a running xboxd.py, to read from its long lived
+    xboxdrv instead of starting a new one, which makes attaching take milliseconds.
+ 
+    Usage:
+        joy = xbox.Joystick()
+        joy = xbox.Joystick(daemon=xboxd.SOCKET_PATH)
+    """
+    def __init__(self,refreshRate = 30,threaded = False,eventLimit = 64,command = None,attachTimeout = 2.0,daemon = None):
+        started = clock()
+        self.proc = None
+        if daemon is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.socket.connect(daemon)
+            except (IOError, OSError) as e:
+                self.socket.close()
+                raise IOError('Unable to reach xboxd at {0}: {1}'.format(daemon, e))
+            self.pipe = self.socket.makefile('rb', buffering=0)
+        else:
+            if command is None:
+                command = ['xboxdrv','--no-uinput','--detach-kernel-driver']
+            self.socket = None
+            self.proc = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
+            self.pipe = self.proc.stdout
+        super(Joystick, self).__init__(refreshRate, eventLimit)    #reader thread is only started once the controller is found
+        self.reading = '0' * 140    #initialize stick readings to all zeros; self.state is their decoded form
+        #
+        self.buffer = bytearray(DRAIN_SIZE)     #reused for every drain of the xboxdrv pipe
+        self.bufferView = memoryview(self.buffer)
+        self.buffered = 0   #bytes of an incomplete line carried over to the next drain
+        #
+        try:
+            found = self.attach(started + attachTimeout)
+        except IOError:
+            self.close()
+            raise
+        # if the controller wasn't found, then halt
+        if not found:
+            self.close()
+            raise IOError('Unable to detect Xbox controller/receiver - Run python as sudo')
+        self.attachTime = clock() - started    #seconds from construction until the controller was found
+        if threaded:
+            self.startReader()
+
+    """Read responses from xboxdrv until it reports the controller/receiver or the deadline passes,
+    blocking in select() for the time remaining rather than polling.  Return True once found.
+    Output that follows the reporting line is kept in the buffer for readAvailable().
+    """
+    def attach(self,deadline):
+        buf = self.buffer
+        while True:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                return False
+            readable, writeable, exception = select.select([self.pipe],[],[],remaining)
+            if not readable:
+                return False
+            if self.buffered == DRAIN_SIZE:
+                self.buffered = 0
+            count = self.pipe.readinto(self.bufferView[self.buffered:])
+            if not count:
+                raise IOError('xboxdrv exited before finding an Xbox controller/receiver')
+            end = self.buffered + count
+            if self.recorder is not None:
+                self.recorder.write(self.bufferView[self.buffered:end])
+            found = False
+            response = None
+            start = 0
+            newline = buf.find(b'\n', 0, end)
+            while newline >= 0:
+                line = buf[start:newline + 1]
+                # Hard fail if we see this, so force an error
+                if line[0:7] == b'No Xbox':
+                    raise IOError('No Xbox controller/receiver found')
+                # Success if we see the following
+                if line[0:12].lower() == b'press ctrl-c':
+                    found = True
+                # If we see 140 char line, we are seeing valid input
+                if len(line) == 140:
+                    found = True
+                    response = bytes(line)
+                start = newline + 1
+                newline = buf.find(b'\n', start, end)
+            # Keep the partial line, if any, for the next read
+            self.buffered = end - start
+            buf[0:self.buffered] = buf[start:end]
+            if response is not None:
+                self.connectStatus = True
+                self.reading = response
+                self.publish(decode(response))
+            if found:
+                return True
 
-    # Cleanup by ending the xboxdrv subprocess
+    """Drain everything xboxdrv has written and decode only the last complete line.
+    Output is pulled in DRAIN_SIZE chunks straight into a reused buffer, so a backlog of
+    hundreds of lines costs a handful of reads rather than one read and select per line.
+    Must only be called once select() has reported the pipe as readable.
+    """
+    def readAvailable(self):
+        buf = self.buffer
+        response = None
+        unplugged = False
+        readable = True
+        while readable:
+            # A full buffer without a newline is not xboxdrv output; discard it
+            if self.buffered == DRAIN_SIZE:
+                self.buffered = 0
+            count = self.pipe.readinto(self.bufferView[self.buffered:])
+            # A zero length response means controller has been unplugged.
+            if not count:
+                unplugged = True
+                break
+            end = self.buffered + count
+            if self.recorder is not None:
+                self.recorder.write(self.bufferView[self.buffered:end])
+            last = buf.rfind(b'\n', self.buffered, end)
+            if last >= 0:
+                # Newest complete line runs from the newline before it (or the buffer start)
+                start = buf.rfind(b'\n', 0, last) + 1
+                response = bytes(buf[start:last + 1])
+                # Keep any partial line that follows it for the next read
+                self.buffered = end - last - 1
+                buf[0:self.buffered] = buf[last + 1:end]
+            else:
+                self.buffered = end
+            readable, writeable, exception = select.select([self.pipe],[],[],0)
+        # Valid controller response will be 140 chars.  
+        if response is None:    #only part of a line has arrived so far
+            pass
+        elif len(response) == 140:
+            self.reading = response
+            self.publish(decode(response))
+            self.connectStatus = True
+        else:  #Any other response means we have lost wireless or controller battery
+            self.publish(self.state.disconnected())
+            self.connectStatus = False
+        # Input that arrived before the unplug has been published; now report it
+        if unplugged:
+            raise IOError('Xbox controller disconnected from USB')
+
+    # Cleanup by ending the xboxdrv subprocess, or leaving xboxd (and the reader thread, if running)
     def close(self):
-        self.proc.kill()
+        if self.threaded:
+            self.stopReader.set()
+        if self.proc is not None:
+            self.proc.kill()
+        else:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)  #wakes the reader thread, which sees end of file
+            except (IOError, OSError):  #xboxd already went away
+                pass
+        if self.threaded and self.reader is not threading.current_thread():
+            self.reader.join(1.0)
+        if self.socket is not None:
+            self.pipe.close()
+            self.socket.close()
@@ -0,0 +1,213 @@
+""" xboxd: keeps one xboxdrv running and shares its output over a Unix socket
+
+Starting xboxdrv and waiting for it to find the controller takes a couple of seconds on every
+launch of the controller script.  Run xboxd once instead, and the scripts attach to its
+long lived xboxdrv in milliseconds:
+
+    sudo python linux_scripts/xboxd.py &
+    COZMO_XBOXD=/tmp/xboxd.sock python linux_scripts/cozmo_interface.py
+
+or from Python, xbox.Joystick(daemon=xboxd.SOCKET_PATH).  Only members of the socket's group,
+SOCKET_GROUP unless another is given after the path (xboxd.py PATH GROUP), can connect.
+
+Each client first receives xboxdrv's "Press Ctrl-c to quit" line and the newest frame, then the
+output as it arrives, always in whole lines.  A client that stops reading is disconnected once
+MAX_PENDING bytes are queued for it, so it can never hold up the others.  xboxd exits when
+xboxdrv does, e.g. when the controller or receiver is unplugged.
+"""
+
+import grp
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+
+SOCKET_PATH = '/tmp/xboxd.sock'
+SOCKET_GROUP = 'input'  # the group that may read controllers, as for their /dev/input event nodes
+XBOXDRV_COMMAND = ['xboxdrv', '--no-uinput', '--detach-kernel-driver']
+MAX_PENDING = 65536  # bytes queued for a slow client before it is dropped
+
+
+class Daemon:
+    """
+    Fans the output of one xboxdrv process out to any number of socket clients.
+    """
+
+    def __init__(self, path=SOCKET_PATH, command=XBOXDRV_COMMAND, group=SOCKET_GROUP):
+        """
+        :param path: Unix socket to listen on; a stale socket file left by a previous run is replaced
+        :param command: xboxdrv command line, or any program printing the same output
+        :param group: name of the group allowed to connect
+        :raises IOError: if another xboxd is already listening on path, or the group does not exist
+        """
+        self.path = path
+        self.server = listen(path, group)
+        self.proc = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.proc.stdout, selectors.EVENT_READ, None)
+        self.selector.register(self.server, selectors.EVENT_READ, None)
+        self.clients = {}  # client socket to bytes not yet sent to it
+        self.partial = b''  # xboxdrv output after its last newline
+        self.banner = None  # xboxdrv's 'Press Ctrl-c to quit' line, once seen
+        self.latest = b''  # newest complete line after the banner
+
+    def serve(self):
+        """Run until xboxdrv exits."""
+        while True:
+            for key, mask in self.selector.select():
+                if key.fileobj is self.proc.stdout:
+                    if not self.read_xboxdrv():
+                        return
+                elif key.fileobj is self.server:
+                    self.accept()
+                elif key.fileobj not in self.clients:
+                    continue  # dropped earlier in this batch
+                elif mask & selectors.EVENT_READ:
+                    self.check_client(key.fileobj)
+                else:
+                    self.flush(key.fileobj)
+
+    def read_xboxdrv(self):
+        """
+        Pass xboxdrv's complete lines on to every client.
+
+        :return: False once xboxdrv has exited
+        """
+        data = os.read(self.proc.stdout.fileno(), 65536)
+        if not data:
+            return False
+        data = self.partial + data
+        last = data.rfind(b'\n')
+        if last < 0:
+            self.partial = data
+            return True
+        lines, self.partial = data[:last + 1], data[last + 1:]
+        if self.banner is None:
+            start = lines.lower().find(b'press ctrl-c')
+            if start >= 0:
+                start = lines.rfind(b'\n', 0, start) + 1
+                self.banner = lines[start:lines.find(b'\n', start) + 1]
+        if self.banner is not None:
+            self.latest = lines[lines.rfind(b'\n', 0, last) + 1:]
+        for client in list(self.clients):
+            self.send(client, lines)
+        return True
+
+    def accept(self):
+        client, address = self.server.accept()
+        client.setblocking(False)
+        self.clients[client] = b''
+        self.selector.register(client, selectors.EVENT_READ, None)
+        # a client attaches as soon as it sees the banner; the newest frame gives it the current state
+        if self.banner is not None:
+            self.send(client, self.banner if self.latest == self.banner else self.banner + self.latest)
+
+    def send(self, client, data):
+        pending = self.clients[client] + data
+        if len(pending) > MAX_PENDING:
+            self.drop(client)
+            return
+        try:
+            sent = client.send(pending)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(client)
+            return
+        self.clients[client] = pending[sent:]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if sent < len(pending) else 0)
+        self.selector.modify(client, events, None)
+
+    def flush(self, client):
+        self.send(client, b'')
+
+    def check_client(self, client):
+        # clients never send anything, so a readable client has hung up
+        try:
+            data = client.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.drop(client)
+
+    def drop(self, client):
+        self.selector.unregister(client)
+        del self.clients[client]
+        client.close()
+
+    def close(self):
+        for client in list(self.clients):
+            self.drop(client)
+        self.selector.close()
+        self.server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+
+def listen(path, group=SOCKET_GROUP):
+    """
+    :param path: Unix socket path
+    :param group: name of the group given the socket; only its members and the owner can connect
+    :return: a listening socket bound to path
+    :raises IOError: if another daemon is already listening there, or the group does not exist
+    """
+    try:
+        gid = grp.getgrnam(group).gr_gid
+    except KeyError:
+        raise IOError("no group '{0}' to give the socket to".format(group))
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)  # left behind by a daemon that did not shut down cleanly
+        else:
+            raise IOError('xboxd is already running on {0}'.format(path))
+        finally:
+            probe.close()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the daemon runs as root and the controller scripts usually do not, so they get in through the group;
+    # the umask keeps anyone else from connecting before the socket's group and mode are set
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    try:
+        os.chown(path, -1, gid)
+        os.chmod(path, 0o660)
+    except OSError:
+        server.close()
+        os.unlink(path)
+        raise
+    server.listen(8)
+    server.setblocking(False)
+    return server
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else SOCKET_PATH
+    group = argv[2] if len(argv) > 2 else SOCKET_GROUP
+    try:
+        daemon = Daemon(path, group=group)
+    except IOError as e:
+        sys.stderr.write('{0}\n'.format(e))
+        return 1
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
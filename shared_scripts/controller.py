@@ -0,0 +1,70 @@
+""" Backend independent controller interface
+
+xbox.Joystick (xboxdrv), EvdevJoystick and SharedJoystick (the other xbox.JoystickBase backends), and XInputJoystick
+all implement Controller, so code that only needs the current input can be written once:
+
+    state = controller.read()
+    if state.connected and state.buttons & A:
+        ...
+    state = controller.wait_for_change(1.0)     # sleeps until the input changes, None after a second
+    controller.close()
+
+State holds raw values: sticks -32768 to 32767 with up positive, triggers 0 to 255, and the
+buttons as bits in the XInput wButtons layout below, which xbox.py imports as well.
+"""
+
+from collections import namedtuple
+
+# number is the backend's frame counter (xbox.Joystick.frameCount, the XInput dwPacketNumber);
+# it changes whenever the input does, so equal numbers mean nothing new has been read
+State = namedtuple('State', 'lx ly rx ry lt rt buttons connected timestamp number')
+
+DISCONNECTED = State(0, 0, 0, 0, 0, 0, 0, False, 0.0, 0)
+
+DPAD_UP = 0x0001
+DPAD_DOWN = 0x0002
+DPAD_LEFT = 0x0004
+DPAD_RIGHT = 0x0008
+START = 0x0010
+BACK = 0x0020
+LEFT_THUMB = 0x0040
+RIGHT_THUMB = 0x0080
+LEFT_BUMPER = 0x0100
+RIGHT_BUMPER = 0x0200
+GUIDE = 0x0400
+A = 0x1000
+B = 0x2000
+X = 0x4000
+Y = 0x8000
+
+
+class Controller(object):
+    """
+    Interface shared by the controller backends.
+    """
+
+    def read(self):
+        """
+        :return: State of the newest input, reading any pending input first; the same State
+                 object is returned again while nothing has changed
+        """
+        raise NotImplementedError
+
+    def wait_for_change(self, timeout=None):
+        """
+        Block until input newer than the last State read arrives, without using CPU meanwhile.
+
+        :param timeout: seconds to wait at most, None to wait indefinitely
+        :return: the new State, or None if nothing changed before the timeout
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the device, pipe or library handle behind the controller."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
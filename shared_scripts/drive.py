@@ -0,0 +1,167 @@
+""" Proportional differential-drive mixing shared by the Linux and Windows front ends
+
+Turns analog stick and trigger positions into continuous wheel speeds for robot.drive_wheels:
+
+    mixer = DriveMixer(forward_speed=150, turn_speed=100, expo=0.3, acceleration=500)
+    left, right = mixer.step(*mixer.mix(forward, turn))
+    robot.drive_wheels(left, right, mixer.acceleration, mixer.acceleration)
+
+mix() is a pure function of its inputs.  step() adds slew-rate limiting: a wheel can speed up by
+at most `acceleration` mm/s per second, while slowing down and stopping are never delayed.
+batch() runs a whole recorded session through both in one pass for offline analysis.
+"""
+
+import time
+
+MAX_WHEEL_SPEED = 220.0  # mm/s, about the fastest Cozmo's treads go
+
+
+def expo(value, amount):
+    """
+    Expo response curve: gentle around the centre, still reaching full scale at the ends.
+    :param value: input, -1.0 to 1.0
+    :param amount: 0.0 for a linear response up to 1.0 for a purely cubic one
+    :return: the curved value, -1.0 to 1.0
+    """
+    return (1.0 - amount) * value + amount * value * value * value
+
+
+class DriveMixer:
+    """
+    Mixes forward/turn or per-wheel inputs into wheel speeds, and limits how fast those speeds rise.
+    """
+
+    def __init__(self, forward_speed=150.0, turn_speed=100.0, expo=0.0, acceleration=None,
+                 max_speed=MAX_WHEEL_SPEED, clock=time.monotonic):
+        """
+        :param forward_speed: wheel speed in mm/s at full forward input
+        :param turn_speed: wheel speed in mm/s added to one side and taken from the other at full turn input
+        :param expo: amount of expo applied to every input, see expo()
+        :param acceleration: largest rise in wheel speed, in mm/s per second; None for no limit
+        :param max_speed: wheel speeds are scaled down together so neither exceeds this
+        :param clock: function returning the current time in seconds, used by step()
+        """
+        self.forward_speed = forward_speed
+        self.turn_speed = turn_speed
+        self.expo = expo
+        self.acceleration = acceleration
+        self.max_speed = max_speed
+        self.clock = clock
+        self.left = 0.0  # wheel speeds last returned by step()
+        self.right = 0.0
+        self.target_left = 0.0  # wheel speeds last asked of step()
+        self.target_right = 0.0
+        self.updated = None  # time of the last step()
+
+    def mix(self, forward, turn, forward_speed=None, turn_speed=None):
+        """
+        Arcade-style mix of a forward and a turn input.
+        :param forward: forward (positive) or backward (negative) input, -1.0 to 1.0
+        :param turn: right (positive) or left (negative) turn input, -1.0 to 1.0
+        :param forward_speed: overrides the mixer's forward_speed for this call
+        :param turn_speed: overrides the mixer's turn_speed for this call
+        :return: a tuple containing (left wheel speed, right wheel speed) in mm/s
+        """
+        if self.expo:
+            forward, turn = expo(forward, self.expo), expo(turn, self.expo)
+        forward *= self.forward_speed if forward_speed is None else forward_speed
+        turn *= self.turn_speed if turn_speed is None else turn_speed
+        return self._limit(forward + turn, forward - turn)
+
+    def tank(self, left, right):
+        """
+        Tank-style mix, one input per wheel.
+        :param left: left wheel input, -1.0 to 1.0
+        :param right: right wheel input, -1.0 to 1.0
+        :return: a tuple containing (left wheel speed, right wheel speed) in mm/s
+        """
+        if self.expo:
+            left, right = expo(left, self.expo), expo(right, self.expo)
+        return self._limit(left * self.forward_speed, right * self.forward_speed)
+
+    def _limit(self, left, right):
+        # scale both wheels together so the robot keeps its heading when one would be too fast
+        peak = max(abs(left), abs(right))
+        if peak > self.max_speed:
+            scale = self.max_speed / peak
+            return left * scale, right * scale
+        return left, right
+
+    def step(self, left, right, now=None):
+        """
+        Move the output towards the target wheel speeds, limited by acceleration.
+        :param left: target left wheel speed in mm/s
+        :param right: target right wheel speed in mm/s
+        :param now: current time in seconds; defaults to the mixer's clock
+        :return: a tuple containing (left wheel speed, right wheel speed) to send now
+        """
+        if now is None:
+            now = self.clock()
+        self.target_left, self.target_right = left, right
+        if self.acceleration is not None:
+            # the first step starts from rest
+            allowed = 0.0 if self.updated is None else self.acceleration * (now - self.updated)
+            left = _slew(self.left, left, allowed)
+            right = _slew(self.right, right, allowed)
+        self.left, self.right, self.updated = left, right, now
+        return left, right
+
+    def stopped(self):
+        """
+        :return: True if the last step() both sent and asked for no wheel movement; a step
+                 still ramping up from rest is not stopped
+        """
+        return not (self.left or self.right or self.target_left or self.target_right)
+
+    def hold(self):
+        """
+        Keep the output, but count no time until the next step() as time to accelerate, e.g. after
+        sleeping while the output held steady.
+        """
+        self.updated = None
+
+    def reset(self):
+        """
+        Forget the previous output, e.g. after the robot has been stopped by other means, or after
+        a pause in stepping that must not count as time to accelerate.
+        """
+        self.left = self.right = 0.0
+        self.target_left = self.target_right = 0.0
+        self.updated = None
+
+    def batch(self, frames):
+        """
+        Mix and slew-limit a whole sequence of inputs, such as a recorded session, in one pass.
+        The mixer's own step() state is left untouched.
+        :param frames: iterable of (timestamp in seconds, forward, turn) tuples, in time order
+        :return: list of (left wheel speed, right wheel speed) tuples, one per frame
+        """
+        mix = self.mix
+        acceleration = self.acceleration
+        left = right = 0.0
+        previous = None
+        speeds = []
+        append = speeds.append
+        for timestamp, forward, turn in frames:
+            target_left, target_right = mix(forward, turn)
+            if acceleration is not None:
+                allowed = 0.0 if previous is None else acceleration * (timestamp - previous)
+                left = _slew(left, target_left, allowed)
+                right = _slew(right, target_right, allowed)
+            else:
+                left, right = target_left, target_right
+            previous = timestamp
+            append((left, right))
+        return speeds
+
+
+def _slew(current, target, allowed):
+    """
+    Slowing down is immediate; only speed gained away from zero is limited to allowed.
+    :return: the speed to use instead of target
+    """
+    if target > 0.0:
+        return min(target, max(current, 0.0) + allowed)
+    if target < 0.0:
+        return max(target, min(current, 0.0) - allowed)
+    return 0.0
@@ -0,0 +1,230 @@
+""" Several controller and robot pairs driven from one process
+
+Each pair is a controller and a pilot: an object holding all of that pair's control state,
+with a step(now) method that acts on the controller's latest input and returns False once the
+pair is done, and a stop() method that halts its robot.  One loop serves every pair:
+
+    fleet = Fleet(rate=100)
+    fleet.add('red', joystick, pilot)
+    fleet.run()
+    print(fleet.report())
+
+Controllers that read from a pipe (unthreaded xbox.Joystick and EvdevJoystick) are registered
+with a selector and drained as soon as input arrives, so the loop sleeps in select() between
+ticks instead of polling every pipe.  Controllers without one, such as XInputJoystick, are
+polled by their pilot's step.  Every tick runs each pilot once, starting with a different pair
+each time so none is always served last, and a pair that fails is stopped without taking the
+others down with it.
+
+robot_connections() opens one cozmo SDK connection per mobile device, to pair with controllers.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import selectors
+import time
+
+import ticker
+
+
+class Pair:
+    """One controller, the pilot acting on it, and counts of how the loop served it."""
+
+    __slots__ = ('name', 'controller', 'pilot', 'registered', 'started', 'finished', 'steps',
+                 'first_step', 'last_step', 'busy', 'slowest', 'frames', 'error')
+
+    def __init__(self, name, controller, pilot):
+        self.name = name
+        self.controller = controller
+        self.pilot = pilot
+        self.registered = False  # controller's pipe is in the selector
+        self.started = None
+        self.finished = None
+        self.steps = 0
+        self.first_step = None  # times the first and the latest step began
+        self.last_step = None
+        self.busy = 0.0  # seconds spent in pilot.step
+        self.slowest = 0.0
+        self.frames = getattr(controller, 'frameCount', None)  # frame count when the run started
+        self.error = None
+
+    def statistics(self):
+        """
+        :return: dict of loop rate, step times and, for controllers that count frames, input rate
+        """
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started is not None else 0.0
+        # n steps are n - 1 periods apart
+        stepping = self.last_step - self.first_step if self.steps > 1 else 0.0
+        stats = {
+            'loop_hz': (self.steps - 1) / stepping if stepping else 0.0,
+            'mean_step_us': self.busy / self.steps * 1e6 if self.steps else 0.0,
+            'max_step_us': self.slowest * 1e6,
+            'steps': self.steps,
+        }
+        if self.frames is not None:
+            frames = self.controller.frameCount - self.frames
+            stats['input_hz'] = frames / elapsed if elapsed else 0.0
+        if self.error is not None:
+            stats['error'] = repr(self.error)
+        return stats
+
+
+class Fleet:
+    """
+    Runs any number of controller and pilot pairs at a fixed tick rate in the calling thread.
+    """
+
+    def __init__(self, rate=100.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: steps per second of each pilot
+        :param clock: function returning the current time in seconds
+        :param sleep: function sleeping for a number of seconds, used while no controller has a pipe
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.ticker = ticker.Ticker(rate, clock)
+        self.pairs = []
+        self.selector = selectors.DefaultSelector()
+
+    def add(self, name, controller, pilot):
+        """
+        :param name: label for the pair in reports
+        :param controller: the pair's controller, already open
+        :param pilot: object with step(now) and stop() acting on the controller's input
+        :return: the new Pair
+        """
+        pair = Pair(name, controller, pilot)
+        if hasattr(controller, 'readAvailable') and not getattr(controller, 'threaded', False):
+            self.selector.register(controller.pipe, selectors.EVENT_READ, pair)
+            pair.registered = True
+        self.pairs.append(pair)
+        return pair
+
+    def finish(self, pair, error=None):
+        """Stop a pair's robot and take it out of the loop."""
+        if pair.registered:
+            self.selector.unregister(pair.controller.pipe)
+            pair.registered = False
+        if error is not None and pair.error is None:
+            pair.error = error
+        pair.finished = self.clock()
+        try:
+            pair.pilot.stop()
+        except Exception as e:
+            if pair.error is None:
+                pair.error = e
+
+    def run(self, duration=None):
+        """
+        Serve every pair until all of them have finished.
+
+        :param duration: seconds after which the remaining pairs are finished; None to run until they end
+        """
+        active = [pair for pair in self.pairs if pair.finished is None]
+        now = self.clock()
+        for pair in active:
+            pair.started = now
+        end = None if duration is None else now + duration
+        pacer = self.ticker
+        pacer.reset()
+        turn = 0
+        while active:
+            # wait for input until the next tick is due, draining pipes as they become readable
+            timeout = pacer.remaining()
+            if self.selector.get_map():
+                ready = self.selector.select(timeout)
+            else:
+                ready = ()
+                self.sleep(timeout)
+            for key, mask in ready:
+                pair = key.data
+                try:
+                    pair.controller.readAvailable()
+                except (IOError, OSError, ValueError) as e:
+                    # frames read before the unplug are published; the pilot sees them this tick
+                    self.selector.unregister(pair.controller.pipe)
+                    pair.registered = False
+                    pair.error = e
+            now = self.clock()
+            if pacer.remaining(now) > 0:
+                continue
+            # a step that overran a whole tick makes the ticker skip ahead rather than bunch up steps
+            pacer.tick(now)
+
+            # step every pilot once, rotating which pair goes first
+            start = turn % len(active)
+            turn += 1
+            for pair in active[start:] + active[:start]:
+                began = self.clock()
+                try:
+                    keep = pair.pilot.step(began)
+                except Exception as e:
+                    pair.error = e
+                    keep = False
+                spent = self.clock() - began
+                if not pair.steps:
+                    pair.first_step = began
+                pair.last_step = began
+                pair.steps += 1
+                pair.busy += spent
+                if spent > pair.slowest:
+                    pair.slowest = spent
+                if not keep or pair.error is not None:
+                    self.finish(pair)
+            active = [pair for pair in active if pair.finished is None]
+
+            now = self.clock()
+            if end is not None and now >= end:
+                for pair in active:
+                    self.finish(pair)
+                break
+
+    def report(self):
+        """
+        :return: dict of pair name to its statistics, plus 'loop' for the ticker's statistics
+        """
+        report = {pair.name: pair.statistics() for pair in self.pairs}
+        report['loop'] = self.ticker.statistics()
+        return report
+
+    def close(self):
+        self.selector.close()
+
+
+@contextlib.contextmanager
+def robot_connections(serials, ios=False):
+    """
+    Connect to the robot behind each mobile device, each connection on its own event loop thread
+    the way cozmo.run_program runs a single one, and disconnect them all on exit.
+
+        with robot_connections(['serial1', 'serial2']) as robots:
+            ...
+
+    :param serials: serial numbers of the devices running the Cozmo app in SDK mode
+    :param ios: True for iOS devices, False for Android devices
+    :return: context manager yielding the list of robots, in the order of serials
+    """
+    from cozmo import base, conn, run
+
+    threads = []
+    robots = []
+    try:
+        for serial in serials:
+            if ios:
+                connector = run.IOSConnector(serial=serial)
+            else:
+                connector = run.AndroidConnector(serial=serial)
+            abort_future = concurrent.futures.Future()
+            loop = asyncio.new_event_loop()
+            loop.set_exception_handler(functools.partial(run._sync_exception_handler, abort_future))
+            factory = functools.partial(conn.CozmoConnection, _sync_abort_future=abort_future)
+            thread = run._LoopThread(loop, conn_factory=factory, connector=connector, abort_future=abort_future)
+            connection = thread.start()
+            threads.append(thread)
+            robots.append(base._SyncProxy(connection).wait_for_robot())
+        yield robots
+    finally:
+        for thread in threads:
+            thread.stop()
@@ -0,0 +1,223 @@
+""" Input-to-actuation latency instrumentation for the controller front ends
+
+Measures how long it takes from a controller frame arriving to the robot command it causes
+being sent, per command type, and counts input frames that were never acted on because a
+newer one replaced them first.
+
+Instrumentation is opt-in.  Set the COZMO_LATENCY environment variable to turn it on:
+
+    COZMO_LATENCY=1 python linux_scripts/cozmo_interface.py
+
+A summary is written to stderr when the program exits, and whenever SIGUSR1 (SIGBREAK on
+Windows) is received.  When it is off, from_environment() returns a monitor that does nothing
+and instrument() hands back the robot untouched, so the control loop pays only for one no-op
+call per tick.
+"""
+
+import atexit
+import os
+import signal
+import sys
+import threading
+import time
+
+# robot methods that are timed when a robot is instrumented
+COMMANDS = (
+    'drive_wheels', 'drive_straight', 'turn_in_place', 'stop_all_motors',
+    'move_lift', 'set_lift_height', 'move_head', 'set_head_angle',
+    'play_anim', 'say_text', 'set_all_backpack_lights', 'set_backpack_lights', 'set_backpack_lights_off',
+)
+
+
+class Histogram:
+    """
+    Log-linear histogram of durations in the style of HdrHistogram: every power of two of
+    microseconds is split into SUB_BUCKETS equal buckets, so any recorded value is reported
+    to within about 1/SUB_BUCKETS of its true size, in fixed memory and O(1) per record.
+    """
+
+    SUB_BITS = 4
+    SUB_BUCKETS = 1 << SUB_BITS
+
+    def __init__(self):
+        self.counts = [0] * (40 * self.SUB_BUCKETS)  # up to 2**40 us, about twelve days
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds):
+        """
+        Add one duration.
+
+        :param seconds: the duration in seconds
+        """
+        us = int(seconds * 1000000)
+        if us < 0:
+            us = 0
+        self.counts[self._index(us)] += 1
+        self.total += 1
+        if us > self.max:
+            self.max = us
+
+    def _index(self, us):
+        if us < self.SUB_BUCKETS:
+            return us
+        shift = us.bit_length() - self.SUB_BITS - 1
+        return min(((shift + 1) << self.SUB_BITS) + ((us >> shift) & (self.SUB_BUCKETS - 1)),
+                   len(self.counts) - 1)
+
+    def _value(self, index):
+        """Highest value in microseconds that falls into bucket index."""
+        if index < self.SUB_BUCKETS:
+            return index
+        shift = (index >> self.SUB_BITS) - 1
+        return (((self.SUB_BUCKETS | (index & (self.SUB_BUCKETS - 1))) + 1) << shift) - 1
+
+    def percentile(self, p):
+        """
+        :param p: percentile to find, 0 to 100
+        :return: the duration in seconds that p percent of the recorded values do not exceed
+        """
+        if not self.total:
+            return 0.0
+        target = max(1, int(self.total * p / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max) / 1000000.0
+        return self.max / 1000000.0
+
+
+class LatencyMonitor:
+    """
+    Collects input-to-command latencies.  The control loop calls frame() once per iteration
+    with the frame it is working from, and every command sent through an instrument()ed robot
+    is timed against that frame's arrival.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stderr
+        self.histograms = {}
+        self.frames = 0  # distinct input frames the loop worked from
+        self.superseded = 0  # frames that arrived but were replaced before the loop saw them
+        self.last_number = None
+        self.timestamp = None
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def frame(self, number, timestamp):
+        """
+        Note the input frame the current loop iteration is acting on.
+
+        :param number: sequence number of the frame, increasing by one per frame received
+        :param timestamp: time.monotonic() at which the frame was received
+        """
+        if number != self.last_number:
+            if self.last_number is not None and number > self.last_number + 1:
+                self.superseded += number - self.last_number - 1
+            self.frames += 1
+            self.last_number = number
+        self.timestamp = timestamp
+
+    def command(self, name):
+        """
+        Record that a command is being sent in response to the current frame.
+
+        :param name: command type, normally the robot method name
+        """
+        if self.timestamp is None:
+            return
+        latency = time.monotonic() - self.timestamp
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(latency)
+
+    def instrument(self, robot):
+        """
+        :param robot: cozmo robot object
+        :return: a stand-in for robot that times every call in COMMANDS
+        """
+        return _TimedRobot(robot, self)
+
+    def summary(self):
+        """
+        :return: a printable table of latency percentiles per command and frame counts
+        """
+        elapsed = time.monotonic() - self.started
+        lines = ['{:<26}{:>8}{:>10}{:>10}{:>10}'.format('command', 'count', 'p50 ms', 'p99 ms', 'max ms')]
+        with self._lock:
+            for name in sorted(self.histograms):
+                histogram = self.histograms[name]
+                lines.append('{:<26}{:>8}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+                    name, histogram.total, histogram.percentile(50) * 1000, histogram.percentile(99) * 1000,
+                    histogram.max / 1000.0))
+        lines.append('frames used {0}, superseded {1}, in {2:.1f} s'.format(self.frames, self.superseded, elapsed))
+        return '\n'.join(lines)
+
+    def dump(self, *args):
+        """Write the summary to the monitor's stream. Accepts and ignores signal handler arguments."""
+        self.stream.write(self.summary() + '\n')
+        self.stream.flush()
+
+    def install(self):
+        """Dump the summary at exit and on SIGUSR1 (SIGBREAK on Windows)."""
+        atexit.register(self.dump)
+        signum = getattr(signal, 'SIGUSR1', getattr(signal, 'SIGBREAK', None))
+        # signal handlers can only be installed from the main thread
+        if signum is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signum, self._dump_later)
+
+    def _dump_later(self, *args):
+        # The handler runs on the main thread between any two bytecodes, possibly while command()
+        # holds the lock or the loop is writing to the stream, so dumping right here could deadlock
+        # or re-enter the stream.  Another thread waits for the lock instead.
+        threading.Thread(target=self.dump, name='latency-dump', daemon=True).start()
+
+
+class NullMonitor:
+    """Monitor used when instrumentation is off. Every method does nothing."""
+
+    def frame(self, number, timestamp):
+        pass
+
+    def command(self, name):
+        pass
+
+    def instrument(self, robot):
+        return robot
+
+    def dump(self, *args):
+        pass
+
+
+class _TimedRobot:
+    """Forwards everything to the wrapped robot, timing the methods listed in COMMANDS."""
+
+    def __init__(self, robot, monitor):
+        self._robot = robot
+        self._monitor = monitor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._robot, name)
+        if name not in COMMANDS:
+            return attribute
+        monitor = self._monitor
+
+        def timed(*args, **kwargs):
+            monitor.command(name)
+            return attribute(*args, **kwargs)
+        return timed
+
+
+def from_environment(variable='COZMO_LATENCY'):
+    """
+    :param variable: environment variable that turns instrumentation on when set and not '0'
+    :return: an installed LatencyMonitor if instrumentation is on, otherwise a NullMonitor
+    """
+    if os.environ.get(variable, '0') in ('', '0'):
+        return NullMonitor()
+    monitor = LatencyMonitor()
+    monitor.install()
+    return monitor
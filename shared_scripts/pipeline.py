@@ -0,0 +1,370 @@
+""" asyncio control pipeline for the cozmo SDK's asynchronous robot API
+
+Three tasks run on the SDK's event loop, joined by latest-value channels so that each one only
+ever sees the newest output of the stage before it:
+
+    sample  -> inputs   -> control -> commands -> dispatch
+    (pipe or timer)        (rate Hz)              (awaits the robot)
+
+* sampling wakes when the controller has input: loop.add_reader on the pipe of an unthreaded
+  xbox.Joystick or EvdevJoystick, or a timer polling read() for XInputJoystick and SharedJoystick
+* control turns the newest State into one command per actuator, whenever new input arrives and
+  otherwise rate times a second while the drive ramp is still moving
+* dispatch sends the commands that changed, awaiting the ones the SDK makes coroutines
+
+A slow robot only delays dispatch, and the commands it missed in the meantime are superseded
+rather than queued, so sampling and control keep their own rates:
+
+    async def program(sdk_conn):
+        robot = await sdk_conn.wait_for_robot()
+        runner = Pipeline(joystick, robot, Controls())
+        await runner.run()
+        print(runner.statistics())
+
+    cozmo.connect(program)
+
+FakeAsyncRobot stands in for the robot where there is none, e.g. in the benchmarks.
+"""
+
+import asyncio
+import collections
+import time
+
+import controller
+import drive
+import ticker
+
+DEADZONE = 4000  # raw stick values treated as centered, as in xbox.axisScale
+
+
+class Latest:
+    """
+    Latest-value channel from one task to one other: put() replaces the value and wakes the
+    reader if it is waiting for something newer than the version it last saw.  Values the reader
+    never got to see are counted as superseded.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.version = 0
+        self.taken = 0  # version last returned by wait()
+        self.superseded = 0
+        self._waiter = None  # future the reader is waiting on
+
+    def put(self, value):
+        if self.version != self.taken:
+            self.superseded += 1
+        self.value = value
+        self.version += 1
+        _wake(self._waiter)
+
+    async def wait(self, seen, timeout=None):
+        """
+        :param seen: version the caller already has, 0 for none
+        :param timeout: seconds to wait at most, None to wait indefinitely
+        :return: a tuple containing (version, value); the version equals seen on timeout
+        """
+        if self.version == seen:
+            # a bare future rather than asyncio.wait_for, which can swallow the task's cancellation
+            # when the timeout and a put() land together, and costs a task per wait
+            loop = asyncio.get_event_loop()
+            waiter = self._waiter = loop.create_future()
+            timer = None if timeout is None else loop.call_later(timeout, _wake, waiter)
+            try:
+                await waiter
+            finally:
+                self._waiter = None
+                if timer is not None:
+                    timer.cancel()
+        self.taken = self.version
+        return self.version, self.value
+
+
+def _wake(waiter):
+    if waiter is not None and not waiter.done():
+        waiter.set_result(None)
+
+
+def scale(raw, deadzone=DEADZONE):
+    """Raw stick value to -1.0 to 1.0, with the deadzone around center mapped to 0."""
+    if -deadzone < raw < deadzone:
+        return 0.0
+    if raw < 0:
+        return (raw + deadzone) / (32768.0 - deadzone)
+    return (raw - deadzone) / (32767.0 - deadzone)
+
+
+class Controls:
+    """
+    Computes a command per actuator from a controller.State: the left stick drives, the right
+    stick turns and tilts the head, the bumpers boost the drive and turn speeds, and the left and
+    right triggers raise and lower the lift.  Returns None once the stop button is pressed.
+    """
+
+    def __init__(self, mixer=None, head_speed=1.0, lift_speed=1.0, boost_forward_speed=None,
+                 boost_turn_speed=None, stop_button=controller.GUIDE):
+        """
+        :param mixer: drive.DriveMixer for the wheels; None for one with a 600 mm/s^2 ramp
+        :param head_speed: head speed in radians per second with the right stick fully up or down
+        :param lift_speed: lift speed in radians per second with a trigger fully pressed
+        :param boost_forward_speed: forward speed while the left bumper is held, None for no boost
+        :param boost_turn_speed: turn speed while the right bumper is held, None for no boost
+        :param stop_button: button bit ending the pipeline
+        """
+        self.mixer = mixer if mixer is not None else drive.DriveMixer(expo=0.3, acceleration=600)
+        self.head_speed = head_speed
+        self.lift_speed = lift_speed
+        self.boost_forward_speed = boost_forward_speed
+        self.boost_turn_speed = boost_turn_speed
+        self.stop_button = stop_button
+
+    def __call__(self, state, now):
+        """
+        :param state: controller.State to act on
+        :param now: current time, for the drive ramp
+        :return: dict of actuator to a tuple containing (robot method name, arguments), or None to stop
+        """
+        buttons = state.buttons
+        if buttons & self.stop_button:
+            return None
+        mixer = self.mixer
+        if state.connected:
+            speeds = mixer.mix(scale(state.ly), scale(state.rx),
+                               self.boost_forward_speed if buttons & controller.LEFT_BUMPER else None,
+                               self.boost_turn_speed if buttons & controller.RIGHT_BUMPER else None)
+            left, right = mixer.step(*speeds, now=now)
+            head = scale(state.ry) * self.head_speed
+            lift = (state.lt - state.rt) / 255.0 * self.lift_speed
+        else:
+            left, right = mixer.step(0, 0, now=now)
+            head = lift = 0.0
+        return {
+            'wheels': ('drive_wheels', (left, right, mixer.acceleration, mixer.acceleration)),
+            'head': ('move_head', (head,)),
+            'lift': ('move_lift', (lift,)),
+        }
+
+    def resume(self):
+        """Called by Pipeline after sleeping on settled input, so the sleep is not ramp time."""
+        self.mixer.hold()
+
+
+class Pipeline:
+    """
+    Runs sampling, control and dispatch for one controller and robot on the current event loop.
+    """
+
+    def __init__(self, source, robot, compute, rate=100.0, poll_interval=0.004, max_dispatch_rate=30.0,
+                 stop_on_disconnect=False, resume=None, clock=time.monotonic):
+        """
+        :param source: controller.Controller to sample
+        :param robot: async cozmo robot (or anything with the same methods)
+        :param compute: function of (State, now) returning a command dict, or None to stop; see Controls
+        :param rate: control steps per second without new input
+        :param poll_interval: seconds between polls of a controller without a pipe
+        :param max_dispatch_rate: most command batches sent to the robot per second
+        :param stop_on_disconnect: end the pipeline when the controller reports it is disconnected
+        :param resume: function called before the first step after control slept on settled input, e.g. a
+                       DriveMixer's hold; defaults to compute's resume method, if it has one
+        :param clock: function returning the current time in seconds
+        """
+        self.source = source
+        self.robot = robot
+        self.compute = compute
+        self.ticker = ticker.Ticker(rate, clock)
+        self.poll_interval = poll_interval
+        self.dispatch_interval = 1.0 / max_dispatch_rate if max_dispatch_rate else 0.0
+        self.stop_on_disconnect = stop_on_disconnect
+        self.resume = resume if resume is not None else getattr(compute, 'resume', None)
+        self.clock = clock
+        self.inputs = None  # Latest channels, created on the loop by run()
+        self.commands = None
+        self.samples = 0
+        self.steps = 0
+        self.dispatched = 0
+
+    def _publish(self, state):
+        if state is not self.inputs.value:
+            self.samples += 1
+            self.inputs.put(state)
+
+    async def sample_pipe(self):
+        """Publish a State whenever the controller's pipe has input; return once it closes."""
+        loop = asyncio.get_event_loop()
+        closed = loop.create_future()
+        source = self.source
+        fd = source.pipe if isinstance(source.pipe, int) else source.pipe.fileno()  # EvdevJoystick keeps a raw fd
+
+        def readable():
+            try:
+                source.readAvailable()
+                state = source.read()
+            except (IOError, ValueError) as e:  # unplugged, or the pipe closed under us
+                loop.remove_reader(fd)
+                if not closed.done():
+                    closed.set_result(e)
+                return
+            except Exception as e:  # a bug in the source; raise it from run() rather than the loop's log
+                loop.remove_reader(fd)
+                if not closed.done():
+                    closed.set_exception(e)
+                return
+            self._publish(state)
+
+        loop.add_reader(fd, readable)
+        try:
+            await closed
+        finally:
+            loop.remove_reader(fd)
+
+    async def sample_poll(self):
+        """Publish each new State read every poll_interval seconds."""
+        source = self.source
+        while True:
+            state = source.read()
+            self._publish(state)
+            if self.stop_on_disconnect and not state.connected:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def control(self):
+        """
+        Compute commands from the newest input; return once compute asks to stop.  Once a step
+        computes the same commands as the one before, the drive ramp has settled, so the stage
+        sleeps until new input instead of ticking, and calls resume before stepping again.
+        """
+        pacer = self.ticker
+        pacer.reset()
+        clock = self.clock
+        last = None
+        settled = False
+        seen = 0
+        while True:
+            seen, state = await self.inputs.wait(seen, None if settled else pacer.remaining())
+            now = clock()
+            if settled or not pacer.remaining(now):
+                pacer.tick(now)
+            if state is None:
+                continue  # nothing sampled yet
+            resumed = settled
+            if resumed and self.resume is not None:
+                self.resume()
+            command = self.compute(state, now)
+            if command is None:
+                return
+            self.steps += 1
+            settled = command == last and not resumed  # a ramp just resumed has yet to move
+            if settled:
+                pacer.pause()
+                continue
+            last = command
+            self.commands.put(command)
+
+    async def dispatch(self):
+        """Send every actuator's command that differs from the last one sent to it."""
+        robot = self.robot
+        sent = {}
+        seen = 0
+        while True:
+            seen, command = await self.commands.wait(seen)
+            for actuator, call in command.items():
+                if sent.get(actuator) != call:
+                    name, args = call
+                    result = getattr(robot, name)(*args)
+                    if asyncio.iscoroutine(result):
+                        await result
+                    sent[actuator] = call
+                    self.dispatched += 1
+            if self.dispatch_interval:
+                await asyncio.sleep(self.dispatch_interval)
+
+    async def run(self):
+        """
+        Run the three stages until sampling ends or compute asks to stop, then stop the robot.
+        A stage's error is raised in preference to one from stopping the robot.
+        """
+        self.inputs = Latest()
+        self.commands = Latest()
+        if getattr(self.source, 'pipe', None) is not None and not getattr(self.source, 'threaded', False):
+            sample = self.sample_pipe()
+        else:
+            sample = self.sample_poll()
+        tasks = [asyncio.ensure_future(stage) for stage in (sample, self.control(), self.dispatch())]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            stop_error = await self._stop()
+        for task in done:
+            task.result()  # raise whatever ended the stage, if it failed, rather than a failure to stop
+        if stop_error is not None:
+            raise stop_error
+
+    async def _stop(self):
+        """
+        Stop the wheels and then every motor, trying both even if the first fails.
+
+        :return: the first exception raised, or None
+        """
+        error = None
+        try:
+            stopped = self.robot.drive_wheels(0, 0)
+            if asyncio.iscoroutine(stopped):
+                await stopped
+        except Exception as e:
+            error = e
+        try:
+            self.robot.stop_all_motors()
+        except Exception as e:
+            error = error or e
+        return error
+
+    def statistics(self):
+        """
+        :return: dict of the samples, control steps and commands dispatched, the commands and inputs
+                 superseded before the next stage took them, and the control ticker's statistics
+        """
+        return {
+            'samples': self.samples,
+            'control_steps': self.steps,
+            'dispatched': self.dispatched,
+            'inputs_superseded': self.inputs.superseded if self.inputs else 0,
+            'commands_superseded': self.commands.superseded if self.commands else 0,
+            'control': self.ticker.statistics(),
+        }
+
+
+class FakeAsyncRobot:
+    """
+    Stands in for the SDK's async Robot: drive_wheels is a coroutine taking latency seconds,
+    like a round trip to the robot, and the other motor commands return at once.  Every call is
+    counted in calls, and the last wheel, head and lift commands are kept.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.wheels = (0.0, 0.0)
+        self.head = 0.0
+        self.lift = 0.0
+
+    async def drive_wheels(self, l_wheel_speed, r_wheel_speed, l_wheel_acc=None, r_wheel_acc=None, duration=None):
+        self.calls['drive_wheels'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.wheels = (l_wheel_speed, r_wheel_speed)
+
+    def move_head(self, speed):
+        self.calls['move_head'] += 1
+        self.head = speed
+
+    def move_lift(self, speed):
+        self.calls['move_lift'] += 1
+        self.lift = speed
+
+    def stop_all_motors(self):
+        self.calls['stop_all_motors'] += 1
+        self.wheels = (0.0, 0.0)
+        self.head = self.lift = 0.0
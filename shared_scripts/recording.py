@@ -0,0 +1,255 @@
+""" Record and replay of controller input streams
+
+A recording is a compact binary log of what a controller backend received, each record
+stamped with the monotonic time since the recording started:
+
+    header:  4s magic 'CZXR', B version, B kind
+    record:  Q nanoseconds since start, H payload length, payload
+
+Payloads longer than 65535 bytes, such as a full 64 KiB drain of the xboxdrv pipe, are stored
+as several consecutive records with the same timestamp, which replay back to back.
+
+The payload depends on the kind of recording:
+
+    XBOXDRV  raw bytes read from the xboxdrv pipe (text lines, possibly split across records)
+    EVDEV    raw struct input_event records read from an event node
+    XINPUT   one XINPUT_RECORD per change of the XInput packet number
+
+Recording is turned on by setting COZMO_RECORD to a file name, and replay by setting
+COZMO_REPLAY, when running either front end:
+
+    COZMO_RECORD=drive.czxr python linux_scripts/cozmo_interface.py
+    COZMO_REPLAY=drive.czxr python linux_scripts/cozmo_interface.py
+
+Set COZMO_REPLAY_SPEED to replay faster (2 is double speed) or to 0 for as fast as possible.
+A Joystick only keeps the newest frame, so at speed 0 it skips whatever arrives while it is
+busy; a finite speed such as 20 compresses a session while keeping every change visible.
+xboxdrv recordings can also be played as a stand-in xboxdrv process, which is how xbox.Joystick
+consumes them:
+
+    python shared_scripts/recording.py drive.czxr [speed]
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+
+MAGIC = b'CZXR'
+VERSION = 1
+
+# kinds of recording
+XBOXDRV = 1
+EVDEV = 2
+XINPUT = 3
+
+HEADER = struct.Struct('<4sBB')
+RECORD = struct.Struct('<QH')
+MAX_PAYLOAD = 0xFFFF  # longest payload a record's length field holds; longer writes are split
+# packet number, buttons, left trigger, right trigger, left x, left y, right x, right y
+XINPUT_RECORD = struct.Struct('<IHBBhhhh')
+
+ERROR_SUCCESS = 0
+ERROR_DEVICE_NOT_CONNECTED = 1167
+
+
+class Recorder:
+    """
+    Appends timestamped payloads to a recording file.  Writes are buffered, so call close()
+    when done to be sure everything reaches the disk.
+    """
+
+    def __init__(self, path, kind):
+        """
+        :param path: file to create, replacing any existing one
+        :param kind: XBOXDRV, EVDEV or XINPUT
+        """
+        self.kind = kind
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, kind))
+        self.started = time.monotonic()
+
+    def write(self, payload):
+        """
+        :param payload: bytes-like object to store; over MAX_PAYLOAD bytes it is split across records
+        """
+        nanoseconds = int((time.monotonic() - self.started) * 1e9)
+        payload = memoryview(payload)
+        for start in range(0, max(len(payload), 1), MAX_PAYLOAD):
+            chunk = payload[start:start + MAX_PAYLOAD]
+            self.file.write(RECORD.pack(nanoseconds, len(chunk)))
+            self.file.write(chunk)
+
+    def write_xinput(self, state):
+        """
+        :param state: XINPUT_STATE structure filled in by XInputGetState
+        """
+        gamepad = state.gamepad
+        self.write(XINPUT_RECORD.pack(state.packet_number & 0xFFFFFFFF, gamepad.buttons,
+                                      gamepad.left_trigger, gamepad.right_trigger,
+                                      gamepad.l_thumb_x, gamepad.l_thumb_y, gamepad.r_thumb_x, gamepad.r_thumb_y))
+
+    def close(self):
+        self.file.close()
+
+
+def load(path):
+    """
+    Read a whole recording.
+
+    :param path: recording file
+    :return: a tuple containing (kind, list of (seconds since start, payload bytes))
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, kind = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('{0} is not a controller recording'.format(path))
+    records = []
+    offset = HEADER.size
+    while offset + RECORD.size <= len(data):
+        nanoseconds, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        records.append((nanoseconds / 1e9, data[offset:offset + length]))
+        offset += length
+    return kind, records
+
+
+def play(records, write, speed=1.0):
+    """
+    Pass each payload to write, keeping the recorded spacing in time.
+
+    :param records: list of (seconds since start, payload) as returned by load()
+    :param write: callable taking one payload
+    :param speed: playback rate, 1.0 for real time; 0 plays as fast as write accepts data
+    """
+    started = time.monotonic()
+    for timestamp, payload in records:
+        if speed:
+            delay = started + timestamp / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        write(payload)
+
+
+def replay_command(path, speed=1.0):
+    """
+    :param path: XBOXDRV recording file
+    :param speed: playback rate, see play()
+    :return: argument list that runs this module as a stand-in for xboxdrv, for xbox.Joystick(command=...)
+    """
+    return [sys.executable, os.path.abspath(__file__), path, str(speed)]
+
+
+def replay_pipe(path, speed=1.0):
+    """
+    Replay a recording into a pipe from a background thread, e.g. for evdev_joystick.EvdevJoystick(fd).
+    The write end is closed when the recording ends, which readers see as the controller unplugging.
+
+    :param path: EVDEV or XBOXDRV recording file
+    :param speed: playback rate, see play()
+    :return: file descriptor of the read end of the pipe
+    """
+    kind, records = load(path)
+    read_fd, write_fd = os.pipe()
+
+    def run():
+        try:
+            play(records, lambda payload: os.write(write_fd, payload), speed)
+        except OSError:  # reader went away
+            pass
+        finally:
+            os.close(write_fd)
+
+    player = threading.Thread(target=run, name='replay')
+    player.daemon = True
+    player.start()
+    return read_fd
+
+
+class ReplayXInput:
+    """
+    Stands in for the XInput library, answering XInputGetState from an XINPUT recording for
+    a single controller.  In real time mode each call returns the state recorded at that point
+    of the session; with speed 0 each call returns the next recorded state.  Once the recording
+    is exhausted the controller reports as disconnected.
+    """
+
+    def __init__(self, path, speed=1.0, device_number=0):
+        """
+        :param path: XINPUT recording file
+        :param speed: playback rate, see play()
+        :param device_number: controller index the recording is served as
+        """
+        kind, records = load(path)
+        if kind != XINPUT:
+            raise ValueError('{0} is not an XInput recording'.format(path))
+        self.records = [(timestamp, XINPUT_RECORD.unpack(payload)) for timestamp, payload in records]
+        self.speed = speed
+        self.device_number = device_number
+        self.index = -1
+        self.started = None
+
+        # functions the caller may set argtypes/restype on, like ctypes function pointers
+        def XInputSetState(device_number, vibration):
+            return ERROR_SUCCESS
+
+        def XInputGetBatteryInformation(device_number, device_type, battery):
+            battery._obj.BatteryType = 0x01  # wired
+            battery._obj.BatteryLevel = 0x03  # full
+            return ERROR_SUCCESS
+        self.XInputSetState = XInputSetState
+        self.XInputGetBatteryInformation = XInputGetBatteryInformation
+
+    def XInputGetState(self, device_number, state):
+        if device_number != self.device_number:
+            return ERROR_DEVICE_NOT_CONNECTED
+        if self.speed:
+            now = time.monotonic()
+            if self.started is None:
+                self.started = now
+            elapsed = (now - self.started) * self.speed
+            while self.index + 1 < len(self.records) and self.records[self.index + 1][0] <= elapsed:
+                self.index += 1
+            if self.index < 0:
+                self.index = 0
+            if self.index == len(self.records) - 1 and elapsed > self.records[-1][0] + 1.0:
+                return ERROR_DEVICE_NOT_CONNECTED
+        else:
+            self.index += 1
+        if self.index >= len(self.records):
+            return ERROR_DEVICE_NOT_CONNECTED
+        values = self.records[self.index][1]
+        state = state._obj
+        gamepad = state.gamepad
+        (state.packet_number, gamepad.buttons, gamepad.left_trigger, gamepad.right_trigger,
+         gamepad.l_thumb_x, gamepad.l_thumb_y, gamepad.r_thumb_x, gamepad.r_thumb_y) = values
+        return ERROR_SUCCESS
+
+
+def main(argv):
+    """Play an XBOXDRV recording on stdout the way xboxdrv prints controller input."""
+    if len(argv) < 2:
+        sys.stderr.write('usage: recording.py RECORDING [SPEED]\n')
+        return 2
+    kind, records = load(argv[1])
+    if kind != XBOXDRV:
+        sys.stderr.write('{0} is not an xboxdrv recording\n'.format(argv[1]))
+        return 2
+    out = sys.stdout.buffer
+    out.write(b'Press Ctrl-c to quit, press Ctrl-z to send this process to the background\n')
+    out.flush()
+
+    def write(payload):
+        out.write(payload)
+        out.flush()
+    try:
+        play(records, write, float(argv[2]) if len(argv) > 2 else 1.0)
+    except BrokenPipeError:  # Joystick was closed
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,113 @@
+""" Robot command deduplication and rate limiting
+
+CommandShaper sits between the control logic and the cozmo robot and decides which of the
+streaming motor commands (drive_wheels, move_lift, move_head) are worth sending:
+
+* a command equal to the last one sent for the same actuator is dropped
+* a command that differs from the last one sent by less than the actuator's threshold is dropped
+* a command is held back if one was sent to the actuator less than 1 / max rate seconds ago
+* a stop (all values zero) is always sent at once, unless the actuator is already stopped
+
+Control loops can therefore issue commands every tick and leave it to the shaper to keep the
+robot link's queue short. Because held back and below threshold commands are simply dropped,
+callers must keep re-issuing the current command each tick so that it goes out once allowed.
+Every other attribute is passed through to the wrapped robot.
+
+Commands the caller sends some other way, such as set_lift_height actions started through an
+action_scheduler.ActionScheduler, can be put to the same rules with allow() before sending them.
+"""
+
+import time
+
+# smallest change worth sending: wheel speed in mm/s, lift and head speed in their -1.0 to 1.0 range;
+# lift heights are left to the caller to quantize
+DEFAULT_THRESHOLDS = {'drive_wheels': 5.0, 'move_lift': 0.05, 'move_head': 0.05, 'set_lift_height': 0.0}
+# most commands per second sent to each actuator; every new lift height aborts the move before it,
+# so those are kept rare enough for the lift to get somewhere in between
+DEFAULT_MAX_RATES = {'drive_wheels': 30.0, 'move_lift': 20.0, 'move_head': 20.0, 'set_lift_height': 4.0}
+
+
+class _Actuator:
+    """Last command sent to one actuator and counts of what happened to the ones after it."""
+
+    __slots__ = ('threshold', 'interval', 'last', 'sent_at', 'sent', 'suppressed')
+
+    def __init__(self, threshold, max_rate):
+        self.threshold = threshold
+        self.interval = 1.0 / max_rate if max_rate else 0.0
+        self.last = None
+        self.sent_at = None
+        self.sent = 0
+        self.suppressed = 0
+
+
+class CommandShaper:
+    """
+    Wraps a cozmo robot so repeated or insignificant motor commands are not sent.
+    """
+
+    def __init__(self, robot, thresholds=None, max_rates=None, clock=time.monotonic):
+        """
+        :param robot: cozmo robot object (or anything with the same methods)
+        :param thresholds: dict overriding DEFAULT_THRESHOLDS per command name
+        :param max_rates: dict overriding DEFAULT_MAX_RATES per command name, 0 for no limit
+        :param clock: function returning the current time in seconds
+        """
+        self._robot = robot
+        self._clock = clock
+        thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        max_rates = dict(DEFAULT_MAX_RATES, **(max_rates or {}))
+        self.actuators = {name: _Actuator(thresholds[name], max_rates[name]) for name in DEFAULT_THRESHOLDS}
+
+    def __getattr__(self, name):
+        return getattr(self._robot, name)
+
+    def allow(self, name, values):
+        """
+        :param name: command name, a key of self.actuators
+        :param values: tuple of the command's numeric arguments
+        :return: True if the command should be sent now, in which case it is recorded as sent
+        """
+        actuator = self.actuators[name]
+        last = actuator.last
+        if values != last:
+            if not any(values):
+                send = True  # stops go out immediately
+            elif last is not None and max(abs(a - b) for a, b in zip(values, last)) < actuator.threshold:
+                send = False
+            else:
+                now = self._clock()
+                send = actuator.sent_at is None or now - actuator.sent_at >= actuator.interval
+        else:
+            send = False
+        if not send:
+            actuator.suppressed += 1
+            return False
+        actuator.last = values
+        actuator.sent_at = self._clock()
+        actuator.sent += 1
+        return True
+
+    def drive_wheels(self, l_wheel_speed, r_wheel_speed, *args, **kwargs):
+        if self.allow('drive_wheels', (l_wheel_speed, r_wheel_speed)):
+            return self._robot.drive_wheels(l_wheel_speed, r_wheel_speed, *args, **kwargs)
+
+    def move_lift(self, speed):
+        if self.allow('move_lift', (speed,)):
+            return self._robot.move_lift(speed)
+
+    def move_head(self, speed):
+        if self.allow('move_head', (speed,)):
+            return self._robot.move_head(speed)
+
+    def stop_all_motors(self):
+        for actuator in self.actuators.values():
+            if actuator.last is not None:
+                actuator.last = (0,) * len(actuator.last)
+        return self._robot.stop_all_motors()
+
+    def statistics(self):
+        """
+        :return: dict of command name to a tuple containing (commands sent, commands suppressed)
+        """
+        return {name: (actuator.sent, actuator.suppressed) for name, actuator in self.actuators.items()}
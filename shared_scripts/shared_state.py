@@ -0,0 +1,277 @@
+""" Controller state shared between processes through a memory-mapped ring buffer
+
+Only one process can own the xboxdrv pipe or poll XInput.  Run this module as a daemon and it
+does that once, writing every decoded frame into a file mapped into memory; any number of other
+processes then read the newest frame, or the recent history, straight from the mapping:
+
+    python shared_scripts/shared_state.py &                     # Linux, xboxdrv
+    python shared_scripts/shared_state.py --evdev &             # Linux, /dev/input event node
+    python shared_scripts/shared_state.py &                     # Windows, XInput controller 0
+
+    reader = StateReader()
+    frame = reader.latest()     # controller.State(lx, ly, rx, ry, lt, rt, buttons, connected, timestamp, number)
+
+On Linux, COZMO_SHM=1 makes cozmo_interface.py and sample.py read through shared_joystick.py,
+so both can run at once.  Layout of the file (little endian):
+
+    header:  4s magic 'CZSM', H version, H slot count, Q frames published, d heartbeat
+    slot:    Q sequence, Q frame number, d timestamp, 4h sticks, 2B triggers, H buttons, B connected
+
+Frame n lives in slot n % slot count.  Each slot is a seqlock: the writer makes its sequence odd,
+writes the frame, then makes it even again, and a reader only accepts a copy taken between two
+equal, even reads of the sequence.  Readers never write to the mapping and never block the writer,
+and reading costs no system calls.  Buttons use the XInput wButtons layout shared by xbox.py.
+Timestamps come from time.monotonic, which is system wide, so they are comparable across processes.
+
+The daemon publishes a disconnected frame as it exits, however it ends.  It also stamps the
+heartbeat at least once a second while it runs, so readers can tell a writer that died without
+saying so (killed, or hung): once the heartbeat is older than stale_after seconds, StateReader
+reports the controller as disconnected.
+"""
+
+import argparse
+import mmap
+import os
+import select
+import struct
+import sys
+import tempfile
+import time
+
+import controller
+
+MAGIC = b'CZSM'
+VERSION = 2
+SLOTS = 256
+STALE_AFTER = 3.0  # seconds without a heartbeat before readers treat the writer as gone
+
+HEADER = struct.Struct('<4sHHQd')
+PUBLISHED = struct.Struct('<Q')  # frames published, a field of HEADER
+PUBLISHED_OFFSET = 8
+HEARTBEAT = struct.Struct('<d')  # time.monotonic of the writer's last sign of life, the last field of HEADER
+HEARTBEAT_OFFSET = 16
+SEQUENCE = struct.Struct('<Q')
+FRAME = struct.Struct('<Qdhhhh BBHB3x')  # follows the slot's sequence
+SLOT_SIZE = SEQUENCE.size + FRAME.size
+
+# /dev/shm keeps the file in memory on Linux; elsewhere the page cache does the same job
+DEFAULT_PATH = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'cozmo-controller')
+
+# a frame is a controller.State, whose first nine fields match xbox.Snapshot's constructor
+Frame = controller.State
+
+
+class StateWriter:
+    """
+    Creates the shared file and publishes frames into it.  There must be only one writer per file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, slots=SLOTS):
+        """
+        :param path: file to create, replacing any existing one
+        :param slots: frames of history kept
+        """
+        self.path = path
+        self.slots = slots
+        self.file = open(path, 'w+b')
+        self.file.truncate(HEADER.size + slots * SLOT_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, slots, 0, time.monotonic())
+        self.published = 0
+
+    def publish(self, lx, ly, rx, ry, lt, rt, buttons, connected, timestamp):
+        """
+        Write one frame: raw stick values -32768 to 32767, raw triggers 0 to 255, button bits.
+        """
+        number = self.published
+        offset = HEADER.size + (number % self.slots) * SLOT_SIZE
+        sequence = SEQUENCE.unpack_from(self.map, offset)[0]
+        SEQUENCE.pack_into(self.map, offset, sequence + 1)
+        FRAME.pack_into(self.map, offset + SEQUENCE.size, number, timestamp, lx, ly, rx, ry, lt, rt, buttons, connected)
+        SEQUENCE.pack_into(self.map, offset, sequence + 2)
+        self.published = number + 1
+        PUBLISHED.pack_into(self.map, PUBLISHED_OFFSET, self.published)
+
+    def beat(self, now=None):
+        """
+        Tell readers the writer is still running, even if there is no new input to publish.
+        """
+        HEARTBEAT.pack_into(self.map, HEARTBEAT_OFFSET, time.monotonic() if now is None else now)
+
+    def close(self):
+        """
+        Publish a disconnected frame, so readers release every button and stop the robot, then
+        remove the file.
+        """
+        self.publish(0, 0, 0, 0, 0, 0, 0, False, time.monotonic())
+        self.map.close()
+        self.file.close()
+        try:
+            os.unlink(self.path)
+        except OSError:  # still mapped by a reader on Windows
+            pass
+
+
+class StateReader:
+    """
+    Reads frames published by a StateWriter in another process.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, retries=100, stale_after=STALE_AFTER, clock=time.monotonic):
+        """
+        :param path: file created by the writer
+        :param retries: attempts at reading a slot the writer keeps changing before giving up on it
+        :param stale_after: seconds without a heartbeat after which the writer is taken to be gone
+        :param clock: function returning the current time in seconds, on the writer's time.monotonic scale
+        :raises IOError: if there is no such file or it is not controller state
+        """
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, version, self.slots, published, heartbeat = HEADER.unpack_from(self.view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise IOError('{0} is not shared controller state'.format(path))
+        self.retries = retries
+        self.stale_after = stale_after
+        self.clock = clock
+
+    def published(self):
+        """
+        :return: number of frames published so far; the newest is number published() - 1
+        """
+        return PUBLISHED.unpack_from(self.view, PUBLISHED_OFFSET)[0]
+
+    def alive(self):
+        """
+        :return: True if the writer's heartbeat is at most stale_after seconds old
+        """
+        return self.clock() - HEARTBEAT.unpack_from(self.view, HEARTBEAT_OFFSET)[0] <= self.stale_after
+
+    def read(self, number):
+        """
+        :param number: frame number
+        :return: the Frame, or None if it has not been written yet or was already overwritten
+        """
+        offset = HEADER.size + (number % self.slots) * SLOT_SIZE
+        view = self.view
+        for attempt in range(self.retries):
+            sequence = SEQUENCE.unpack_from(view, offset)[0]
+            if sequence & 1:
+                continue  # being written
+            values = FRAME.unpack_from(view, offset + SEQUENCE.size)
+            if SEQUENCE.unpack_from(view, offset)[0] == sequence:
+                break
+        else:
+            return None
+        if values[0] != number:
+            return None
+        return Frame(values[2], values[3], values[4], values[5], values[6], values[7], values[8],
+                     bool(values[9]), values[1], number)
+
+    def latest(self):
+        """
+        :return: the newest Frame, marked disconnected if the writer has gone stale, or None if
+                 nothing has been published yet
+        """
+        while True:
+            published = self.published()
+            if not published:
+                return None
+            frame = self.read(published - 1)
+            if frame is not None:
+                if frame.connected and not self.alive():
+                    return frame._replace(connected=False)
+                return frame
+            # the writer lapped this reader while it was copying; try the new newest frame
+
+    def since(self, number):
+        """
+        :param number: number of the last frame already seen, or -1 for none
+        :return: list of the frames published after it that are still held, oldest first
+        """
+        published = self.published()
+        first = max(number + 1, published - self.slots + 1)
+        frames = []
+        for n in range(first, published):
+            frame = self.read(n)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def history(self, count):
+        """
+        :param count: most frames to return
+        :return: list of up to count of the newest frames, oldest first
+        """
+        return self.since(self.published() - count - 1)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+
+def serve(writer, source, interval=0.004):
+    """
+    Publish each new State a controller.Controller reads until it raises, e.g. on unplugging.
+    Controllers with a pipe (unthreaded xbox.Joystick, EvdevJoystick) are drained as soon as
+    select() reports input; the others, such as XInputJoystick, are polled every interval seconds.
+    Either way the heartbeat is stamped at least once a second.
+    """
+    pipe = getattr(source, 'pipe', None)
+    previous = None
+    while True:
+        state = source.read()
+        if state is not previous:
+            writer.publish(*state[:9])
+            previous = state
+        writer.beat()
+        if pipe is not None:
+            readable, writeable, exception = select.select([pipe], [], [], 1.0)
+            if readable:
+                source.readAvailable()
+        else:
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Publish controller input into shared memory.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH, help='shared file (default %(default)s)')
+    parser.add_argument('--slots', type=int, default=SLOTS, help='frames of history kept')
+    parser.add_argument('--evdev', nargs='?', const='', metavar='DEVICE',
+                        help='Linux: read an event node (the first joystick if none given) instead of xboxdrv')
+    parser.add_argument('--xboxd', metavar='SOCKET', help='Linux: read from a running xboxd.py instead of xboxdrv')
+    parser.add_argument('--device', type=int, default=0, help='Windows: XInput controller number')
+    args = parser.parse_args(argv)
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    writer = StateWriter(args.path, args.slots)
+    try:
+        if sys.platform == 'win32':
+            sys.path.append(os.path.join(root, 'windows_scripts'))
+            from xinput import XInputJoystick
+            serve(writer, XInputJoystick(args.device))
+        else:
+            sys.path.append(os.path.join(root, 'linux_scripts'))
+            if args.evdev is not None:
+                from evdev_joystick import EvdevJoystick
+                joy = EvdevJoystick(args.evdev or None)
+            else:
+                import xbox
+                joy = xbox.Joystick(daemon=args.xboxd)
+            try:
+                serve(writer, joy)
+            finally:
+                joy.close()
+    except IOError as e:
+        sys.stderr.write('{0}\n'.format(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,489 @@
+""" Kinematic stand-in for a Cozmo robot, for load and soak testing without a robot or phone
+
+SimulatedRobot has the methods of cozmo.robot.Robot that the front ends use: drive_wheels,
+drive_straight, turn_in_place, set_lift_height, move_lift, move_head, play_anim, say_text,
+stop_all_motors and the backpack lights.  Instead of a robot it keeps a model of one:
+
+* every command reaches the model latency seconds after it is sent, in the order it was sent,
+  as over the SDK's link to the phone
+* the treads ramp towards their speeds at the requested acceleration, and the pose follows
+  differential-drive kinematics, integrated along exact arcs
+* the head and lift move at their speeds within the robot's limits, and set_lift_height drives
+  the lift to the height it asks for at its max_speed
+* actions last as long as the move, animation or speech they stand for.  One started while
+  another is running raises RobotBusy unless in_parallel is set, and one needing a track
+  (body, head, lift or voice) that a running action holds fails, as on the robot
+
+Time comes from a VirtualClock, whose sleep() moves it forward without waiting, so a control
+loop paced on it runs hours of simulated driving in seconds:
+
+    clock = VirtualClock()
+    robot = SimulatedRobot(clock, latency=0.03)
+    cozmo_interface.cozmo_program(robot, joystick, clock, clock.sleep)
+    print(robot.statistics())
+
+benchmarks/soak.py drives the Linux cozmo_program this way.
+"""
+
+import collections
+import heapq
+import itertools
+import math
+import random
+import time
+
+import cozmo
+
+TRACK_WIDTH = 45.0  # mm between the centers of Cozmo's treads
+MAX_WHEEL_SPEED = 220.0  # mm/s
+TURN_SPEED = math.radians(100)  # rad/s turned in place when no speed is given
+MIN_HEAD_ANGLE = cozmo.robot.MIN_HEAD_ANGLE.radians
+MAX_HEAD_ANGLE = cozmo.robot.MAX_HEAD_ANGLE.radians
+MIN_LIFT_ANGLE = cozmo.robot.MIN_LIFT_ANGLE.radians
+MAX_LIFT_ANGLE = cozmo.robot.MAX_LIFT_ANGLE.radians
+ANIMATION_SECONDS = 2.0  # length of an animation not listed in the robot's animation_seconds
+SPEECH_SECONDS = 0.5  # time say_text takes on top of SPEECH_SECONDS_PER_CHARACTER
+SPEECH_SECONDS_PER_CHARACTER = 0.07
+STEP = 0.01  # longest interval integrated as a single arc while the treads are ramping
+
+
+class VirtualClock:
+    """
+    Simulated time, starting at 0, that only passes when slept through: sleep() moves it forward
+    at once.
+    """
+
+    def __init__(self, speed=None):
+        """
+        :param speed: sleep in real time for 1 / speed of each virtual sleep, e.g. 10 to watch a run at
+                      ten times real time; None never sleeps
+        """
+        self.now = 0.0
+        self.speed = speed
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+            self.slept += seconds
+            if self.speed:
+                time.sleep(seconds / self.speed)
+
+
+def lift_angle(height):
+    """
+    :param height: lift height from 0.0 (bottom) to 1.0 (top), as set_lift_height takes it
+    :return: angle of the lift arm in radians
+    """
+    height_mm = (cozmo.robot.MIN_LIFT_HEIGHT_MM
+                 + min(max(height, 0.0), 1.0) * (cozmo.robot.MAX_LIFT_HEIGHT_MM - cozmo.robot.MIN_LIFT_HEIGHT_MM))
+    ratio = (height_mm - cozmo.robot.LIFT_PIVOT_HEIGHT.distance_mm) / cozmo.robot.LIFT_ARM_LENGTH.distance_mm
+    return math.asin(min(max(ratio, -1.0), 1.0))
+
+
+def _approach(current, target, change):
+    if current < target:
+        return min(current + change, target)
+    return max(current - change, target)
+
+
+def _ramp(speed, target, acceleration, step):
+    """Tread speed after step seconds accelerating towards target, landing on it exactly once it is reached."""
+    if not acceleration or acceleration * step >= abs(target - speed):
+        return target
+    return _approach(speed, target, acceleration * step)
+
+
+def _magnitude(value, unit):
+    """Plain number from a cozmo.util Distance, Speed or Angle (unit names its attribute), or a number."""
+    return getattr(value, unit, value)
+
+
+class SimulatedAction:
+    """
+    Action returned by the simulated robot's action methods, with the cozmo.action.Action
+    attributes the scripts use.  It is running from the moment it is sent until it finishes,
+    fails or is aborted.
+    """
+
+    def __init__(self, robot, name, tracks, duration, begin=None, end=None):
+        """
+        :param robot: SimulatedRobot running it
+        :param name: description for statistics and repr
+        :param tracks: set of the tracks it needs: 'body', 'head', 'lift' or 'voice'
+        :param duration: seconds from starting to finishing, or a function computing them when it starts
+        :param begin: function called when it starts on the robot, or None
+        :param end: function called when it stops on the robot for any reason, or None
+        """
+        self.robot = robot
+        self.name = name
+        self.tracks = tracks
+        self.duration = duration
+        self.begin = begin
+        self.end = end
+        self.state = 'sent'  # then 'running', and 'succeeded', 'failed' or 'aborted'
+        self.finishes = None  # time it finishes, once started
+
+    def __repr__(self):
+        return '<SimulatedAction {0} {1}>'.format(self.name, self.state)
+
+    @property
+    def is_running(self):
+        self.robot.update()
+        return self.state in ('sent', 'running')
+
+    @property
+    def is_completed(self):
+        return not self.is_running
+
+    @property
+    def has_succeeded(self):
+        return self.is_completed and self.state == 'succeeded'
+
+    def abort(self, log_abort_messages=False):
+        self.robot.send(self.robot._abort, self)
+
+    def wait_for_completed(self, timeout=None):
+        """Sleep on the robot's clock until the action stops, or for at most timeout seconds."""
+        robot = self.robot
+        clock = robot.clock
+        deadline = None if timeout is None else clock() + timeout
+        while self.is_running:
+            wake = self.finishes if self.finishes is not None else robot.next_event()
+            if deadline is not None:
+                if clock() >= deadline:
+                    raise cozmo.exceptions.ActionError('timed out waiting for ' + self.name)
+                wake = deadline if wake is None else min(wake, deadline)
+            clock.sleep(max(wake - clock(), STEP) if wake is not None else STEP)
+        return self
+
+
+class SimulatedRobot:
+    """
+    Model of a Cozmo robot with the methods of cozmo.robot.Robot the front ends call.
+    """
+
+    def __init__(self, clock=None, latency=0.0, jitter=0.0, animation_seconds=None, seed=0):
+        """
+        :param clock: function returning the current time in seconds, with a sleep method for waiting
+                      actions; None for a new VirtualClock
+        :param latency: seconds from sending a command to the robot acting on it
+        :param jitter: largest random delay added to latency, in seconds; commands stay in order
+        :param animation_seconds: dict of animation name to its length, for those not ANIMATION_SECONDS long
+        :param seed: seed of the jitter
+        """
+        self.clock = clock if clock is not None else VirtualClock()
+        self.latency = latency
+        self.jitter = jitter
+        self.animation_seconds = animation_seconds or {}
+        self._random = random.Random(seed)
+        self._events = []  # heap of (time, sequence, function, args) not yet applied to the model
+        self._sequence = itertools.count()
+        self._last_due = 0.0
+        self.updated = self.clock()
+        # pose in mm and radians, counter-clockwise from the starting heading
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.left = self.right = 0.0  # tread speeds in mm/s
+        self._targets = (0.0, 0.0, None, None)  # target tread speeds and their accelerations in mm/s^2
+        self._wheels_owner = None  # action driving the treads, if they are not under drive_wheels
+        self.head_angle = 0.0
+        self.head_speed = 0.0
+        self.lift = MIN_LIFT_ANGLE
+        self.lift_speed = 0.0
+        self._lift_target = None  # (angle, speed) while set_lift_height is moving the lift
+        self.lights = (None,) * 5
+        self.running = []  # actions started and not finished
+        # statistics
+        self.commands = collections.Counter()
+        self.actions = collections.Counter()  # actions by final state, plus 'busy' for RobotBusy raised
+        self.odometer = 0.0
+        self.moving_time = 0.0
+        self.top_speed = 0.0
+
+    # --- time and events
+
+    def send(self, function, *args):
+        """Apply function(*args) to the model once the link's latency has passed."""
+        due = self.clock() + self.latency
+        if self.jitter:
+            due += self._random.uniform(0.0, self.jitter)
+        due = max(due, self._last_due)  # the link delivers in order
+        self._last_due = due
+        self._at(due, function, *args)
+
+    def _at(self, due, function, *args):
+        heapq.heappush(self._events, (due, next(self._sequence), function, args))
+
+    def next_event(self):
+        """
+        :return: time of the next change the model has scheduled, or None if there is none
+        """
+        return self._events[0][0] if self._events else None
+
+    def update(self):
+        """Bring the model up to the current time, applying every command and action event due by then."""
+        now = self.clock()
+        events = self._events
+        while events and events[0][0] <= now:
+            due, sequence, function, args = heapq.heappop(events)
+            self._integrate(due)
+            function(*args)
+        self._integrate(now)
+
+    def _integrate(self, until):
+        elapsed = until - self.updated
+        if elapsed <= 0:
+            return
+        self.updated = until
+        left_target, right_target, left_acc, right_acc = self._targets
+        while elapsed > 0:
+            if self.left == left_target and self.right == right_target:
+                step = elapsed  # constant speeds integrate exactly in one go
+                left = right = None
+            else:
+                # end the step where a ramp does, so the average speed over it stays exact; a tread
+                # without an acceleration takes its speed at once, in a step of no time
+                step = min([elapsed, STEP] + [abs(target - speed) / acc if acc else 0.0
+                                              for speed, target, acc in ((self.left, left_target, left_acc),
+                                                                         (self.right, right_target, right_acc))
+                                              if speed != target])
+                left = _ramp(self.left, left_target, left_acc, step)
+                right = _ramp(self.right, right_target, right_acc, step)
+            elapsed -= step
+            self._move(step, left, right)
+
+    def _move(self, step, left, right):
+        # average of the speeds at either end of the step, then an exact arc at those speeds
+        start_left, start_right = self.left, self.right
+        if left is not None:
+            self.left, self.right = left, right
+        left = (start_left + self.left) / 2
+        right = (start_right + self.right) / 2
+        if left or right:
+            speed = (left + right) / 2
+            turn = (right - left) / TRACK_WIDTH
+            heading = self.heading
+            if abs(turn) < 1e-9:
+                self.x += speed * step * math.cos(heading)
+                self.y += speed * step * math.sin(heading)
+            else:
+                radius = speed / turn
+                self.x += radius * (math.sin(heading + turn * step) - math.sin(heading))
+                self.y -= radius * (math.cos(heading + turn * step) - math.cos(heading))
+                self.heading = (heading + turn * step + math.pi) % (2 * math.pi) - math.pi
+            self.odometer += (abs(left) + abs(right)) / 2 * step
+            self.moving_time += step
+            self.top_speed = max(self.top_speed, abs(self.left), abs(self.right))
+        if self.head_speed:
+            self.head_angle = min(max(self.head_angle + self.head_speed * step, MIN_HEAD_ANGLE), MAX_HEAD_ANGLE)
+        if self._lift_target is not None:
+            target, speed = self._lift_target
+            self.lift = _approach(self.lift, target, speed * step)
+        elif self.lift_speed:
+            self.lift = min(max(self.lift + self.lift_speed * step, MIN_LIFT_ANGLE), MAX_LIFT_ANGLE)
+
+    # --- actions
+
+    def _action(self, name, tracks, duration, in_parallel, begin=None, end=None):
+        self.update()
+        self.commands[name] += 1
+        if not in_parallel and any(action.state in ('sent', 'running') for action in self.running):
+            self.actions['busy'] += 1
+            raise cozmo.exceptions.RobotBusy('{0} sent while another action is running'.format(name))
+        action = SimulatedAction(self, name, tracks, duration, begin, end)
+        self.running.append(action)
+        self.send(self._start, action)
+        return action
+
+    def _start(self, action):
+        if action.state != 'sent':
+            return  # aborted on its way
+        if any(other.state == 'running' and other.tracks & action.tracks for other in self.running):
+            self._stop(action, 'failed')  # tracks locked by a running action
+            return
+        action.state = 'running'
+        if action.begin is not None:
+            action.begin(action)
+        duration = action.duration(action) if callable(action.duration) else action.duration
+        action.finishes = self.updated + duration
+        self._at(action.finishes, self._stop, action, 'succeeded')
+
+    def _abort(self, action):
+        if action.state in ('sent', 'running'):
+            self._stop(action, 'aborted')
+
+    def _stop(self, action, state):
+        if action.state not in ('sent', 'running'):
+            return  # already aborted
+        started = action.state == 'running'
+        action.state = state
+        action.finishes = self.updated
+        self.actions[state] += 1
+        self.running.remove(action)
+        if started and action.end is not None:
+            action.end(action)
+
+    def _drive_action(self, action, left, right):
+        self._targets = (left, right, None, None)
+        self._wheels_owner = action
+
+    def _release_wheels(self, action):
+        if self._wheels_owner is action:
+            self._targets = (0.0, 0.0, None, None)
+            self._wheels_owner = None
+
+    def drive_straight(self, distance, speed, should_play_anim=True, in_parallel=False, num_retries=0):
+        """
+        :param distance: cozmo.util.Distance or mm to drive, negative for backwards
+        :param speed: cozmo.util.Speed or mm/s to drive at
+        """
+        distance = _magnitude(distance, 'distance_mm')
+        speed = min(abs(_magnitude(speed, 'speed_mmps')), MAX_WHEEL_SPEED)
+        wheel = math.copysign(speed, distance)
+        return self._action('drive_straight', {'body'}, abs(distance) / speed if speed else 0.0, in_parallel,
+                            lambda action: self._drive_action(action, wheel, wheel), self._release_wheels)
+
+    def turn_in_place(self, angle, in_parallel=False, num_retries=0, speed=None, accel=None, angle_tolerance=None,
+                      is_absolute=False):
+        """
+        :param angle: cozmo.util.Angle or radians to turn, positive for counter-clockwise
+        :param speed: cozmo.util.Angle or radians per second to turn at; None for TURN_SPEED
+        :param is_absolute: angle is the heading to end at rather than the angle to turn by
+        """
+        angle = _magnitude(angle, 'radians')
+        rate = abs(_magnitude(speed, 'radians')) if speed is not None else TURN_SPEED
+
+        def turn(action):
+            turn_by = angle
+            if is_absolute:
+                turn_by = (angle - self.heading + math.pi) % (2 * math.pi) - math.pi
+            wheel = min(rate * TRACK_WIDTH / 2, MAX_WHEEL_SPEED)
+            action.turn_time = abs(turn_by) / (wheel * 2 / TRACK_WIDTH) if wheel else 0.0
+            wheel = math.copysign(wheel, turn_by)
+            self._drive_action(action, -wheel, wheel)
+
+        return self._action('turn_in_place', {'body'}, lambda action: action.turn_time, in_parallel, turn,
+                            self._release_wheels)
+
+    def set_lift_height(self, height, accel=10.0, max_speed=10.0, duration=0.0, in_parallel=False, num_retries=0):
+        """
+        :param height: 0.0 (bottom) to 1.0 (top)
+        :param max_speed: lift speed in radians per second
+        :param duration: seconds the move should take instead, if not 0
+        """
+        target = lift_angle(height)
+
+        def move(action):
+            travel = abs(target - self.lift)
+            speed = travel / duration if duration else max_speed
+            action.travel_time = travel / speed if speed else 0.0
+            self._lift_target = (target, speed)
+            self.lift_speed = 0.0
+
+        def stop(action):
+            if self._lift_target is not None and self._lift_target[0] == target:
+                self._lift_target = None
+
+        return self._action('set_lift_height', {'lift'}, lambda action: action.travel_time, in_parallel, move, stop)
+
+    def play_anim(self, name, loop_count=1, in_parallel=False, num_retries=0, ignore_body_track=False,
+                  ignore_head_track=False, ignore_lift_track=False):
+        tracks = {'voice'}
+        if not ignore_body_track:
+            tracks.add('body')
+        if not ignore_head_track:
+            tracks.add('head')
+        if not ignore_lift_track:
+            tracks.add('lift')
+        seconds = self.animation_seconds.get(name, ANIMATION_SECONDS) * loop_count
+        return self._action('play_anim', tracks, seconds, in_parallel)
+
+    def say_text(self, text, play_excited_animation=False, use_cozmo_voice=True, duration_scalar=1.0,
+                 voice_pitch=0.0, in_parallel=False, num_retries=0):
+        tracks = {'voice', 'body', 'head', 'lift'} if play_excited_animation else {'voice'}
+        seconds = (SPEECH_SECONDS + SPEECH_SECONDS_PER_CHARACTER * len(text)) * duration_scalar
+        return self._action('say_text', tracks, seconds, in_parallel)
+
+    # --- motor and light commands
+
+    def _command(self, name, function, *args):
+        self.update()
+        self.commands[name] += 1
+        self.send(function, *args)
+
+    def drive_wheels(self, l_wheel_speed, r_wheel_speed, l_wheel_acc=None, r_wheel_acc=None, duration=None):
+        """
+        Like the SDK, each acceleration defaults to its wheel's speed (reaching it in a second),
+        and with a duration the call blocks for that long and then stops the motors.
+        """
+        left = max(min(l_wheel_speed, MAX_WHEEL_SPEED), -MAX_WHEEL_SPEED)
+        right = max(min(r_wheel_speed, MAX_WHEEL_SPEED), -MAX_WHEEL_SPEED)
+        left_acc = abs(l_wheel_speed) if l_wheel_acc is None else l_wheel_acc
+        right_acc = abs(r_wheel_speed) if r_wheel_acc is None else r_wheel_acc
+        self._command('drive_wheels', self._set_wheels, (left, right, left_acc, right_acc))
+        if duration:
+            self.clock.sleep(duration)
+            self.stop_all_motors()
+
+    def _set_wheels(self, targets):
+        self._targets = targets
+        self._wheels_owner = None
+
+    def move_head(self, speed):
+        self._command('move_head', setattr, self, 'head_speed', speed)
+
+    def move_lift(self, speed):
+        self._command('move_lift', self._set_lift_speed, speed)
+
+    def _set_lift_speed(self, speed):
+        self._lift_target = None
+        self.lift_speed = speed
+
+    def stop_all_motors(self):
+        self._command('stop_all_motors', self._stop_motors)
+
+    def _stop_motors(self):
+        self._set_wheels((0.0, 0.0, None, None))
+        self.head_speed = 0.0
+        self._set_lift_speed(0.0)
+
+    def set_backpack_lights(self, light1, light2, light3, light4, light5):
+        self._command('set_backpack_lights', setattr, self, 'lights', (light1, light2, light3, light4, light5))
+
+    def set_all_backpack_lights(self, light):
+        self._command('set_all_backpack_lights', setattr, self, 'lights', (light,) * 5)
+
+    def set_backpack_lights_off(self):
+        self.set_all_backpack_lights(cozmo.lights.off_light)
+
+    # --- reporting
+
+    @property
+    def lift_height(self):
+        """Lift height from 0.0 (bottom) to 1.0 (top), as set_lift_height takes it."""
+        height_mm = (cozmo.robot.LIFT_PIVOT_HEIGHT.distance_mm
+                     + cozmo.robot.LIFT_ARM_LENGTH.distance_mm * math.sin(self.lift))
+        return ((height_mm - cozmo.robot.MIN_LIFT_HEIGHT_MM)
+                / (cozmo.robot.MAX_LIFT_HEIGHT_MM - cozmo.robot.MIN_LIFT_HEIGHT_MM))
+
+    def statistics(self):
+        """
+        :return: dict of the simulated time, the final pose, distance and speeds driven, and counts of the
+                 commands received and of actions by how they ended
+        """
+        self.update()
+        return {
+            'simulated_s': self.updated,
+            'pose': {'x_mm': self.x, 'y_mm': self.y, 'heading_deg': math.degrees(self.heading),
+                     'head_deg': math.degrees(self.head_angle), 'lift_height': self.lift_height},
+            'odometer_mm': self.odometer,
+            'moving_s': self.moving_time,
+            'top_speed_mmps': self.top_speed,
+            'commands': dict(self.commands),
+            'actions': dict(self.actions),
+        }
@@ -0,0 +1,142 @@
+""" Fixed-rate pacing for the control loops
+
+A loop that sleeps for a fixed time after its work runs slower than intended by however long
+the work took, and its rate wanders with the load.  Ticker instead sleeps until absolute
+deadlines spaced one period apart, so time spent working is absorbed into the wait:
+
+    ticker = Ticker(rate=100)
+    while running:
+        ... work ...
+        ticker.wait()
+    print(ticker.statistics())
+
+Deadlines stay on the grid set when the ticker starts, so small delays never accumulate into
+drift.  When the work overruns by a whole period or more, the missed ticks are skipped rather
+than run back to back to catch up, and the loop carries on from the next deadline on the grid.
+Every wake-up's lateness (jitter) goes into a latency.Histogram for percentiles.
+"""
+
+import time
+
+import latency
+
+
+class Ticker:
+    """
+    Paces a loop at a fixed rate and keeps statistics on how closely it manages to.
+    """
+
+    def __init__(self, rate=100.0, clock=time.monotonic, sleep=time.sleep, spin=0.0):
+        """
+        :param rate: ticks per second
+        :param clock: function returning the current time in seconds
+        :param sleep: function sleeping for a number of seconds
+        :param spin: seconds before each deadline to stop sleeping and poll the clock instead, 0 to only
+                     sleep; trades CPU for precision where sleep() is coarse, e.g. Windows before Python 3.11
+        """
+        self.period = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.spin = spin
+        self.reset()
+
+    def reset(self):
+        """Forget the statistics and start a new grid of deadlines at the next wait()."""
+        self.deadline = None
+        self.started = None
+        self.paused = None  # time pause() was called, while paused
+        self.idle = 0.0  # seconds spent paused, left out of the achieved rate
+        self.ticks = 0
+        self.periods = 0  # ticks that followed another on the same grid, i.e. not the first after a pause
+        self.skipped = 0  # deadlines passed over because the loop was a whole period or more late
+        self.overruns = 0  # waits entered after their deadline had already passed
+        self.jitter_total = 0.0
+        self.jitter = latency.Histogram()
+
+    def pause(self):
+        """
+        Stop pacing, e.g. while the loop blocks waiting for input. The next wait() returns at once
+        and starts a new grid of deadlines, and the time in between counts as neither lateness
+        nor skipped ticks.
+        """
+        if self.deadline is not None:
+            self.paused = self.clock()
+            self.deadline = None
+
+    def remaining(self, now=None):
+        """
+        :param now: current time; defaults to the ticker's clock
+        :return: seconds until the next deadline, 0 if it has passed
+        """
+        if self.deadline is None:
+            return 0.0
+        if now is None:
+            now = self.clock()
+        return max(self.deadline - now, 0.0)
+
+    def tick(self, now=None):
+        """
+        Account for reaching the current deadline and move to the next one. Loops that wait in
+        their own way, such as in select() with remaining() as the timeout, call this once due.
+
+        :param now: current time; defaults to the ticker's clock
+        :return: number of ticks skipped because the deadline was missed by a period or more
+        """
+        if now is None:
+            now = self.clock()
+        if self.deadline is None:
+            if self.started is None:
+                self.started = now
+            elif self.paused is not None:
+                self.idle += now - self.paused
+                self.paused = None
+            self.deadline = now
+        else:
+            self.periods += 1
+        late = now - self.deadline
+        skipped = int(late // self.period) if late >= self.period else 0
+        self.ticks += 1
+        self.skipped += skipped
+        self.jitter.record(late - skipped * self.period)
+        self.jitter_total += late - skipped * self.period
+        self.deadline += (skipped + 1) * self.period
+        return skipped
+
+    def wait(self):
+        """
+        Sleep until the next deadline and tick. The first call returns at once and starts the grid.
+
+        :return: number of ticks skipped, see tick()
+        """
+        if self.deadline is not None:
+            now = self.clock()
+            if now > self.deadline:
+                self.overruns += 1
+            else:
+                remaining = self.deadline - now - self.spin
+                if remaining > 0:
+                    self.sleep(remaining)
+                if self.spin:
+                    while self.clock() < self.deadline:
+                        pass
+        return self.tick()
+
+    def statistics(self):
+        """
+        :return: dict with the achieved rate, the tick, skip and overrun counts, and jitter in microseconds
+        """
+        now = self.clock()
+        idle = self.idle + (now - self.paused if self.paused is not None else 0.0)
+        elapsed = (now - self.started - idle) if self.started is not None else 0.0
+        return {
+            'target_hz': 1.0 / self.period,
+            'rate_hz': self.periods / elapsed if elapsed > 0 and self.periods else 0.0,
+            'ticks': self.ticks,
+            'skipped': self.skipped,
+            'overruns': self.overruns,
+            'idle_s': idle,
+            'mean_jitter_us': self.jitter_total / self.ticks * 1e6 if self.ticks else 0.0,
+            'p50_jitter_us': self.jitter.percentile(50) * 1e6,
+            'p99_jitter_us': self.jitter.percentile(99) * 1e6,
+            'max_jitter_us': self.jitter.max,
+        }
@@ -0,0 +1,8 @@
+""" Puts the script directories on the path, as the front ends and benchmarks do """
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+for directory in ('shared_scripts', 'windows_scripts', 'linux_scripts'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
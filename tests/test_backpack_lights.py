@@ -0,0 +1,59 @@
+from backpack_lights import ANIMATIONS, BackpackLights
+from colors import Colors
+
+
+class Action:
+    def __init__(self):
+        self.is_running = True
+
+
+class Robot:
+    def __init__(self):
+        self.frames = []
+        self.actions = []
+
+    def set_backpack_lights(self, *frame):
+        self.frames.append(frame)
+
+    def play_anim(self, name, **kwargs):
+        self.actions.append(Action())
+        return self.actions[-1]
+
+    say_text = play_anim
+
+
+def test_unchanged_lights_are_skipped():
+    robot = Robot()
+    lights = BackpackLights(robot, clock=lambda: 0.0)
+    lights.set_all_backpack_lights(Colors.RED)
+    lights.set_all_backpack_lights(Colors.RED)
+    lights.set_backpack_lights_off()
+    assert len(robot.frames) == 2
+    assert lights.statistics() == (2, 1)
+
+
+def test_lights_are_resent_during_and_after_a_robot_animation():
+    robot = Robot()
+    lights = BackpackLights(robot, clock=lambda: 0.0)
+    lights.set_all_backpack_lights(Colors.RED)
+    action = lights.play_anim(name='anim_petdetection_dog_01')  # may change the LEDs itself
+    lights.set_all_backpack_lights(Colors.RED)
+    lights.set_all_backpack_lights(Colors.RED)
+    action.is_running = False
+    lights.set_all_backpack_lights(Colors.RED)  # the animation may have left other lights on
+    lights.set_all_backpack_lights(Colors.RED)
+    assert len(robot.frames) == 4
+
+
+def test_light_animation_sends_each_frame_once():
+    robot = Robot()
+    lights = BackpackLights(robot, clock=lambda: 0.0)
+    animation = ANIMATIONS['police']()
+    lights.play_light_animation(animation, now=0.0)
+    due = []
+    for step in range(50):
+        lights.update_lights(now=step * 0.01)
+        frame = animation.frame_at(step * 0.01)
+        if not due or due[-1] is not frame:
+            due.append(frame)
+    assert robot.frames == [tuple(frame) for frame in due]
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+import bindings
+import xbox
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def write(path, config):
+    with open(path, 'w') as f:
+        f.write(config if isinstance(config, str) else json.dumps(config))
+
+
+def touch_later(path, clock):
+    # a new modification time, and past the check interval
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    clock.now += 2.0
+
+
+GOOD = {'buttons': {'A': {'action': 'lights_off'}}, 'drive': {'forward_speed': 120}}
+
+
+@pytest.mark.parametrize('config', [
+    '[]',
+    '"bindings"',
+    {'buttons': []},
+    {'buttons': {'A': 'lights_off'}},
+    {'buttons': {'A': {'action': 'lights', 'color': 5}}},
+    {'buttons': {'A': {'action': 'animation', 'name': 'x', 'priority': []}}},
+    {'buttons': {'A': {'action': 'animation'}}},
+    {'buttons': {'GUIDE': {'action': 'lights_off'}}},
+    {'drive': []},
+    {'drive': {'expo': None}},
+    {'drive': {'expo': 'fast'}},
+    {'drive': {'expo': True}},
+    {'drive': {'top_speed': 1}},
+])
+def test_bad_reload_keeps_previous_bindings(tmp_path, config, capsys):
+    path = str(tmp_path / 'bindings.json')
+    write(path, GOOD)
+    clock = FakeClock()
+    loaded = bindings.Bindings(path, clock=clock)
+    table, drive, version = loaded.table, loaded.drive, loaded.version
+
+    write(path, config)
+    touch_later(path, clock)
+    assert loaded.reload_if_changed() is False
+    assert (loaded.table, loaded.drive, loaded.version) == (table, drive, version)
+    assert 'Keeping the previous bindings' in capsys.readouterr().out
+
+
+def test_bad_file_at_start_raises_value_error(tmp_path):
+    path = str(tmp_path / 'bindings.json')
+    write(path, {'drive': {'expo': None}})
+    with pytest.raises(ValueError):
+        bindings.Bindings(path)
+
+
+def test_good_reload_replaces_bindings(tmp_path):
+    path = str(tmp_path / 'bindings.json')
+    write(path, GOOD)
+    clock = FakeClock()
+    loaded = bindings.Bindings(path, clock=clock)
+    write(path, {'buttons': {'B': {'action': 'lights', 'color': 'RED'}}, 'drive': {'expo': 0.5}})
+    touch_later(path, clock)
+    assert loaded.reload_if_changed() is True
+    assert set(loaded.table) == {xbox.B}
+    assert loaded.drive['expo'] == 0.5
+    assert loaded.drive['forward_speed'] == bindings.DRIVE_DEFAULTS['forward_speed']
+
+
+def test_repo_bindings_file_loads():
+    assert bindings.Bindings(bindings.DEFAULT_PATH).table
@@ -0,0 +1,72 @@
+import pytest
+
+import controller
+import xbox
+import xinput
+
+
+def test_linux_and_windows_buttons_share_one_layout():
+    assert (xbox.A, xbox.GUIDE, xbox.DPAD_LEFT) == (controller.A, controller.GUIDE, controller.DPAD_LEFT)
+    assert controller.A == xinput.GAMEPAD_A and controller.RIGHT_BUMPER == xinput.GAMEPAD_RIGHT_SHOULDER
+
+
+class PluggableXInput:
+    """XInput library stand-in whose controller can be unplugged and moved."""
+
+    def __init__(self):
+        self.connected = True
+        self.packet_number = 1
+        self.lx = 0
+
+    def XInputGetState(self, device_number, state):
+        if not self.connected:
+            return xinput.ERROR_DEVICE_NOT_CONNECTED
+        state = state._obj
+        state.packet_number = self.packet_number
+        state.gamepad.l_thumb_x = self.lx
+        state.gamepad.buttons = controller.A
+        return xinput.ERROR_SUCCESS
+
+    def XInputSetState(self, device_number, vibration):
+        return 0
+
+    def XInputGetBatteryInformation(self, device_number, device_type, battery):
+        return 0
+
+
+@pytest.fixture
+def library(monkeypatch):
+    monkeypatch.setattr(xinput, 'xinput', None)
+    library = PluggableXInput()
+    xinput.use_library(library)
+    return library
+
+
+def test_xinput_is_loaded_only_when_a_joystick_is_made(monkeypatch):
+    monkeypatch.setattr(xinput, 'xinput', None)
+    if not hasattr(xinput.ctypes, 'windll'):
+        with pytest.raises(OSError):
+            xinput.XInputJoystick(0)
+
+
+def test_xinput_read_returns_a_new_state_only_for_a_new_packet(library):
+    with xinput.XInputJoystick(0) as joystick:
+        first = joystick.read()
+        assert first.connected and first.number == 1 and first.buttons == controller.A
+        assert joystick.read() is first
+        library.packet_number, library.lx = 2, -3000
+        second = joystick.read()
+        assert second.number == 2 and second.lx == -3000 and second.timestamp >= first.timestamp
+
+
+def test_xinput_unplugging_and_replugging(library):
+    joystick = xinput.XInputJoystick(0)
+    joystick.read()
+    library.connected = False
+    gone = joystick.read()
+    assert not gone.connected and gone.timestamp > 0 and joystick.read() is gone
+    library.connected = True
+    assert joystick.read().connected
+    library.connected = False
+    assert joystick.wait_for_change(1.0).connected is False
+    assert joystick.wait_for_change(0.01) is None
@@ -0,0 +1,57 @@
+import pytest
+
+import drive
+
+
+def test_expo_is_gentle_in_the_middle_and_full_at_the_ends():
+    assert drive.expo(1.0, 0.3) == pytest.approx(1.0) and drive.expo(-1.0, 0.3) == pytest.approx(-1.0)
+    assert drive.expo(0.5, 0.3) == pytest.approx(0.7 * 0.5 + 0.3 * 0.125)
+    assert drive.expo(0.5, 0.0) == 0.5 and drive.expo(0.5, 1.0) == 0.125
+
+
+def test_mix_scales_both_wheels_down_together():
+    mixer = drive.DriveMixer(forward_speed=150, turn_speed=100)
+    assert mixer.mix(1.0, 0.0) == (150, 150)
+    assert mixer.mix(0.0, -1.0) == (-100, 100)
+    left, right = mixer.mix(1.0, 1.0)  # 250 and 50 would be too fast for the left tread
+    assert left == pytest.approx(drive.MAX_WHEEL_SPEED) and right == pytest.approx(50 * drive.MAX_WHEEL_SPEED / 250)
+    assert mixer.tank(1.0, -0.5) == (150, -75)
+    assert mixer.mix(1.0, 0.0, forward_speed=200) == (200, 200)
+
+
+def test_step_limits_speeding_up_but_not_slowing_down():
+    mixer = drive.DriveMixer(acceleration=500)
+    assert mixer.step(150, 150, now=0.0) == (0.0, 0.0)  # the first step starts from rest
+    assert mixer.step(150, 150, now=0.1) == pytest.approx((50, 50))
+    assert mixer.step(150, -150, now=0.2) == pytest.approx((100, -50))  # reversing starts from zero
+    assert mixer.step(20, 0, now=0.21) == (20, 0)  # slowing down and stopping happen at once
+    assert mixer.step(-150, 0, now=0.41) == pytest.approx((-100, 0))
+
+
+def test_stopped_only_once_asked_for_no_movement():
+    mixer = drive.DriveMixer(acceleration=500)
+    assert mixer.stopped()
+    mixer.step(100, 100, now=0.0)
+    assert mixer.left == 0.0 and not mixer.stopped()  # still to ramp up
+    mixer.step(0, 0, now=0.1)
+    assert mixer.stopped()
+
+
+def test_hold_and_reset_leave_out_the_time_since_the_last_step():
+    mixer = drive.DriveMixer(acceleration=500)
+    mixer.step(100, 100, now=0.0)
+    mixer.step(100, 100, now=0.1)
+    mixer.hold()
+    assert mixer.step(150, 150, now=10.0) == pytest.approx((50, 50))  # keeps its speed, gains none
+    assert mixer.step(150, 150, now=10.1) == pytest.approx((100, 100))
+    mixer.reset()
+    assert mixer.step(150, 150, now=20.0) == (0.0, 0.0)
+
+
+def test_batch_matches_stepping_frame_by_frame():
+    mixer = drive.DriveMixer(forward_speed=150, turn_speed=100, expo=0.3, acceleration=600)
+    frames = [(i * 0.01, (i % 40) / 20.0 - 1.0, ((i * 7) % 30) / 15.0 - 1.0) for i in range(200)]
+    stepper = drive.DriveMixer(forward_speed=150, turn_speed=100, expo=0.3, acceleration=600)
+    expected = [stepper.step(*stepper.mix(forward, turn), now=timestamp) for timestamp, forward, turn in frames]
+    assert mixer.batch(frames) == pytest.approx(expected)
+    assert mixer.updated is None  # the mixer's own ramp is untouched
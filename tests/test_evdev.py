@@ -0,0 +1,125 @@
+import os
+import threading
+
+import pytest
+
+import evdev_joystick
+import xbox
+from evdev_joystick import EVENT, EV_ABS, EV_KEY, EV_SYN, SYN_DROPPED, SYN_REPORT, EvdevJoystick
+
+BTN_A = 0x130
+BTN_B = 0x131
+
+
+def events(*records):
+    return b''.join(EVENT.pack(0, 0, type, code, value) for type, code, value in records)
+
+
+REPORT = (EV_SYN, SYN_REPORT, 0)
+
+
+@pytest.fixture
+def pipe():
+    read, write = os.pipe()
+    yield read, write
+    os.close(read)
+    os.close(write)
+
+
+def test_decodes_a_report(pipe):
+    read, write = pipe
+    joy = EvdevJoystick(read)
+    os.write(write, events((EV_ABS, evdev_joystick.ABS_X, 1000), (EV_ABS, evdev_joystick.ABS_Y, -2000),
+                           (EV_ABS, evdev_joystick.ABS_Z, 255), (EV_ABS, evdev_joystick.ABS_HAT0Y, -1),
+                           (EV_KEY, BTN_A, 1), REPORT))
+    joy.readAvailable()
+    state = joy.snapshot()
+    assert state.connected()
+    assert (state.lx, state.ly, state.lt) == (1000, 2000, 255)
+    assert state.buttons == xbox.A | xbox.DPAD_UP
+
+
+def test_partial_record_is_kept_for_the_next_read(pipe):
+    read, write = pipe
+    joy = EvdevJoystick(read)
+    data = events((EV_KEY, BTN_B, 1), REPORT)
+    os.write(write, data[:5])
+    joy.readAvailable()
+    assert not joy.connected()
+    os.write(write, data[5:])
+    joy.readAvailable()
+    assert joy.snapshot().buttons == xbox.B
+
+
+def test_dropped_events_release_everything_without_ioctls(pipe):
+    read, write = pipe
+    joy = EvdevJoystick(read)
+    os.write(write, events((EV_KEY, BTN_A, 1), (EV_ABS, evdev_joystick.ABS_RX, 9000), REPORT))
+    joy.readAvailable()
+    joy.pollEvents()
+    # the release of A was lost in the overrun
+    os.write(write, events((EV_SYN, SYN_DROPPED, 0), (EV_KEY, BTN_B, 1), REPORT))
+    joy.readAvailable()
+    state = joy.snapshot()
+    assert not state.connected()
+    assert state.buttons == 0 and state.rx == 0
+    assert (xbox.BUTTON_UP, xbox.A) in [(event.kind, event.code) for event in joy.pollEvents()]
+    # the next complete report is trusted again
+    os.write(write, events((EV_KEY, BTN_B, 1), REPORT))
+    joy.readAvailable()
+    assert joy.connected() and joy.snapshot().buttons == xbox.B
+
+
+def test_dropped_events_resync_from_the_device(pipe, monkeypatch):
+    read, write = pipe
+    device = {'keys': {BTN_B}, 'axes': {evdev_joystick.ABS_RX: 5000, evdev_joystick.ABS_Y: 300}}
+
+    def ioctl(fd, request, buffer):
+        if request == evdev_joystick.EVIOCGKEY:
+            for code in device['keys']:
+                buffer[code >> 3] |= 1 << (code & 7)
+        else:
+            code = (request & 0xff) - 0x40
+            evdev_joystick.ABSINFO.pack_into(buffer, 0, device['axes'].get(code, 0), -32768, 32767, 0, 0, 0)
+        return 0
+    monkeypatch.setattr(evdev_joystick.fcntl, 'ioctl', ioctl)
+
+    joy = EvdevJoystick(read)
+    assert joy.buttons == xbox.B and joy.axes[:4] == [0, -300, 5000, 0]  # read on open
+
+    device['keys'] = {BTN_A}
+    device['axes'] = {}
+    os.write(write, events((EV_SYN, SYN_DROPPED, 0), (EV_KEY, BTN_B, 1), REPORT))
+    joy.readAvailable()
+    state = joy.snapshot()
+    assert state.connected()
+    assert state.buttons == xbox.A and state.rx == 0 and state.ly == 0
+
+
+def test_poll_returns_the_events_with_the_frame_they_led_to(pipe):
+    read, write = pipe
+    joy = EvdevJoystick(read)
+    assert joy.poll() == ([], joy.state) and not joy.connected()
+    os.write(write, events((EV_KEY, BTN_A, 1), REPORT))
+    joy.readAvailable()
+    pressed, state = joy.poll()
+    assert [(event.kind, event.code) for event in pressed] == [(xbox.BUTTON_DOWN, xbox.A)]
+    assert state is pressed[0].state and state.A()
+    os.write(write, events((EV_KEY, BTN_A, 0), (EV_ABS, evdev_joystick.ABS_X, 9000), REPORT))
+    joy.readAvailable()
+    released, state = joy.poll()
+    assert [(event.kind, event.code) for event in released] == [(xbox.BUTTON_UP, xbox.A), (xbox.AXIS, 'lx')]
+    assert not state.A() and state.lx == 9000
+
+
+def test_wait_for_change_sleeps_until_a_report_completes(pipe):
+    read, write = pipe
+    joy = EvdevJoystick(read)
+    joy.read()
+    assert joy.wait_for_change(0.05) is None
+    os.write(write, events((EV_KEY, BTN_A, 1)))
+    assert joy.wait_for_change(0.05) is None  # no SYN_REPORT yet, so no new frame
+    threading.Timer(0.05, os.write, (write, events(REPORT))).start()
+    state = joy.wait_for_change(5.0)
+    assert state.buttons == xbox.A and state.number == 1
+    assert joy.wait_for_change(0.01) is None
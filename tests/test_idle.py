@@ -0,0 +1,134 @@
+import controller
+import cozmo_interface
+import simulator
+import xbox
+import xbox_controller
+
+ACCELERATION = 600.0  # mm/s^2, the ramp of bindings.json and of the Windows drive_mixer
+
+
+class DrivingRobot(simulator.SimulatedRobot):
+    """Simulated robot keeping every drive_wheels call with the time it was made."""
+
+    def __init__(self, clock):
+        super().__init__(clock)
+        self.drives = []
+
+    def drive_wheels(self, l_wheel_speed, r_wheel_speed, *args, **kwargs):
+        self.drives.append((self.clock(), l_wheel_speed, r_wheel_speed))
+        return super().drive_wheels(l_wheel_speed, r_wheel_speed, *args, **kwargs)
+
+
+class IdleJoystick:
+    """
+    xbox.Joystick stand-in that rests until the loop sleeps on it, then has slept for
+    idle_seconds when the stick is pushed fully forward, and presses guide a second later.
+    """
+
+    def __init__(self, clock, idle_seconds=0.8):
+        self.clock = clock
+        self.idle_seconds = idle_seconds
+        self.state = xbox.Snapshot(connectStatus=True)
+        self.frameCount = 1
+        self.recorder = None
+        self.waits = 0
+        self.pushed = None
+
+    def poll(self):
+        if self.pushed is not None and self.clock() - self.pushed >= 1.0:
+            return [xbox.Event(xbox.BUTTON_DOWN, xbox.GUIDE, 0, self.state)], self.state
+        return [], self.state
+
+    def wait_for_change(self, timeout=None):
+        self.waits += 1
+        if self.pushed is not None:
+            self.clock.sleep(timeout)
+            return None
+        self.clock.sleep(self.idle_seconds)
+        self.pushed = self.clock()
+        self.state = xbox.Snapshot(ly=32767, connectStatus=True, timestamp=self.pushed)
+        self.frameCount += 1
+        return self.state
+
+    def close(self):
+        pass
+
+
+def test_linux_pilot_is_idle_only_while_nothing_moves():
+    clock = simulator.VirtualClock()
+    joy = IdleJoystick(clock)
+    pilot = cozmo_interface.Pilot(joy, simulator.SimulatedRobot(clock), clock=clock)
+    assert pilot.step() and pilot.idle()
+    joy.wait_for_change()
+    pilot.resume()
+    pilot.step()
+    assert not pilot.idle()  # still ramping up from rest, so not to be slept through
+    clock.sleep(0.01)
+    pilot.step()
+    assert pilot.mixer.left > 0 and not pilot.idle()
+
+
+def test_linux_ramp_starts_from_rest_after_an_idle_wait():
+    clock = simulator.VirtualClock()
+    joy = IdleJoystick(clock)
+    robot = DrivingRobot(clock)
+    cozmo_interface.cozmo_program(robot, joy, clock, clock.sleep)
+    assert joy.waits == 1
+    moving = [(time, left) for time, left, right in robot.drives if left]
+    first_time, first_speed = moving[0]
+    # no faster than the ramp allows since the stick was pushed, and still reaching full speed
+    assert first_speed <= ACCELERATION * (first_time - joy.pushed) + 1e-6
+    assert first_speed < 10.0
+    assert max(left for time, left in moving) == 150.0
+
+
+class IdleXInput:
+    """XInputJoystick stand-in along the same script as IdleJoystick, disconnecting instead of guide."""
+
+    def __init__(self, clock, idle_seconds=0.8):
+        self.clock = clock
+        self.idle_seconds = idle_seconds
+        self.state = controller.State(0, 0, 0, 0, 0, 0, 0, True, 0.0, 1)
+        self.packet_number = 1
+        self.recorder = None
+        self.pushed = None
+        self.waits = 0
+
+    def read(self):
+        if self.pushed is not None and self.clock() - self.pushed >= 1.0:
+            return controller.DISCONNECTED
+        return self.state
+
+    def wait_for_change(self, timeout=None):
+        self.waits += 1
+        self.clock.sleep(self.idle_seconds)
+        self.pushed = self.clock()
+        self.packet_number += 1
+        self.state = self.state._replace(ly=32767, timestamp=self.pushed, number=self.packet_number)
+
+
+def test_windows_ramp_starts_from_rest_after_an_idle_wait():
+    clock = simulator.VirtualClock()
+    joystick = IdleXInput(clock)
+    robot = DrivingRobot(clock)
+    xbox_controller.cozmo_program(robot, joystick, clock, clock.sleep)
+    assert joystick.waits == 1
+    moving = [(time, left) for time, left, right in robot.drives if left]
+    first_time, first_speed = moving[0]
+    assert first_speed <= ACCELERATION * (first_time - joystick.pushed) + 1e-6
+    assert first_speed < 10.0
+    assert max(left for time, left in moving) > 140.0  # full forward, less the stick table's deadzone
+
+
+def test_windows_pilot_is_idle_only_while_the_wheels_are_stopped():
+    clock = simulator.VirtualClock()
+    joystick = IdleXInput(clock)
+    pilot = xbox_controller.Pilot(joystick, simulator.SimulatedRobot(clock), clock=clock)
+    assert pilot.step() and pilot.idle()
+    joystick.wait_for_change()
+    pilot.resume()
+    pilot.step()
+    assert not pilot.idle()  # still ramping up from rest, so not to be slept through
+    clock.sleep(0.01)
+    pilot.step()
+    assert pilot.mixer.left > 0 and not pilot.idle()
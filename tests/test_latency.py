@@ -0,0 +1,37 @@
+import atexit
+import io
+import os
+import signal
+import threading
+
+import pytest
+
+import latency
+
+
+def test_percentiles():
+    histogram = latency.Histogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000.0)
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=1.0 / histogram.SUB_BUCKETS)
+    assert histogram.percentile(100) == pytest.approx(0.100)
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='needs SIGUSR1')
+def test_signal_while_recording_does_not_deadlock():
+    stream = io.StringIO()
+    monitor = latency.LatencyMonitor(stream)
+    monitor.frame(1, 0.0)
+    previous = signal.getsignal(signal.SIGUSR1)
+    monitor.install()
+    try:
+        with monitor._lock:  # as if the signal arrived inside command()
+            os.kill(os.getpid(), signal.SIGUSR1)  # the handler runs before the next bytecode
+            assert not monitor.histograms
+        for thread in threading.enumerate():
+            if thread.name == 'latency-dump':
+                thread.join(5.0)
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+        atexit.unregister(monitor.dump)
+    assert 'frames used 1' in stream.getvalue()
@@ -0,0 +1,143 @@
+import pytest
+
+import fleet
+import ticker
+
+
+class FakeClock:
+    """Time that only passes when slept through or spent by the code under test."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.0)
+
+
+def test_ticker_keeps_to_its_grid_whatever_the_work_takes():
+    clock = FakeClock()
+    pacer = ticker.Ticker(100, clock, clock.sleep)
+    times = []
+    for i in range(101):
+        pacer.wait()
+        times.append(clock.now)
+        clock.now += 0.001 * (i % 7)  # work of varying length, always under a period
+    clock.now = times[-1]
+    stats = pacer.statistics()
+    assert times[-1] - times[0] == pytest.approx(1.0)
+    assert stats['rate_hz'] == pytest.approx(100.0)
+    assert stats['ticks'] == 101 and stats['skipped'] == 0 and stats['overruns'] == 0
+
+
+def test_ticker_skips_missed_deadlines_instead_of_bunching_up():
+    clock = FakeClock()
+    pacer = ticker.Ticker(100, clock, clock.sleep)
+    pacer.wait()
+    start = clock.now
+    clock.now += 0.035  # the tick due at 10 ms runs late, and those due at 20 and 30 ms are missed
+    assert pacer.wait() == 2
+    pacer.wait()
+    assert clock.now - start == pytest.approx(0.04)  # back on the grid, not 10 ms after the overrun
+    stats = pacer.statistics()
+    assert stats['skipped'] == 2 and stats['overruns'] == 1
+
+
+def test_ticker_leaves_paused_time_out_of_the_rate():
+    clock = FakeClock()
+    pacer = ticker.Ticker(100, clock, clock.sleep)
+    for i in range(11):
+        pacer.wait()
+    pacer.pause()
+    clock.now += 5.0
+    for i in range(11):
+        pacer.wait()
+    stats = pacer.statistics()
+    assert stats['idle_s'] == pytest.approx(5.0)
+    assert stats['rate_hz'] == pytest.approx(100.0)
+
+
+class CoarseClock(FakeClock):
+    """Clock whose sleep() wakes early, on a 5 ms grid, and whose every reading takes step seconds."""
+
+    def __init__(self, step=0.0):
+        super().__init__()
+        self.step = step
+        self.readings = 0
+
+    def __call__(self):
+        self.readings += 1
+        self.now += self.step
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds - seconds % 0.005
+
+
+def test_ticker_does_not_spin_unless_asked_to():
+    clock = CoarseClock()
+    pacer = ticker.Ticker(100, clock, clock.sleep)
+    pacer.wait()
+    clock.now += 0.003
+    pacer.wait()  # 7 ms to go, of which sleep() only manages 5
+    assert clock.readings <= 4
+    assert pacer.statistics()['mean_jitter_us'] < 0  # woke early rather than burn the CPU
+
+
+def test_ticker_spins_out_the_last_of_a_period_when_asked_to():
+    clock = CoarseClock(step=0.0001)
+    pacer = ticker.Ticker(100, clock, clock.sleep, spin=0.005)
+    pacer.wait()
+    start = clock.now
+    clock.now += 0.003
+    pacer.wait()
+    assert clock.now - start == pytest.approx(0.01, abs=0.0003)
+    assert clock.readings > 10
+
+
+class CountingPilot:
+    def __init__(self, clock, work=0.002, steps=None):
+        self.clock = clock
+        self.work = work
+        self.steps = steps
+        self.times = []
+        self.stopped = False
+
+    def step(self, now):
+        self.times.append(now)
+        self.clock.now += self.work
+        return self.steps is None or len(self.times) < self.steps
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_fleet_reports_the_rate_its_pilots_ran_at():
+    clock = FakeClock()
+    runner = fleet.Fleet(100, clock, clock.sleep)
+    pilots = [CountingPilot(clock), CountingPilot(clock, work=0.003)]
+    for i, pilot in enumerate(pilots):
+        runner.add(str(i), object(), pilot)
+    runner.run(duration=1.0)
+    report = runner.report()
+    for i, pilot in enumerate(pilots):
+        assert pilot.stopped
+        assert report[str(i)]['loop_hz'] == pytest.approx(100.0, rel=0.01)
+        assert report[str(i)]['steps'] == len(pilot.times)
+    assert report['loop']['skipped'] == 0
+
+
+def test_fleet_finishes_a_pair_without_stopping_the_others():
+    clock = FakeClock()
+    runner = fleet.Fleet(50, clock, clock.sleep)
+    short = CountingPilot(clock, steps=10)
+    long = CountingPilot(clock, steps=30)
+    runner.add('short', object(), short)
+    runner.add('long', object(), long)
+    runner.run()
+    report = runner.report()
+    assert report['short']['steps'] == 10 and report['long']['steps'] == 30
+    assert report['short']['loop_hz'] == pytest.approx(50.0, rel=0.02)
+    assert report['long']['loop_hz'] == pytest.approx(50.0, rel=0.02)
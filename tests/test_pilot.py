@@ -0,0 +1,126 @@
+import pytest
+
+import bindings
+import cozmo_interface
+import simulator
+import xbox
+
+
+class ScriptedJoystick:
+    """Controller whose state is set by the test; no events, as no button is pressed."""
+
+    def __init__(self):
+        self.state = xbox.Snapshot(connectStatus=True)
+        self.frameCount = 0
+
+    def set(self, **values):
+        self.state = xbox.Snapshot(connectStatus=True, **values)
+        self.frameCount += 1
+
+    def poll(self):
+        return [], self.state
+
+
+@pytest.fixture
+def pilot():
+    clock = simulator.VirtualClock()
+    robot = simulator.SimulatedRobot(clock, latency=0.03)
+    pilot = cozmo_interface.Pilot(ScriptedJoystick(), robot, clock=clock)
+    pilot.clock = clock
+    pilot.simulated = robot
+    return pilot
+
+
+def run(pilot, seconds, step=0.01):
+    for i in range(int(seconds / step)):
+        pilot.step()
+        pilot.clock.sleep(step)
+
+
+def test_squeezing_a_trigger_lets_the_lift_settle(pilot):
+    joy = pilot.joy
+    # squeeze the left trigger slowly over a second, a new raw value every step
+    for lt in range(1, 201, 2):
+        joy.set(lt=lt)
+        run(pilot, 0.01)
+    run(pilot, 2.0)
+    robot = pilot.simulated
+    robot.update()
+    # one retarget per quarter second at most, rather than one per trigger value
+    assert pilot.scheduler.statistics()['lift']['submitted'] <= 6
+    assert pilot.lift_height == pilot.lift_target == round(199 / 255.0 * cozmo_interface.LIFT_STEPS) / cozmo_interface.LIFT_STEPS
+    assert robot.lift_height == pytest.approx(pilot.lift_height, abs=0.02)
+    assert pilot.idle()
+
+
+def test_last_lift_height_goes_out_after_the_rate_limit(pilot):
+    joy = pilot.joy
+    joy.set(lt=255)
+    run(pilot, 0.01)
+    joy.set(rt=128)  # halfway back down, sooner than the shaper allows another height
+    run(pilot, 0.01)
+    assert pilot.lift_height == 1.0 and not pilot.idle()
+    joy.set()
+    run(pilot, 1.0)
+    assert pilot.lift_height == pilot.lift_target == 0.5
+
+
+def test_lift_moves_alongside_animations_and_cancels_body_ones(pilot):
+    joy = pilot.joy
+    robot = pilot.simulated
+    pilot.bindings.table[xbox.A] = bindings.animation('anim_a')
+    pilot.bindings.table[xbox.B] = bindings.animation('anim_b', body=True)
+    for button in (xbox.A, xbox.B):
+        pilot.bindings.press(pilot.robot, pilot.scheduler, button)
+        run(pilot, 0.1)
+        joy.set(lt=255 if button == xbox.A else 64)
+        run(pilot, 1.0)
+        joy.set()
+    robot.update()
+    assert robot.actions['failed'] == 0
+    assert robot.actions['succeeded'] >= 2  # anim_a and the first lift move
+    assert robot.actions['aborted'] >= 1  # anim_b, taken over by the trigger
+    assert robot.lift_height == pytest.approx(0.25, abs=0.02)
+
+
+def test_every_actuator_is_worked_in_the_same_step(pilot):
+    pilot.joy.set(ly=32767, rx=20000, ry=32767, lt=255)  # drive, turn, tilt the head and raise the lift
+    pilot.step()
+    robot = pilot.simulated
+    assert robot.commands['drive_wheels'] == robot.commands['move_head'] == 1
+    assert pilot.scheduler.statistics()['lift']['submitted'] == 1
+    run(pilot, 1.0)
+    robot.update()
+    assert robot.left > 0 and robot.left > robot.right  # forward while turning right
+    assert robot.head_angle > 0 and robot.lift_height == pytest.approx(1.0, abs=0.02)
+    assert not any(pilot.errors.values())
+
+
+class Failing(Exception):
+    pass
+
+
+def fail(*args, **kwargs):
+    raise Failing()
+
+
+def test_a_failing_channel_does_not_hold_up_the_others(pilot):
+    robot = pilot.simulated
+    robot.move_head = fail
+    pilot.joy.set(ly=32767, ry=32767, lt=255)
+    run(pilot, 1.0)
+    robot.update()
+    assert pilot.errors['head'] and not any(errors for name, errors in pilot.errors.items() if name != 'head')
+    assert robot.left > 0 and robot.lift_height == pytest.approx(1.0, abs=0.02)
+    assert robot.head_angle == 0.0
+
+
+def test_the_other_channels_carry_on_when_the_wheels_fail(pilot):
+    robot = pilot.simulated
+    robot.drive_wheels = fail
+    pilot.joy.set(ly=32767, ry=32767, lt=255)
+    run(pilot, 1.0)
+    robot.update()
+    assert pilot.errors['wheels'] and not any(errors for name, errors in pilot.errors.items() if name != 'wheels')
+    assert robot.left == 0.0
+    assert robot.head_angle > 0 and robot.lift_height == pytest.approx(1.0, abs=0.02)
@@ -0,0 +1,167 @@
+import asyncio
+import os
+
+import pytest
+
+import controller
+import pipeline
+from evdev_joystick import EVENT, EV_ABS, EV_KEY, EV_SYN, SYN_REPORT, ABS_Y, EvdevJoystick
+
+BTN_MODE = 0x13c
+REPORT = (EV_SYN, SYN_REPORT, 0)
+
+
+def events(*records):
+    return b''.join(EVENT.pack(0, 0, type, code, value) for type, code, value in records)
+
+
+def state(ly=0, buttons=0, number=0):
+    return controller.State(0, ly, 0, 0, 0, 0, buttons, True, 0.0, number)
+
+
+class ScriptedController(controller.Controller):
+    """Polled controller returning the next scripted State on each read, then holding the last."""
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.current = None
+
+    def read(self):
+        if self.states:
+            self.current = self.states.pop(0)
+        return self.current
+
+
+def test_latest_hands_over_only_the_newest_value():
+    async def main():
+        channel = pipeline.Latest()
+        for value in range(1, 6):
+            channel.put(value)
+        version, value = await channel.wait(0)
+        assert (version, value) == (5, 5)
+        assert channel.superseded == 4
+        # nothing newer: the wait times out with the version unchanged
+        assert await channel.wait(version, timeout=0.01) == (5, 5)
+        waiter = asyncio.ensure_future(channel.wait(version))
+        await asyncio.sleep(0)
+        channel.put(6)
+        assert await waiter == (6, 6)
+        assert channel.superseded == 4
+    asyncio.run(main())
+
+
+def test_slow_robot_gets_the_newest_commands_without_a_backlog():
+    # a new stick position every poll, much faster than the robot takes drive_wheels
+    states = [state(ly=-32768 + 600 * i, number=i) for i in range(100)]
+    states.append(state(buttons=controller.GUIDE, number=100))
+    source = ScriptedController(states)
+    robot = pipeline.FakeAsyncRobot(latency=0.02)
+    runner = pipeline.Pipeline(source, robot, pipeline.Controls(mixer=None), poll_interval=0.001,
+                               max_dispatch_rate=0)
+    asyncio.run(runner.run())
+    stats = runner.statistics()
+    assert stats['samples'] == 101
+    assert robot.calls['drive_wheels'] < 30
+    assert stats['commands_superseded'] > 0
+    assert robot.calls['stop_all_motors'] == 1 and robot.wheels == (0.0, 0.0)
+
+
+def test_pipe_source_drives_until_guide_is_pressed():
+    read, write = os.pipe()
+    try:
+        source = EvdevJoystick(read)
+        robot = pipeline.FakeAsyncRobot()
+        runner = pipeline.Pipeline(source, robot, pipeline.Controls(), max_dispatch_rate=0)
+
+        async def main():
+            task = asyncio.ensure_future(runner.run())
+            os.write(write, events((EV_ABS, ABS_Y, -32767), REPORT))
+            for i in range(100):
+                await asyncio.sleep(0.01)
+                if robot.wheels[0] > 0:
+                    break
+            assert robot.wheels[0] > 0 and robot.wheels == pytest.approx((robot.wheels[0],) * 2)
+            os.write(write, events((EV_KEY, BTN_MODE, 1), REPORT))
+            await asyncio.wait_for(task, 1.0)
+        asyncio.run(main())
+    finally:
+        os.close(read)
+        os.close(write)
+    assert robot.calls['stop_all_motors'] == 1
+
+
+def test_source_errors_end_the_pipeline():
+    read, write = os.pipe()
+    try:
+        source = EvdevJoystick(read)
+
+        def broken():
+            raise RuntimeError('decoder bug')
+        source.read = broken
+        robot = pipeline.FakeAsyncRobot()
+        runner = pipeline.Pipeline(source, robot, pipeline.Controls())
+        os.write(write, events(REPORT))
+        with pytest.raises(RuntimeError):
+            asyncio.run(asyncio.wait_for(runner.run(), 1.0))
+    finally:
+        os.close(read)
+        os.close(write)
+    assert robot.calls['stop_all_motors'] == 1
+
+
+class UnstoppableRobot(pipeline.FakeAsyncRobot):
+    """Robot whose connection has gone: stopping it fails."""
+
+    async def drive_wheels(self, *args, **kwargs):
+        await super().drive_wheels(*args, **kwargs)
+        if args == (0, 0):
+            raise ConnectionError('robot disconnected')
+
+
+def test_stage_error_is_raised_when_the_robot_cannot_be_stopped():
+    source = ScriptedController([state()])
+
+    def broken(state, now):
+        raise RuntimeError('controls bug')
+    robot = UnstoppableRobot()
+    with pytest.raises(RuntimeError):
+        asyncio.run(pipeline.Pipeline(source, robot, broken, poll_interval=0.001).run())
+    assert robot.calls['stop_all_motors'] == 1  # tried, even though stopping the wheels failed
+
+
+def test_failing_to_stop_the_robot_is_raised_after_a_clean_stop():
+    source = ScriptedController([state(), state(buttons=controller.GUIDE, number=1)])
+    robot = UnstoppableRobot()
+    with pytest.raises(ConnectionError):
+        asyncio.run(pipeline.Pipeline(source, robot, pipeline.Controls(), poll_interval=0.001).run())
+    assert robot.calls['stop_all_motors'] == 1
+
+
+class SettlingControls(pipeline.Controls):
+    """Controls logging each step's input number and left wheel speed, and each resume."""
+
+    def __init__(self):
+        super().__init__()
+        self.log = []
+
+    def __call__(self, state, now):
+        command = super().__call__(state, now)
+        if command is not None:
+            self.log.append((state.number, command['wheels'][1][0]))
+        return command
+
+    def resume(self):
+        self.log.append('resume')
+        super().resume()
+
+
+def test_time_settled_is_not_counted_as_time_to_accelerate():
+    # centered long enough for control to settle and sleep, then the stick pushed forward, then guide
+    states = [state()] * 50 + [state(ly=32767, number=1)] * 100 + [state(buttons=controller.GUIDE, number=2)]
+    controls = SettlingControls()
+    runner = pipeline.Pipeline(ScriptedController(states), pipeline.FakeAsyncRobot(), controls, poll_interval=0.001,
+                               max_dispatch_rate=0)
+    asyncio.run(runner.run())
+    pushed = controls.log.index('resume') + 1
+    assert controls.log[pushed] == (1, 0.0)  # ramping from rest as the stick is pushed, not from when it settled
+    assert max(entry[1] for entry in controls.log[pushed:] if entry != 'resume') > 0
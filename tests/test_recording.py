@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+import recording
+import xbox
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'small.czxr')
+    recorder = recording.Recorder(path, recording.XBOXDRV)
+    recorder.write(b'first\n')
+    recorder.write(bytearray(b'second\n'))
+    recorder.close()
+    kind, records = recording.load(path)
+    assert kind == recording.XBOXDRV
+    assert [payload for timestamp, payload in records] == [b'first\n', b'second\n']
+    assert records[0][0] <= records[1][0]
+
+
+def test_payload_over_length_field_is_split(tmp_path):
+    path = str(tmp_path / 'large.czxr')
+    payload = bytes(bytearray(i & 0xFF for i in range(xbox.DRAIN_SIZE * 2 + 5)))
+    recorder = recording.Recorder(path, recording.EVDEV)
+    recorder.write(memoryview(payload))
+    recorder.close()
+    kind, records = recording.load(path)
+    assert all(len(chunk) <= recording.MAX_PAYLOAD for timestamp, chunk in records)
+    assert len({timestamp for timestamp, chunk in records}) == 1
+    assert b''.join(chunk for timestamp, chunk in records) == payload
+
+
+def test_reader_thread_stores_unexpected_errors(tmp_path):
+    path = str(tmp_path / 'corrupt.czxr')
+    recorder = recording.Recorder(path, recording.XBOXDRV)
+    recorder.write(b'Press Ctrl-c to quit\n')
+    time.sleep(0.1)  # replayed as recorded, so the frame comes after attaching, to the reader thread
+    recorder.write(b'X1:garbage' + b' ' * 129 + b'\n')  # a frame's length, but not a frame
+    recorder.close()
+    joy = xbox.Joystick(threaded=True, command=recording.replay_command(path))
+    try:
+        joy.reader.join(5.0)  # the reader thread ends on the error, leaving it for the caller
+        assert isinstance(joy.readerError, ValueError)
+        with pytest.raises(ValueError):
+            joy.snapshot()
+    finally:
+        joy.close()
@@ -0,0 +1,64 @@
+import shaping
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class CommandLog:
+    """Robot stand-in keeping every command sent to it, in order."""
+
+    def __init__(self):
+        self.sent = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.sent.append((name,) + args)
+
+
+def test_repeats_and_small_changes_are_dropped():
+    robot = CommandLog()
+    shaper = shaping.CommandShaper(robot, max_rates={'drive_wheels': 0})
+    for speed in (100.0, 100.0, 103.0, 106.0, 106.0):
+        shaper.drive_wheels(speed, speed)
+    assert robot.sent == [('drive_wheels', 100.0, 100.0), ('drive_wheels', 106.0, 106.0)]
+    assert shaper.statistics()['drive_wheels'] == (2, 3)
+
+
+def test_rate_limit_holds_back_changes_but_never_stops():
+    clock = FakeClock()
+    robot = CommandLog()
+    shaper = shaping.CommandShaper(robot, clock=clock)  # move_head at most 20 times a second
+    shaper.move_head(0.5)
+    clock.now += 0.01
+    shaper.move_head(1.0)  # too soon, dropped: the caller keeps sending it
+    shaper.move_head(0.0)  # a stop goes out at once
+    shaper.move_head(0.0)
+    clock.now += 0.01
+    shaper.move_head(1.0)
+    clock.now += 0.05
+    shaper.move_head(1.0)
+    assert robot.sent == [('move_head', 0.5), ('move_head', 0.0), ('move_head', 1.0)]
+
+
+def test_stop_all_motors_lets_the_next_command_through():
+    clock = FakeClock()
+    robot = CommandLog()
+    shaper = shaping.CommandShaper(robot, clock=clock)
+    shaper.move_lift(1.0)
+    shaper.stop_all_motors()
+    shaper.move_lift(0.0)  # already stopped
+    clock.now += 0.1
+    shaper.move_lift(1.0)  # the same as before the stop, but the lift has stopped since
+    assert robot.sent == [('move_lift', 1.0), ('stop_all_motors',), ('move_lift', 1.0)]
+
+
+def test_other_commands_pass_through_and_allow_applies_the_rules():
+    robot = CommandLog()
+    shaper = shaping.CommandShaper(robot, max_rates={'set_lift_height': 0})
+    shaper.say_text('hello')
+    assert robot.sent == [('say_text', 'hello')]
+    assert shaper.allow('set_lift_height', (0.5,)) and not shaper.allow('set_lift_height', (0.5,))
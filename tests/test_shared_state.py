@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import shared_state
+import xbox
+from shared_joystick import SharedJoystick
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.monotonic()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = shared_state.StateWriter(str(tmp_path / 'state'), slots=8)
+    yield writer
+    if not writer.map.closed:
+        writer.close()
+
+
+def test_close_publishes_a_disconnected_frame(writer):
+    reader = shared_state.StateReader(writer.path)
+    writer.publish(100, -100, 0, 0, 255, 0, xbox.A, True, time.monotonic())
+    assert reader.latest().connected
+    writer.close()
+    frame = reader.latest()
+    assert not frame.connected
+    assert frame.buttons == 0 and frame.lt == 0
+    reader.close()
+
+
+def test_stale_heartbeat_reads_as_disconnected(writer):
+    clock = FakeClock()
+    reader = shared_state.StateReader(writer.path, stale_after=3.0, clock=clock)
+    writer.publish(0, 0, 0, 0, 0, 0, xbox.A, True, clock.now)
+    writer.beat(clock.now)
+    assert reader.alive() and reader.latest().connected
+    clock.now += 5.0
+    assert not reader.alive()
+    assert not reader.latest().connected
+    writer.beat(clock.now)
+    assert reader.latest().connected
+    reader.close()
+
+
+def test_shared_joystick_releases_buttons_while_the_writer_is_stale(writer):
+    clock = FakeClock()
+    writer.publish(0, 0, 0, 0, 0, 0, 0, True, clock.now)
+    writer.beat(clock.now)
+    joy = SharedJoystick(writer.path)
+    joy.reader.clock = clock
+    writer.publish(0, 0, 0, 0, 0, 0, xbox.A, True, clock.now)
+    joy.refresh()
+    assert joy.connected() and joy.A()
+    events = joy.pollEvents()
+    assert [(event.kind, event.code) for event in events] == [(xbox.BUTTON_DOWN, xbox.A)]
+
+    clock.now += 5.0
+    joy.refresh()
+    assert not joy.connected() and not joy.A()
+    assert [(event.kind, event.code) for event in joy.pollEvents()] == [(xbox.BUTTON_UP, xbox.A)]
+
+    # the writer comes back without new input: its newest frame applies again
+    writer.beat(clock.now)
+    joy.refresh()
+    assert joy.connected() and joy.A()
+    joy.close()
+
+
+def test_shared_joystick_wait_for_change_picks_up_the_next_frame(writer):
+    writer.publish(0, 0, 0, 0, 0, 0, 0, True, time.monotonic())
+    writer.beat(time.monotonic())
+    joy = SharedJoystick(writer.path)
+    joy.read()
+    assert joy.wait_for_change(0.02) is None
+    threading.Timer(0.05, writer.publish, (0, 0, 0, 0, 0, 0, xbox.B, True, time.monotonic())).start()
+    state = joy.wait_for_change(5.0)
+    assert state.buttons == xbox.B and state.connected
+    assert joy.wait_for_change(0.02) is None
+    joy.close()
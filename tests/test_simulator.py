@@ -0,0 +1,125 @@
+import math
+import time
+
+import cozmo
+import pytest
+
+import simulator
+from simulator import TRACK_WIDTH
+
+INSTANT = 1e9  # acceleration at which the treads reach their speeds at once, in mm/s^2
+
+
+@pytest.fixture
+def robot():
+    return simulator.SimulatedRobot(simulator.VirtualClock())
+
+
+def drive(robot, left, right, seconds, acceleration=INSTANT):
+    robot.drive_wheels(left, right, acceleration, acceleration)
+    robot.clock.sleep(seconds)
+    robot.update()
+
+
+def test_virtual_clock_only_moves_when_slept_through():
+    clock = simulator.VirtualClock()
+    assert clock() == 0.0
+    clock.sleep(2.5)
+    clock.sleep(0)
+    clock.sleep(-1.0)
+    assert clock() == clock.slept == 2.5
+
+
+def test_virtual_clock_can_be_watched_at_a_multiple_of_real_time():
+    clock = simulator.VirtualClock(speed=100)
+    started = time.monotonic()
+    clock.sleep(5.0)
+    assert clock() == 5.0
+    assert 0.05 <= time.monotonic() - started < 1.0
+
+
+def test_commands_reach_the_model_after_the_latency():
+    robot = simulator.SimulatedRobot(simulator.VirtualClock(), latency=0.1)
+    drive(robot, 100, 100, 0.05)
+    assert robot.left == 0.0 and robot.x == 0.0
+    drive(robot, 100, 100, 0.1)
+    assert robot.left == 100.0
+    assert robot.x == pytest.approx(100 * 0.05)  # moving only since the first command arrived
+
+
+def test_straight_drive_covers_speed_times_time(robot):
+    drive(robot, 100, 100, 2.0)
+    assert (robot.x, robot.y, robot.heading) == pytest.approx((200.0, 0.0, 0.0))
+    assert robot.odometer == pytest.approx(200.0)
+
+
+def test_treads_ramp_at_the_requested_acceleration(robot):
+    drive(robot, 100, 100, 2.0, acceleration=100)
+    assert robot.left == robot.right == 100.0
+    assert robot.x == pytest.approx(50.0 + 100.0)  # a second ramping up, then a second at speed
+    assert robot.top_speed == 100.0
+
+
+def test_arc_follows_differential_drive_kinematics(robot):
+    drive(robot, 50, 100, 1.0)
+    turn = (100 - 50) / TRACK_WIDTH
+    radius = 75 / turn
+    assert robot.heading == pytest.approx(turn)
+    assert robot.x == pytest.approx(radius * math.sin(turn))
+    assert robot.y == pytest.approx(radius * (1 - math.cos(turn)))
+    assert robot.odometer == pytest.approx(75.0)
+
+
+def test_turn_in_place_changes_only_the_heading(robot):
+    action = robot.turn_in_place(cozmo.util.degrees(90))
+    action.wait_for_completed()
+    robot.update()
+    assert action.has_succeeded
+    assert robot.heading == pytest.approx(math.pi / 2)
+    assert (robot.x, robot.y) == pytest.approx((0.0, 0.0), abs=1e-9)
+    robot.clock.sleep(1.0)
+    robot.update()
+    assert robot.heading == pytest.approx(math.pi / 2)  # the wheels were released when it finished
+
+
+def test_drive_straight_stops_after_the_distance(robot):
+    action = robot.drive_straight(cozmo.util.distance_mm(-100), cozmo.util.speed_mmps(50))
+    assert action.wait_for_completed() is action and action.has_succeeded
+    assert robot.clock() == pytest.approx(2.0)
+    assert robot.x == pytest.approx(-100.0)
+    robot.clock.sleep(1.0)
+    robot.update()
+    assert robot.x == pytest.approx(-100.0) and robot.left == 0.0
+
+
+def test_second_action_raises_robot_busy_unless_in_parallel(robot):
+    robot.drive_straight(100, 50)
+    with pytest.raises(cozmo.exceptions.RobotBusy):
+        robot.say_text('hello')
+    assert robot.actions['busy'] == 1
+    speech = robot.say_text('hello', in_parallel=True)  # voice only, so alongside the drive
+    speech.wait_for_completed()
+    assert speech.has_succeeded
+
+
+def test_action_needing_a_held_track_fails(robot):
+    lift = robot.set_lift_height(1.0)
+    animation = robot.play_anim('anim_a', in_parallel=True)  # needs the lift as well
+    robot.clock.sleep(0.01)
+    assert animation.is_completed and not animation.has_succeeded and animation.state == 'failed'
+    lift.wait_for_completed()
+    assert lift.has_succeeded and robot.lift_height == pytest.approx(1.0)
+    assert robot.actions['failed'] == 1 and robot.actions['succeeded'] == 1
+    robot.play_anim('anim_a', ignore_lift_track=True).wait_for_completed()
+    assert robot.actions['succeeded'] == 2
+
+
+def test_aborting_an_action_releases_its_track(robot):
+    action = robot.drive_straight(1000, 100)
+    robot.clock.sleep(1.0)
+    action.abort()
+    robot.clock.sleep(0.01)
+    robot.update()
+    assert action.state == 'aborted' and robot.left == 0.0
+    assert robot.x == pytest.approx(100.0, abs=1.0)
+    assert robot.turn_in_place(1.0).wait_for_completed().has_succeeded
@@ -0,0 +1,41 @@
+import pytest
+
+import drive
+from stick_table import StickTable
+from xinput import GAMEPAD_LEFT_THUMB_DEADZONE, GAMEPAD_THUMB_MAX
+
+
+def test_deadzone_reads_as_released():
+    table = StickTable(drive.DriveMixer())
+    for x, y in ((0, 0), (-1, -1), (GAMEPAD_LEFT_THUMB_DEADZONE - 600, 0), (0, -(GAMEPAD_LEFT_THUMB_DEADZONE - 600))):
+        assert table.lookup(x, y) == (0, 0)
+
+
+def test_lookup_matches_the_mixer_at_cell_centres():
+    mixer = drive.DriveMixer(forward_speed=150, turn_speed=100, expo=0.3)
+    table = StickTable(mixer, cell_bits=9)
+    span = float(GAMEPAD_THUMB_MAX - GAMEPAD_LEFT_THUMB_DEADZONE)
+    for column, row in ((64, 104), (40, 88), (122, 32)):
+        x, y = (column << 9) - 32768 + 256, (row << 9) - 32768 + 256
+        magnitude = (x * x + y * y) ** 0.5
+        scale = min(magnitude - GAMEPAD_LEFT_THUMB_DEADZONE, span) / span / magnitude
+        # anywhere in the cell reads the same as its centre
+        assert table.lookup(x - 256, y + 255) == table.lookup(x, y) == pytest.approx(mixer.mix(y * scale, x * scale))
+
+
+def test_full_travel_reaches_full_speed():
+    table = StickTable(drive.DriveMixer(forward_speed=150, turn_speed=100))
+    for x, y, expected in ((0, 32767, (150, 150)), (32767, 0, (100, -100)), (0, -32768, (-150, -150))):
+        assert table.lookup(x, y) == pytest.approx(expected, abs=3.0)  # to within the cell's offset from the axis
+
+
+def test_configure_rebuilds_and_rejects_unknown_settings():
+    mixer = drive.DriveMixer()
+    table = StickTable(mixer)
+    before = table.lookup(0, 16000)
+    mixer.expo = 0.5
+    table.configure(cell_bits=10)
+    assert table.size == 64 and len(table.cells) == 64 * 64
+    assert table.lookup(0, 16000)[0] < before[0]  # more expo is gentler half way
+    with pytest.raises(TypeError):
+        table.configure(expo=0.5)
@@ -0,0 +1,138 @@
+import select
+import sys
+import time
+
+import pytest
+
+import xbox
+
+LINE = ("X1:{:6d} Y1:{:6d}  X2:{:6d} Y2:{:6d}  du:{} dd:{} dl:{} dr:{}  back:{} guide:{} start:{}  "
+        "TL:{} TR:{}  A:{} B:{} X:{} Y:{}  LB:{} RB:{}  LT:{:3d} RT:{:3d}\n")
+
+
+@pytest.mark.parametrize('convert', [bytes, bytearray, lambda line: line.decode()])
+def test_decode(convert):
+    line = LINE.format(-32768, 32767, 120, -5, 1, 0, 0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 1, 255, 7).encode()
+    state = xbox.decode(convert(line))
+    assert (state.lx, state.ly, state.rx, state.ry, state.lt, state.rt) == (-32768, 32767, 120, -5, 255, 7)
+    assert state.buttons == xbox.DPAD_UP | xbox.START | xbox.A | xbox.Y | xbox.RIGHT_BUMPER
+    assert state.connectStatus
+
+
+def line(lx=0, ly=0, a=0, b=0, guide=0, lt=0):
+    return LINE.format(lx, ly, 0, 0, 0, 0, 0, 0, 0, guide, 0, 0, 0, a, b, 0, 0, 0, 0, lt, 0)
+
+
+def xboxdrv(*frames, gap=0.05, hold=60):
+    """
+    :return: command standing in for xboxdrv: attaches, then prints frames gap seconds apart,
+             the first one a little after attaching, and exits hold seconds after the last
+    """
+    script = ("import sys, time\n"
+              "sys.stdout.write('Press Ctrl-c to quit\\n'); sys.stdout.flush(); time.sleep(0.05)\n"
+              "for frame in sys.argv[3:]:\n"
+              "    time.sleep(float(sys.argv[1])); sys.stdout.write(frame); sys.stdout.flush()\n"
+              "time.sleep(float(sys.argv[2]))\n")
+    return [sys.executable, '-c', script, str(gap), str(hold)] + list(frames)
+
+
+def frames(joy, count, timeout=5.0):
+    """Wait for the joystick to have published count frames."""
+    while joy.frameCount < count:
+        assert joy.wait_for_change(timeout) is not None
+
+
+def test_presses_and_stick_moves_are_queued_as_events():
+    joy = xbox.Joystick(threaded=True, command=xboxdrv(line(a=1), line(), line(lx=20000), line(lx=3000)))
+    try:
+        frames(joy, 4)
+        events, state = joy.poll()
+        assert [(event.kind, event.code, event.value) for event in events] == [
+            (xbox.BUTTON_DOWN, xbox.A, 1), (xbox.BUTTON_UP, xbox.A, 0), (xbox.AXIS, 'lx', 1), (xbox.AXIS, 'lx', 0)]
+        assert events[0].state.A() and not state.A() and state.lx == 3000
+        assert joy.poll() == ([], state)
+    finally:
+        joy.close()
+
+
+def test_full_event_queue_drops_the_oldest():
+    joy = xbox.Joystick(threaded=True, eventLimit=2, command=xboxdrv(line(a=1), line(), line(b=1)))
+    try:
+        frames(joy, 3)
+        assert [(event.kind, event.code) for event in joy.pollEvents()] == [
+            (xbox.BUTTON_UP, xbox.A), (xbox.BUTTON_DOWN, xbox.B)]
+        assert joy.droppedEvents == 1
+    finally:
+        joy.close()
+
+
+def test_reader_thread_keeps_the_newest_frame_without_being_asked():
+    joy = xbox.Joystick(threaded=True, command=xboxdrv(line(lx=1000), line(lx=2000), line(lx=3000), hold=0.2))
+    try:
+        deadline = time.monotonic() + 5.0
+        while joy.frameCount < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)  # no Joystick calls meanwhile: the reader thread does the reading
+        assert joy.snapshot().lx == 3000 and joy.connected()
+        joy.reader.join(5.0)  # xboxdrv exits, which reads as the controller unplugging
+        with pytest.raises(IOError):
+            joy.snapshot()
+    finally:
+        joy.close()
+
+
+def readable(joy, timeout=5.0):
+    return select.select([joy.pipe], [], [], timeout)[0]
+
+
+def test_drain_decodes_only_the_newest_of_a_backlog():
+    joy = xbox.Joystick(command=xboxdrv(*[line(lx=i) for i in range(300)], gap=0))
+    try:
+        time.sleep(0.5)  # the whole backlog is waiting in the pipe
+        assert readable(joy)
+        joy.readAvailable()
+        assert joy.frameCount == 1 and joy.snapshot().lx == 299
+        assert not readable(joy, 0)  # drained in one call
+    finally:
+        joy.close()
+
+
+def test_drain_keeps_a_partial_line_for_the_next_one():
+    frame = line(lx=1234)
+    joy = xbox.Joystick(command=xboxdrv(frame[:50], frame[50:], gap=0.2))
+    try:
+        assert readable(joy)
+        joy.readAvailable()
+        assert joy.frameCount == 0 and joy.buffered == 50
+        assert readable(joy)
+        joy.readAvailable()
+        assert joy.frameCount == 1 and joy.snapshot().lx == 1234
+    finally:
+        joy.close()
+
+
+def test_wait_for_change_returns_each_new_frame_then_times_out():
+    joy = xbox.Joystick(command=xboxdrv(line(lx=1000), line(lx=2000), gap=0.2))
+    try:
+        assert joy.read().number == 0
+        first = joy.wait_for_change(5.0)
+        assert (first.lx, first.number) == (1000, 1)
+        second = joy.wait_for_change(5.0)
+        assert (second.lx, second.number) == (2000, 2)
+        started = time.monotonic()
+        assert joy.wait_for_change(0.2) is None
+        assert time.monotonic() - started >= 0.2
+        assert joy.read() is second
+    finally:
+        joy.close()
+
+
+def test_threaded_wait_for_change_wakes_on_the_reader_thread():
+    joy = xbox.Joystick(threaded=True, command=xboxdrv(line(ly=-5000), gap=0.3))
+    try:
+        assert not joy.read().connected
+        assert joy.wait_for_change(0.05) is None  # xboxdrv has not printed anything yet
+        state = joy.wait_for_change(5.0)
+        assert state.ly == -5000 and state.connected and state.number == joy.frameCount
+        assert joy.wait_for_change(0.05) is None  # the frame was handed out, so it is not new
+    finally:
+        joy.close()
@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+
+import controller
+import simulator
+import xbox_controller
+import xinput
+
+
+class CommandLog:
+    """Robot stand-in keeping every command sent to it, in order."""
+
+    def __init__(self):
+        self.sent = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.sent.append((name, args))
+
+
+def states():
+    yield controller.State(0, 32767, 0, 0, 0, 0, 0, True, 0.0, 1)  # left stick forward
+    yield controller.State(0, 0, 0, 0, 0, 0, xbox_controller.GAMEPAD_DPAD_LEFT, True, 0.0, 2)
+    yield controller.State(0, 0, 0, 0, 200, 40, xbox_controller.GAMEPAD_Y, True, 0.0, 3)  # triggers beat the pad
+
+
+def test_check_controller_state_sends_what_controller_commands_computes():
+    robot = CommandLog()
+    for now, state in enumerate(states()):
+        sending = copy.copy(xbox_controller.drive_mixer)
+        computing = copy.copy(xbox_controller.drive_mixer)
+        sending.clock = computing.clock = lambda: float(now)
+        xbox_controller.check_controller_state(robot, state, sending)
+        assert robot.sent == list(xbox_controller.controller_commands(state, mixer=computing).values())
+        robot.sent.clear()
+
+
+def test_controller_commands_priorities():
+    mixer = copy.copy(xbox_controller.drive_mixer)
+    mixer.acceleration = None
+    forward, pad, triggers = (xbox_controller.controller_commands(state, 0.0, mixer) for state in states())
+    assert forward['wheels'][1][:2] == xbox_controller.left_stick_table.lookup(0, 32767)
+    assert pad['wheels'][1][:2] == (-100, 100)
+    assert triggers['wheels'][1][:2] == mixer.tank(200 / 255.0, 40 / 255.0)
+    assert triggers['head'] == ('move_head', (1.0,))
+
+
+class StandInXInput:
+    """XInput library stand-in reporting the stick position and packet number it is given."""
+
+    def __init__(self):
+        self.packet_number = 1
+        self.ly = 0
+
+    def XInputGetState(self, device_number, state):
+        state = state._obj
+        state.packet_number = self.packet_number
+        state.gamepad.l_thumb_y = self.ly
+        return 0
+
+    def XInputSetState(self, device_number, vibration):
+        return 0
+
+    def XInputGetBatteryInformation(self, device_number, device_type, battery):
+        return 0
+
+
+class FrameLog:
+    """Latency monitor stand-in keeping the frames it is told about."""
+
+    def __init__(self):
+        self.frames = []
+
+    def frame(self, number, timestamp):
+        self.frames.append((number, timestamp))
+
+    def command(self, name):
+        pass
+
+
+def test_latency_is_measured_from_when_the_packet_arrived(monkeypatch):
+    library = StandInXInput()
+    monkeypatch.setattr(xinput, 'xinput', None)
+    xinput.use_library(library)
+    monitor = FrameLog()
+    pilot = xbox_controller.Pilot(xinput.XInputJoystick(0), simulator.SimulatedRobot(simulator.VirtualClock()),
+                                  monitor)
+    library.packet_number, library.ly = 2, 32767
+    arrived = time.monotonic()
+    for i in range(3):
+        assert pilot.step()
+        time.sleep(0.01)
+    (number, timestamp), = set(monitor.frames)  # later steps on the same packet keep its time
+    assert number == 2 and arrived <= timestamp < arrived + 0.01
+
+
+def test_xinput_wait_for_change_returns_on_a_new_packet(monkeypatch):
+    library = StandInXInput()
+    monkeypatch.setattr(xinput, 'xinput', None)
+    xinput.use_library(library)
+    joystick = xinput.XInputJoystick(0)
+    assert joystick.read().number == 1
+    assert joystick.wait_for_change(0.02) is None
+    library.ly = 32767  # moved without a new packet number: XInput has not reported it
+    assert joystick.wait_for_change(0.02) is None
+
+    def packet():
+        library.packet_number = 2
+    threading.Timer(0.05, packet).start()
+    state = joystick.wait_for_change(5.0)
+    assert (state.ly, state.number) == (32767, 2)
+    assert joystick.wait_for_change(0.02) is None
@@ -0,0 +1,60 @@
+import grp
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+import xbox
+import xboxd
+
+FRAME = ("X1:{:6d} Y1:     0  X2:     0 Y2:     0  du:0 dd:0 dl:0 dr:0  back:0 guide:0 start:0  "
+         "TL:0 TR:0  A:0 B:0 X:0 Y:0  LB:0 RB:0  LT:  0 RT:  0\n")
+
+# stands in for xboxdrv: attaches reporting lx=1000, moves to lx=2000 half a second later, and exits after another
+XBOXDRV = [sys.executable, '-c',
+           "import sys, time\n"
+           "sys.stdout.write('Loading...\\nPress Ctrl-c to quit\\n' + {0!r}); sys.stdout.flush(); time.sleep(0.5)\n"
+           "sys.stdout.write({1!r}); sys.stdout.flush(); time.sleep(0.5)\n".format(FRAME.format(1000), FRAME.format(2000))]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = xboxd.Daemon(str(tmp_path / 'xboxd.sock'), XBOXDRV, grp.getgrgid(os.getgid()).gr_name)
+    daemon.serving = threading.Thread(target=daemon.serve)
+    daemon.serving.start()
+    yield daemon
+    daemon.serving.join(5.0)
+    daemon.close()
+
+
+def test_clients_attach_with_the_newest_frame_and_share_the_output(daemon):
+    first = xbox.Joystick(threaded=True, daemon=daemon.path)
+    second = xbox.Joystick(threaded=True, daemon=daemon.path)
+    try:
+        for joy in (first, second):
+            assert joy.attachTime < 0.5  # no waiting on xboxdrv to find the controller
+            assert joy.snapshot().lx == 1000 and joy.connected()
+        for joy in (first, second):
+            assert joy.wait_for_change(5.0).lx == 2000
+        daemon.serving.join(5.0)  # xboxdrv exited, ending xboxd, which reads as the controller unplugging
+        daemon.close()
+        first.reader.join(5.0)
+        with pytest.raises(IOError):
+            first.snapshot()
+    finally:
+        first.close()
+        second.close()
+
+
+def test_socket_is_only_open_to_its_group(tmp_path):
+    server = xboxd.listen(str(tmp_path / 'xboxd.sock'), grp.getgrgid(os.getgid()).gr_name)
+    try:
+        status = os.stat(str(tmp_path / 'xboxd.sock'))
+        assert stat.S_IMODE(status.st_mode) == 0o660 and status.st_gid == os.getgid()
+    finally:
+        server.close()
+    with pytest.raises(IOError):
+        xboxd.listen(str(tmp_path / 'other.sock'), 'no-such-group-xboxd')
+    assert not os.path.exists(str(tmp_path / 'other.sock'))
@@ -0,0 +1,77 @@
+"""
+Precomputed lookup from left stick position to wheel speeds.
+
+The stick's raw range is cut into a square grid of cells and the drive mixer's wheel speeds for
+the centre of every cell are worked out once, so mapping a stick reading to (left_speed, right_speed)
+costs two shifts and one list index instead of a square root, divisions and the mixing arithmetic.
+"""
+
+from math import sqrt
+
+from xinput import GAMEPAD_LEFT_THUMB_DEADZONE, GAMEPAD_THUMB_MAX
+
+
+class StickTable:
+    """
+    Quantized stick to wheel speed table.
+    Example:
+    table = StickTable(drive.DriveMixer())
+    left_speed, right_speed = table.lookup(state['l_thumb_x'], state['l_thumb_y'])
+    """
+
+    def __init__(self, mixer, cell_bits=9, deadzone=GAMEPAD_LEFT_THUMB_DEADZONE):
+        """
+        :param mixer: drive.DriveMixer whose mix() gives the speeds; the table must be rebuilt
+                      with build() or configure() after the mixer's settings change
+        :param cell_bits: log2 of the raw stick units covered by one cell side; 9 gives a 128 x 128 grid
+        :param deadzone: radius, in raw units, of the circle around the centre that reads as released
+        """
+        self.mixer = mixer
+        self.cell_bits = cell_bits
+        self.deadzone = deadzone
+        self.cells = []
+        self.build()
+
+    def configure(self, **settings):
+        """
+        Change any of the constructor's settings and rebuild the table.
+        """
+        for name, value in settings.items():
+            if name not in ('mixer', 'cell_bits', 'deadzone'):
+                raise TypeError("unknown stick table setting '{0}'".format(name))
+            setattr(self, name, value)
+        self.build()
+
+    def build(self):
+        """
+        Work out the speeds for every cell. Each axis is evaluated once per column or row, and
+        the stick is scaled radially so that 0.0 is the edge of the deadzone and 1.0 full travel.
+        """
+        step = 1 << self.cell_bits
+        size = 65536 >> self.cell_bits
+        centres = [(i << self.cell_bits) - 32768 + step // 2 for i in range(size)]
+        squares = [c * c for c in centres]
+        deadzone = self.deadzone
+        span = float(GAMEPAD_THUMB_MAX - deadzone)
+        mix = self.mixer.mix
+        stop = (0, 0)
+        cells = []
+        for y, yy in zip(centres, squares):
+            for x, xx in zip(centres, squares):
+                magnitude = sqrt(xx + yy)
+                if magnitude <= deadzone:
+                    cells.append(stop)
+                    continue
+                scale = min(magnitude - deadzone, span) / span / magnitude
+                cells.append(mix(y * scale, x * scale))
+        self.size = size
+        self.cells = cells
+
+    def lookup(self, x, y):
+        """
+        :param x: raw stick x value, -32768 to 32767
+        :param y: raw stick y value, -32768 to 32767
+        :return: a tuple containing (left_speed, right_speed)
+        """
+        bits = self.cell_bits
+        return self.cells[(((y + 32768) >> bits) << (16 - bits)) + ((x + 32768) >> bits)]
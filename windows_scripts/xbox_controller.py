@@ -1,6 +1,26 @@
+import argparse
+import copy
+import os
+import sys
+import time
+
 from xinput import *
 import cozmo
-from math import *
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared_scripts'))
+import drive
+import fleet
+import latency
+import pipeline
+import recording
+import shaping
+import ticker
+from stick_table import StickTable
+
+monitor = latency.from_environment()  # set COZMO_LATENCY=1 to measure input-to-command latency
+
+RATE = float(os.environ.get('COZMO_RATE', 100))  # control loop iterations per second, COZMO_RATE to change
+IDLE_WAIT = 1.0  # longest sleep waiting for input while idle
 
 directional_pad_speeds = {
     # up, down, left, right
@@ -15,91 +35,63 @@ directional_pad_speeds = {
     GAMEPAD_DPAD_DOWN | GAMEPAD_DPAD_RIGHT: (-100, -50),
 }
 
+# proportional wheel speeds for the left stick and the triggers, ramped up at no more than 600 mm/s^2
+drive_mixer = drive.DriveMixer(forward_speed=150, turn_speed=100, expo=0.3, acceleration=600)
+# left stick to wheel speed table; call left_stick_table.build() after changing drive_mixer's settings
+left_stick_table = StickTable(drive_mixer)
+
 
-def normalize_stick(x, y):
+def controller_commands(state, now=None, mixer=drive_mixer):
     """
-    Normalize input values for left and right sticks
-    :param x: x value generated by the controller
-    :param y: y value generated by the controller
-    :return: a tuple containing (normalized x, normalized_y, magnitude)
+    Compute the robot commands for a controller state: B and A raise and lower the lift, Y and X
+    tilt the head, and the triggers, else the directional pad, else the left stick drive.
+
+    :param state: controller.State of the controller
+    :param now: current time for the drive ramp; defaults to the mixer's clock
+    :param mixer: drive.DriveMixer ramping the wheel speeds
+    :return: dict of actuator to a tuple containing (robot method name, arguments)
     """
-    # print("x = {0}, y = {1}".format(x, y))
-    # determine how far the controller is pushed
-    magnitude = sqrt(x * x + y * y) + 0.01  # 0.01 to avoid division by zero when x = y = 0
-    # determine the direction the controller is pushed
-    normalized_x, normalized_y = x / magnitude, y / magnitude
-    # check if the controller is outside a circular dead zone
-    if magnitude > GAMEPAD_LEFT_THUMB_DEADZONE:
-        magnitude = min([magnitude, GAMEPAD_THUMB_MAX])
-        magnitude -= GAMEPAD_LEFT_THUMB_DEADZONE
+    buttons = state.buttons
+    lift = 1.0 if buttons == GAMEPAD_B else -1.0 if buttons == GAMEPAD_A else 0
+    head = 1.0 if buttons == GAMEPAD_Y else -1.0 if buttons == GAMEPAD_X else 0
+    # directional pad buttons take priority over the left stick, triggers over both
+    if state.lt > 0 or state.rt > 0:
+        speeds = mixer.tank(state.lt / 255.0, state.rt / 255.0)
     else:
-        normalized_x, normalized_y, magnitude = 0.0, 0.0, 0.0
+        speeds = directional_pad_speeds.get(buttons & 0xFF)
+        if speeds is None:
+            # left stick, mixed proportionally into wheel speeds by table lookup
+            speeds = left_stick_table.lookup(state.lx, state.ly)
+    left_speed, right_speed = mixer.step(*speeds, now=now)
+    return {
+        'lift': ('move_lift', (lift,)),
+        'head': ('move_head', (head,)),
+        'wheels': ('drive_wheels', (left_speed, right_speed, mixer.acceleration, mixer.acceleration)),
+    }
 
-    return normalized_x, normalized_y, magnitude
 
+def check_controller_state(robot: cozmo.robot.Robot, state, mixer=drive_mixer):
+    """
+    Send the robot the commands controller_commands computes for a controller state, the same
+    ones the --async pipeline dispatches.
 
-def check_controller_state(robot: cozmo.robot.Robot, state):
-    # face buttons
-    # lift
-    if state['buttons'] == GAMEPAD_B:
-        robot.move_lift(1.0)
-    elif state['buttons'] == GAMEPAD_A:
-        robot.move_lift(-1.0)
-    else:
-        robot.move_lift(0)
-    # head
-    if state['buttons'] == GAMEPAD_Y:
-        robot.move_head(1.0)
-    elif state['buttons'] == GAMEPAD_X:
-        robot.move_head(-1.0)
-    else:
-        robot.move_head(0)
-
-    # left stick
-    left_x, left_y, left_magnitude = normalize_stick(state['l_thumb_x'], state['l_thumb_y'])
-    # print("left :{0}, {1}, {2}".format(left_x, left_y, left_magnitude))
+    :param robot: cozmo robot object
+    :param state: controller.State of the controller
+    :param mixer: drive.DriveMixer ramping the wheel speeds
+    """
+    for name, args in controller_commands(state, mixer=mixer).values():
+        getattr(robot, name)(*args)
 
-    # directional pad buttons
 
-    if state['left_trigger'] > 0 or state['right_trigger'] > 0:
-        robot.drive_wheels(state['left_trigger'], state['right_trigger'])
-    else:
-        (left_speed, right_speed) = directional_pad_speeds.get(state['buttons'] & 0xFF, (0, 0))
-        if left_speed == 0.0 and right_speed == 0.0:
-            if left_magnitude != 0.0:
-                # up
-                if left_y >= 0.75 and abs(left_x) < 0.25:
-                    robot.drive_wheels(100, 100)
-                # down
-                elif left_y <= -0.75 and abs(left_x) < 0.25:
-                    robot.drive_wheels(-100, -100)
-                # left
-                elif abs(left_y) < 0.25 and left_x <= -0.75:
-                    robot.drive_wheels(-100, 100)
-                # right
-                elif abs(left_y) < 0.25 and left_x >= 0.75:
-                    robot.drive_wheels(100, -100)
-                # up + left
-                elif left_y >= 0.50 and left_x <= -0.50:
-                    robot.drive_wheels(50, 100)
-                # up + right
-                elif left_y >= 0.50 and left_x >= 0.50:
-                    robot.drive_wheels(100, 50)
-                # down + left
-                elif left_y <= -0.50 and left_x <= -0.50:
-                    robot.drive_wheels(-50, -100)
-                # down + right
-                elif left_y <= -0.50 and left_x >= 0.50:
-                    robot.drive_wheels(-100, -50)
-                else:
-                    pass
-            else:
-                robot.drive_wheels(0, 0)
-        else:
-            robot.drive_wheels(left_speed, right_speed)
-
-
-def cozmo_program(robot: cozmo.robot.Robot):
+def first_controller():
+    """
+    :return: the first connected XInputJoystick, served from a recording when COZMO_REPLAY is set;
+             exits if there is none
+    """
+    # COZMO_REPLAY serves the controller from a recording instead of the XInput library
+    replay = os.environ.get('COZMO_REPLAY')
+    if replay:
+        use_library(recording.ReplayXInput(replay, float(os.environ.get('COZMO_REPLAY_SPEED', 1))))
 
     joysticks = XInputJoystick.enumerate_devices()
 
@@ -110,12 +102,160 @@ def cozmo_program(robot: cozmo.robot.Robot):
         sys.exit(0)
     # use only the first controller
     joystick = joysticks[0]
+    record = os.environ.get('COZMO_RECORD')
+    if record:
+        joystick.recorder = recording.Recorder(record, recording.XINPUT)
+    return joystick
+
+
+def cozmo_program(robot: cozmo.robot.Robot, joystick=None, clock=time.monotonic, sleep=time.sleep):
+    """
+    :param robot: cozmo robot object
+    :param joystick: XInputJoystick (or anything with the same methods); None for the first one connected
+    :param clock: function returning the current time in seconds, for pacing and the drive ramp
+    :param sleep: function sleeping for a number of seconds, for pacing
+    """
+
+    if joystick is None:
+        joystick = first_controller()
+    pilot = Pilot(joystick, monitor.instrument(robot), monitor, echo=True, clock=clock)
+
+    pacer = ticker.Ticker(RATE, clock, sleep)
+    while pilot.step():
+        if pilot.idle():
+            # nothing will move until the input changes, so sleep on the controller instead of ticking
+            pacer.pause()
+            joystick.wait_for_change(IDLE_WAIT)
+            pilot.resume()
+        pacer.wait()
+
+    pilot.stop()
+    if joystick.recorder is not None:
+        joystick.recorder.close()
+    print('Control loop:', pacer.statistics())
+
 
-    while True:
-        state = joystick.get_state()
-        print(state)
-        check_controller_state(robot, state)
-        time.sleep(.01)
+async def async_program(sdk_conn):
+    """
+    Drive cozmo with the SDK's asynchronous API: polling the controller, computing the controls
+    and sending robot commands each run as their own task on the SDK's event loop, so a slow
+    command never holds up polling.  Stops when the controller disconnects.
+
+    :param sdk_conn: cozmo.conn.CozmoConnection to drive the robot of
+    """
+    robot = await sdk_conn.wait_for_robot()
+    joystick = first_controller()
+    mixer = copy.copy(drive_mixer)
+    mixer.reset()
+    runner = pipeline.Pipeline(joystick, robot, lambda state, now: controller_commands(state, now, mixer), RATE,
+                               stop_on_disconnect=True, resume=mixer.hold)
+    try:
+        await runner.run()
+    finally:
+        if joystick.recorder is not None:
+            joystick.recorder.close()
+    print("Controller disconnected.")
+    print('Pipeline:', runner.statistics())
+
+
+def fleet_program(robots, rate=RATE):
+    """
+    Drive several robots at once, each from its own controller, in a single loop.
+    Connected controllers are paired with robots in order; each pair stops when its controller
+    disconnects, and per-pair loop rates are printed at the end.
+
+    :param robots: list of cozmo robot objects
+    :param rate: control steps per second for each pair
+    """
+    joysticks = XInputJoystick.enumerate_devices()
+    if len(joysticks) < len(robots):
+        print("{0} controllers are connected for {1} robots.".format(len(joysticks), len(robots)))
+        sys.exit(0)
+
+    runner = fleet.Fleet(rate)
+    for joystick, robot in zip(joysticks, robots):
+        runner.add('controller {0}'.format(joystick.device_number), joystick, Pilot(joystick, robot))
+    try:
+        runner.run()
+    finally:
+        for pair in runner.pairs:
+            if pair.finished is None:
+                runner.finish(pair)
+        runner.close()
+    for name, stats in sorted(runner.report().items()):
+        print(name, stats)
 
 
-cozmo.run_program(cozmo_program)
+class Pilot:
+    """
+    Control state for one controller and robot pair. cozmo_program runs a single pilot,
+    fleet_program one per pair.
+    """
+
+    def __init__(self, joystick, robot: cozmo.robot.Robot, monitor=None, echo=False, clock=time.monotonic):
+        """
+        :param joystick: XInputJoystick to poll
+        :param robot: cozmo robot object
+        :param monitor: latency.LatencyMonitor told about every new packet, or None
+        :param echo: print every state read from the controller
+        :param clock: function returning the current time in seconds, for the drive ramp and rate limits
+        """
+        self.joystick = joystick
+        self.robot = shaping.CommandShaper(robot, clock=clock)  # only send commands that change something
+        self.monitor = monitor if monitor is not None else latency.NullMonitor()
+        self.echo = echo
+        # a mixer of its own, so that one pair's acceleration ramp does not leak into another's
+        self.mixer = copy.copy(drive_mixer)
+        self.mixer.clock = clock
+        self.mixer.reset()
+
+    def step(self, now=None):
+        """
+        Poll the controller and act on its state.
+
+        :param now: current time, unused; accepted so a pilot can be run by fleet.Fleet
+        :return: False once the controller has disconnected, otherwise True
+        """
+        state = self.joystick.read()
+        if not state.connected:
+            print("Controller disconnected.")
+            return False
+        self.monitor.frame(state.number, state.timestamp)  # stamped when XInput first reported the packet
+        if self.echo:
+            print(state)
+        check_controller_state(self.robot, state, self.mixer)
+        return True
+
+    def idle(self):
+        """
+        :return: True if the wheels are stopped and not asked to move, so stepping again before new input
+                 would do nothing
+        """
+        return self.mixer.stopped()
+
+    def resume(self):
+        """
+        Carry on after sleeping on the controller while idle: the wheels were stopped, so the drive
+        ramp starts again from rest rather than counting the time slept as time to accelerate.
+        """
+        self.mixer.reset()
+
+    def stop(self):
+        self.robot.drive_wheels(0, 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drive Cozmo with an Xbox controller.')
+    parser.add_argument('--fleet', nargs='+', metavar='SERIAL',
+                        help='drive one robot per mobile device serial number, each with its own controller')
+    parser.add_argument('--ios', action='store_true', help='the --fleet devices are iOS rather than Android')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="run polling, control and robot commands as tasks on the SDK's event loop")
+    args = parser.parse_args()
+    if args.fleet:
+        with fleet.robot_connections(args.fleet, args.ios) as robots:
+            fleet_program(robots)
+    elif args.use_async:
+        cozmo.connect(async_program)
+    else:
+        cozmo.run_program(cozmo_program)
@@ -13,10 +13,14 @@ Modified to add dead zones, reduce noise, and support vibration
 """
 
 import ctypes
+import os
 import sys
 import time
 from operator import attrgetter
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared_scripts'))
+import controller
+
 # structs according to
 # http://msdn.microsoft.com/en-gb/library/windows/desktop/ee417001%28v=vs.85%29.aspx
 
@@ -48,11 +52,50 @@ class XINPUT_BATTERY_INFORMATION(ctypes.Structure):
     _fields_ = [("BatteryType", ctypes.c_ubyte),
                 ("BatteryLevel", ctypes.c_ubyte)]
 
-xinput = ctypes.windll.xinput1_4
+# The XInput library, or a stand-in offering the same three functions such as
+# recording.ReplayXInput.  Loaded on first use, so this module imports on any platform.
+xinput = None
 #xinput = ctypes.windll.xinput9_1_0  # this is the Win 8 version ?
 # xinput1_2, xinput1_1 (32-bit Vista SP1)
 # xinput1_3 (64-bit Vista SP1)
 
+# argument and result types of the XInput functions used here
+PROTOTYPES = {
+    'XInputGetState': ([ctypes.c_uint, ctypes.POINTER(XINPUT_STATE)], ctypes.c_uint),
+    'XInputSetState': ([ctypes.c_uint, ctypes.POINTER(XINPUT_VIBRATION)], ctypes.c_uint),
+    'XInputGetBatteryInformation': ([ctypes.c_uint, ctypes.c_ubyte, ctypes.POINTER(XINPUT_BATTERY_INFORMATION)],
+                                    ctypes.c_uint),
+}
+
+
+def use_library(library):
+    """
+    Make library the XInput implementation used by joysticks created from now on.
+    ctypes functions get their argument and result types set here, once.
+
+    :param library: ctypes XInput DLL, or any object with the functions named in PROTOTYPES
+    """
+    global xinput
+    for name, (argtypes, restype) in PROTOTYPES.items():
+        function = getattr(library, name)
+        if isinstance(function, ctypes._CFuncPtr):
+            function.argtypes = argtypes
+            function.restype = restype
+    xinput = library
+
+
+def load_library():
+    """
+    :return: the XInput implementation, loading xinput1_4.dll the first time on Windows
+    :raises OSError: elsewhere, if no stand-in has been given to use_library()
+    """
+    if xinput is None:
+        try:
+            use_library(ctypes.windll.xinput1_4)
+        except AttributeError:
+            raise OSError('XInput is only available on Windows; pass a stand-in to use_library()')
+    return xinput
+
 
 def struct_dict(struct):
     """
@@ -68,7 +111,7 @@ ERROR_DEVICE_NOT_CONNECTED = 1167
 ERROR_SUCCESS = 0
 
 
-class XInputJoystick:
+class XInputJoystick(controller.Controller):
     """
     XInputJoystick
     Example:
@@ -79,20 +122,85 @@ class XInputJoystick:
 
     def __init__(self, device_number):
         self.device_number = device_number
+        self.packet_number = None  # dwPacketNumber of the last state read, changes whenever the input does
+        self.packet_time = None  # time.monotonic() when the current packet number was first read
+        self.recorder = None  # recording.Recorder that is given every new state, if set
+        library = load_library()
+        self._get_state = library.XInputGetState
+        self._set_state = library.XInputSetState
+        self._get_battery_information = library.XInputGetBatteryInformation
+        # filled in by every XInputGetState call instead of allocating a structure per call
+        self._state = XINPUT_STATE()
+        self._state_ref = ctypes.byref(self._state)
+        self._read_state = controller.DISCONNECTED
         self._last_state = self.get_state()
 
     def get_state(self):
-        """Get the state of the controller represented by this object"""
-        state = XINPUT_STATE()
-        res = xinput.XInputGetState(self.device_number, ctypes.byref(state))
+        """
+        Get the state of the controller represented by this object.
+        While the packet number is unchanged the previous dict is returned again, so treat it as read only.
+        """
+        res = self._get_state(self.device_number, self._state_ref)
         if res == ERROR_SUCCESS:
-            self._last_state = struct_dict(state.gamepad)
+            state = self._state
+            if state.packet_number == self.packet_number and self._last_state is not None:
+                return self._last_state
+            self.packet_time = time.monotonic()
+            if self.recorder is not None:
+                self.recorder.write_xinput(state)
+            self.packet_number = state.packet_number
+            gamepad = state.gamepad
+            self._last_state = {
+                'buttons': gamepad.buttons,
+                'left_trigger': gamepad.left_trigger,
+                'right_trigger': gamepad.right_trigger,
+                'l_thumb_x': gamepad.l_thumb_x,
+                'l_thumb_y': gamepad.l_thumb_y,
+                'r_thumb_x': gamepad.r_thumb_x,
+                'r_thumb_y': gamepad.r_thumb_y,
+            }
             return self._last_state
+        self._last_state = None
         if res != ERROR_DEVICE_NOT_CONNECTED:
-            self._last_state = None
             raise RuntimeError(
                 "Unknown error %d attempting to get state of device %d" % (res, self.device_number))
 
+    def read(self):
+        """Get the state as a controller.State, shared with the other controller backends"""
+        previous = self._read_state
+        state = self.get_state()
+        if state is None:
+            if previous.connected:
+                self._read_state = controller.DISCONNECTED._replace(timestamp=time.monotonic())
+        elif not previous.connected or previous.number != self.packet_number:
+            self._read_state = controller.State(
+                state['l_thumb_x'], state['l_thumb_y'], state['r_thumb_x'], state['r_thumb_y'],
+                state['left_trigger'], state['right_trigger'], state['buttons'], True, self.packet_time,
+                self.packet_number)
+        return self._read_state
+
+    def wait_for_change(self, timeout=None, poll_interval=0.002):
+        """
+        Sleep until the packet number moves on from the last state read, or the controller is
+        plugged in or out. XInput has nothing to block on, so it is polled every poll_interval
+        seconds, each poll costing one XInputGetState call.
+
+        :param timeout: seconds to wait at most, None to wait indefinitely
+        :param poll_interval: seconds between polls
+        :return: the new controller.State, or None if nothing changed before the timeout
+        """
+        packet_number = self.packet_number
+        connected = self._last_state is not None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.get_state()
+            if self.packet_number != packet_number or (state is not None) != connected:
+                return self.read()
+            remaining = poll_interval if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(remaining, poll_interval))
+
     def is_connected(self):
         return self._last_state is not None
 
@@ -105,25 +213,13 @@ class XInputJoystick:
 
     def set_vibration(self, left_motor, right_motor):
         """Control the speed of both motors separately"""
-        # Set up function argument types and return type
-        XInputSetState = xinput.XInputSetState
-        XInputSetState.argtypes = [ctypes.c_uint, ctypes.POINTER(XINPUT_VIBRATION)]
-        XInputSetState.restype = ctypes.c_uint
-
         vibration = XINPUT_VIBRATION(int(left_motor * 65535), int(right_motor * 65535))
-        XInputSetState(self.device_number, ctypes.byref(vibration))
+        self._set_state(self.device_number, ctypes.byref(vibration))
 
     def get_battery_information(self):
         """Get battery type & charge level"""
-        BATTERY_DEVTYPE_GAMEPAD = 0x00
-        BATTERY_DEVTYPE_HEADSET = 0x01
-        # Set up function argument types and return type
-        XInputGetBatteryInformation = xinput.XInputGetBatteryInformation
-        XInputGetBatteryInformation.argtypes = [ctypes.c_uint, ctypes.c_ubyte, ctypes.POINTER(XINPUT_BATTERY_INFORMATION)]
-        XInputGetBatteryInformation.restype = ctypes.c_uint 
-
         battery = XINPUT_BATTERY_INFORMATION(0,0)
-        XInputGetBatteryInformation(self.device_number, BATTERY_DEVTYPE_GAMEPAD, ctypes.byref(battery))
+        self._get_battery_information(self.device_number, BATTERY_DEVTYPE_GAMEPAD, ctypes.byref(battery))
 
         #define BATTERY_TYPE_DISCONNECTED       0x00
         #define BATTERY_TYPE_WIRED              0x01